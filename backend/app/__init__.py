@@ -0,0 +1 @@
+"""ProtoScale compute node: ingest and reconstruction API."""
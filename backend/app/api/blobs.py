@@ -0,0 +1,25 @@
+"""Immutable blob downloads."""
+
+from __future__ import annotations
+
+import re
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+
+from ..blobs import MEDIA_TYPES, blob_path
+
+router = APIRouter(prefix="/api/blobs", tags=["blobs"])
+
+BLOB_NAME = re.compile(r"^[0-9a-f]{64}\.(png|jpg|webp)$")
+# Names are content hashes, so a response can never go stale.
+IMMUTABLE = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+
+@router.get("/{name}")
+def read_blob(name: str) -> FileResponse:
+    match = BLOB_NAME.match(name)
+    path = blob_path(name) if match else None
+    if path is None or not path.exists():
+        raise HTTPException(404, "Blob not found.")
+    return FileResponse(path, media_type=MEDIA_TYPES[match.group(1)], headers={**IMMUTABLE, "ETag": f'"{name}"'})
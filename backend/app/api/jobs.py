@@ -0,0 +1,50 @@
+"""Job status endpoints.
+
+``GET /api/jobs/{id}`` returns the current state; ``/events`` streams it as
+Server-Sent Events (``progress`` events, then one ``done`` or ``failed``),
+coalesced to at most one event per ``PROTOSCALE_EVENT_INTERVAL``.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import AsyncIterator
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from ..jobs import TERMINAL, Job, JobNotFound, get_job
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+
+def job_urls(job: Job) -> dict[str, str]:
+    return {"status_url": f"/api/jobs/{job.id}", "events_url": f"/api/jobs/{job.id}/events"}
+
+
+def _get(job_id: str) -> Job:
+    try:
+        return get_job(job_id)
+    except JobNotFound:
+        raise HTTPException(404, "Job not found.") from None
+
+
+@router.get("/{job_id}")
+def read_job(job_id: str) -> dict:
+    return _get(job_id).snapshot()
+
+
+async def _events(job: Job) -> AsyncIterator[str]:
+    async for state in job.watch():
+        kind = state["status"] if state["status"] in TERMINAL else "progress"
+        yield f"event: {kind}\ndata: {json.dumps(state, separators=(',', ':'))}\n\n"
+
+
+@router.get("/{job_id}/events")
+def job_events(job_id: str) -> StreamingResponse:
+    return StreamingResponse(
+        _events(_get(job_id)),
+        media_type="text/event-stream",
+        # No proxy buffering, or events arrive in bursts.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,127 @@
+"""Project read endpoints."""
+
+from __future__ import annotations
+
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from ..jobs import active_job, start_job
+from ..pipeline.cutout import NotSegmented, full_cutout
+from ..pipeline.preprocess import preprocess_project
+from ..pipeline.views import NotSynthesized, ViewsRunning, generate_views, regenerate_view, view_layout
+from ..projects import Project, ProjectNotFound, load_project, project_lock
+from ..similarity import NotSimilar, adopt_similar, match_and_register
+from .jobs import job_urls
+
+router = APIRouter(prefix="/api/projects", tags=["projects"])
+
+
+def get_project(project_id: str) -> Project:
+    try:
+        return load_project(project_id)
+    except ProjectNotFound:
+        raise HTTPException(404, "Project not found.") from None
+
+
+@router.get("/{project_id}")
+def read_project(project_id: str) -> dict:
+    return get_project(project_id).to_dict()
+
+
+@router.get("/{project_id}/sources/{index}")
+def read_source(project_id: str, index: int) -> FileResponse:
+    project = get_project(project_id)
+    if not 0 <= index < len(project.sources):
+        raise HTTPException(404, "Source image not found.")
+    source = project.sources[index]
+    return FileResponse(project.dir / source.path, media_type=source.content_type)
+
+
+@router.get("/{project_id}/sources/{index}/cutout")
+async def read_cutout(project_id: str, index: int) -> FileResponse:
+    """The source with its background removed, at full resolution."""
+    project = get_project(project_id)
+    if not 0 <= index < len(project.sources):
+        raise HTTPException(404, "Source image not found.")
+    try:
+        path = await full_cutout(project, index)
+    except NotSegmented:
+        raise HTTPException(404, "Background removal was not run for this source.") from None
+    return FileResponse(path, media_type="image/png")
+
+
+@router.post("/{project_id}/preprocess")
+async def preprocess(project_id: str) -> dict:
+    async with project_lock(project_id):
+        project = get_project(project_id)
+        # The job renders from the working images and subjects preprocessing would rewrite.
+        if active_job(project_id, "views") is not None:
+            raise HTTPException(409, "Views are still being generated for this project.")
+        results = await preprocess_project(project)
+    similar = await run_in_threadpool(match_and_register, project)
+    return {"project_id": project.id, "multi_view": project.multi_view, "sources": results, "similar": similar}
+
+
+@router.post("/{project_id}/similar/{other_id}/adopt")
+async def adopt(project_id: str, other_id: str) -> dict:
+    """Take over the artifacts of a similar earlier project (a ``similar`` offer) instead of producing them."""
+    async with project_lock(project_id):
+        project = get_project(project_id)
+        if active_job(project_id, "views") is not None:
+            raise HTTPException(409, "Views are still being generated for this project.")
+        try:
+            artifacts = await run_in_threadpool(adopt_similar, project, other_id)
+        except ProjectNotFound:
+            raise HTTPException(404, "Similar project not found.") from None
+        except NotSimilar as exc:
+            raise HTTPException(409, f"Can't adopt: {exc}.") from None
+    return {"project_id": project.id, "artifacts": artifacts}
+
+
+class ViewRequest(BaseModel):
+    # Views around the subject and whether to add views from straight above / below; single-photo projects only.
+    ring: Literal[4, 6, 8, 12] = 4
+    top: bool = False
+    bottom: bool = False
+
+
+@router.post("/{project_id}/views", status_code=202)
+async def start_views(project_id: str, body: ViewRequest | None = None) -> dict:
+    """Start (or join the running) multi-angle view job; follow it at ``events_url``."""
+    project = get_project(project_id)
+    if any(not source.working for source in project.sources):
+        raise HTTPException(409, "Project has not been preprocessed.")
+    params = (body or ViewRequest()).model_dump()
+    # Under the project lock, so a regeneration in progress finishes first and one about to start sees the job.
+    async with project_lock(project_id):
+        job = active_job(project_id, "views")
+        if job is not None and job.params != params:
+            raise HTTPException(409, "Views with another layout are already being generated for this project.")
+        if job is None:
+            layout = view_layout(**params)
+            job = start_job("views", project_id, lambda job: generate_views(project, job, layout), params)
+    return {**job.snapshot(), **job_urls(job)}
+
+
+class RegenerateRequest(BaseModel):
+    # Seed for the backend; by default the view's current seed plus one.
+    seed: int | None = None
+
+
+@router.post("/{project_id}/views/{index}/regenerate")
+async def regenerate(project_id: str, index: int, body: RegenerateRequest | None = None) -> dict:
+    """Redo one synthesized view with a new seed; the others stay, the mesh built from them is dropped."""
+    get_project(project_id)
+    try:
+        view = await regenerate_view(project_id, index, (body or RegenerateRequest()).seed)
+    except IndexError:
+        raise HTTPException(404, "View not found.") from None
+    except ViewsRunning:
+        raise HTTPException(409, "Views are still being generated for this project.") from None
+    except NotSynthesized as exc:
+        raise HTTPException(409, f"{exc}; only generated views can be regenerated.") from None
+    return {"index": index, "view": view}
@@ -0,0 +1,341 @@
+"""Upload endpoints.
+
+Bodies are sent raw (``Content-Type`` set to the image type, original name in
+``X-Filename``) rather than as multipart forms, so they can be streamed
+straight to disk without a form parser buffering them first.
+
+Large files go through the resumable protocol instead: ``POST /resumable``
+to declare the upload, ``PATCH /resumable/{id}`` with an ``Upload-Offset``
+header for each chunk, ``GET /resumable/{id}`` to recover the committed
+offset after a dropped connection, and ``POST /resumable/{id}/finalize``
+(or ``DELETE /resumable/{id}`` to give up).
+"""
+
+from __future__ import annotations
+
+import os
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO
+from urllib.parse import unquote
+
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from ..config import get_settings
+from ..dedup import adopt_cached, find_producer
+from ..imaging.decode import DecodedImage, load_working_image, save_decoded
+from ..imaging.probe import Admission, ImageInfo, ImageRejected, ProbeError, admit, probe
+from ..imaging.quality import QualityRejected, QualityReport, assess, check
+from ..ingest import resumable
+from ..ingest.budget import get_budget
+from ..ingest.pipeline import IngestPipeline
+from ..ingest.stream import ChunkSpool, UploadTooLarge
+from ..projects import (
+    Project,
+    ProjectNotFound,
+    ProjectOptions,
+    SourceImage,
+    load_project,
+    new_project,
+    project_lock,
+    save_project,
+)
+
+router = APIRouter(prefix="/api/uploads", tags=["uploads"])
+
+ACCEPTED_TYPES = {"image/jpeg", "image/png"}
+# Probed format -> stored content type and extension; the header wins over the declared type.
+FORMATS = {"jpeg": ("image/jpeg", ".jpg"), "png": ("image/png", ".png")}
+
+
+def source_url(project_id: str, index: int = 0) -> str:
+    return f"/api/projects/{project_id}/sources/{index}"
+
+
+def _content_type(value: str) -> str:
+    content_type = value.split(";")[0].strip().lower()
+    if content_type not in ACCEPTED_TYPES:
+        raise HTTPException(415, "Only JPG and PNG images are accepted.")
+    return content_type
+
+
+def _check_size(size: int) -> None:
+    limit = get_settings().max_upload_bytes
+    if size > limit:
+        raise HTTPException(413, f"Upload exceeds {limit} bytes.")
+
+
+@contextmanager
+def _admission_errors() -> Iterator[None]:
+    try:
+        yield
+    except ProbeError as exc:
+        raise HTTPException(415, f"Unreadable image: {exc}.") from None
+    except QualityRejected as exc:
+        raise HTTPException(422, {"message": f"Image rejected: {exc}.", "quality": exc.report.to_dict()}) from None
+    except ImageRejected as exc:
+        raise HTTPException(422, f"Image rejected: {exc}.") from None
+
+
+def _inspect(f: BinaryIO) -> tuple[ImageInfo, Admission]:
+    """Probe the header of an uploaded body and apply the admission limits."""
+    f.seek(0)
+    with _admission_errors():
+        info = probe(f)
+        return info, admit(info, get_settings())
+
+
+def _decode_and_assess(path: Path, info: ImageInfo) -> tuple[DecodedImage, QualityReport]:
+    settings = get_settings()
+    with _admission_errors():
+        try:
+            decoded = load_working_image(path, info, settings.working_size)
+        except (OSError, SyntaxError) as exc:
+            raise ProbeError(f"cannot decode image ({exc})") from None
+        quality = assess(decoded.image)
+        check(quality, settings.min_quality_score)
+    return decoded, quality
+
+
+def _source_path(project: Project, info: ImageInfo) -> Path:
+    return project.dir / f"source-{len(project.sources)}{FORMATS[info.format][1]}"
+
+
+def _target_project(project_id: str | None, options: ProjectOptions) -> Project:
+    """The project an upload adds to: an existing one named by the client, or a new one.
+
+    Callers adding to an existing project must hold its ``project_lock``.
+    """
+    if not project_id:
+        return new_project(options)
+    try:
+        project = load_project(project_id)
+    except ProjectNotFound:
+        raise HTTPException(404, "Project not found.") from None
+    limit = get_settings().max_sources
+    if len(project.sources) >= limit:
+        raise HTTPException(409, f"A project holds at most {limit} photos.")
+    return project
+
+
+def _add_source(
+    project: Project,
+    path: Path,
+    filename: str,
+    size: int,
+    sha256: str,
+    info: ImageInfo,
+    admission: Admission,
+    quality: QualityReport | None,
+    predecoded: dict,
+) -> dict:
+    """Append the upload to ``project`` and take over earlier results for the same photos, if any.
+
+    A deduplicated response also carries every source's preprocessing
+    record under ``sources``, as ``/preprocess`` returns them, since the
+    project needs no preprocessing.
+    """
+    source = SourceImage(
+        filename=filename or path.name,
+        content_type=FORMATS[info.format][0],
+        size=size,
+        path=path.name,
+        sha256=sha256,
+        info=info.to_dict(),
+        tier=admission.tier,
+        memory_estimate=admission.memory_estimate,
+        predecoded=predecoded,
+        quality=quality.to_dict() if quality else {},
+    )
+    project.sources.append(source)
+    save_project(project)
+    deduplicated = adopt_cached(project)
+    result = {
+        "project_id": project.id,
+        "source_index": len(project.sources) - 1,
+        "source_url": source_url(project.id, len(project.sources) - 1),
+        "size": size,
+        "sha256": sha256,
+        "deduplicated": deduplicated,
+        "artifacts": project.artifacts,
+        "image": {**info.to_dict(), **admission.to_dict()},
+        "quality": source.quality,
+    }
+    if deduplicated:
+        result["sources"] = [source.working for source in project.sources]
+    return result
+
+
+def _repeat(project_id: str | None, options: ProjectOptions) -> Callable[[str], bool] | None:
+    """For an upload starting a project: whether its bytes already have results, so decoding can be skipped."""
+    if project_id:
+        return None  # a photo added to a project is preprocessed with the rest
+    return lambda sha256: find_producer(sha256, options) is not None
+
+
+@router.post("", status_code=201)
+async def upload(
+    request: Request, remove_background: bool = True, enhanced_detail: bool = False, project_id: str | None = None
+) -> dict:
+    _content_type(request.headers.get("content-type", ""))
+    declared = request.headers.get("content-length")
+    if declared is not None:
+        try:
+            size = int(declared)
+        except ValueError:
+            size = -1
+        if size < 0:
+            raise HTTPException(400, "Invalid Content-Length header.")
+        _check_size(size)
+
+    settings = get_settings()
+    spool = ChunkSpool(
+        chunk_size=settings.upload_chunk_size,
+        spool_max_size=settings.spool_max_size,
+        max_bytes=settings.max_upload_bytes,
+        tmp_dir=settings.data_dir / "tmp",
+    )
+    options = ProjectOptions(remove_background, enhanced_detail)
+    try:
+        with _admission_errors():
+            ingest = await IngestPipeline(spool, settings).run(request.stream(), _repeat(project_id, options))
+        async with project_lock(project_id):
+            project = _target_project(project_id, options)
+            path = _source_path(project, ingest.info)
+            await spool.persist(path)
+            predecoded = {}
+            if ingest.decoded is not None:
+                decoded_path = project.dir / f"decoded-{len(project.sources)}.png"
+                predecoded = await run_in_threadpool(save_decoded, ingest.decoded, decoded_path)
+                predecoded["in_stream"] = ingest.decoded_in_stream
+            filename = unquote(request.headers.get("x-filename", ""))
+            stats = ingest.stats
+            result = _add_source(
+                project,
+                path,
+                filename,
+                stats.bytes,
+                stats.sha256,
+                ingest.info,
+                ingest.admission,
+                ingest.quality,
+                predecoded,
+            )
+    except UploadTooLarge as exc:
+        raise HTTPException(413, f"Upload exceeds {exc.limit} bytes.") from None
+    finally:
+        spool.close()
+
+    result["stats"] = {
+        **stats.to_dict(),
+        "ready_after_last_byte_ms": round(ingest.ready_after_last_byte * 1000, 1),
+        "decoded_in_stream": ingest.decoded_in_stream,
+    }
+    return result
+
+
+class ResumableCreate(BaseModel):
+    filename: str = ""
+    content_type: str
+    size: int
+    remove_background: bool = True
+    enhanced_detail: bool = False
+    project_id: str | None = None
+
+
+def _get_upload(upload_id: str) -> resumable.ResumableUpload:
+    try:
+        return resumable.load_upload(upload_id)
+    except resumable.UploadNotFound:
+        raise HTTPException(404, "Upload not found.") from None
+
+
+def _upload_state(upload: resumable.ResumableUpload) -> dict:
+    return {
+        "upload_id": upload.id,
+        "offset": upload.offset,
+        "size": upload.size,
+        "chunk_size": get_settings().resumable_chunk_size,
+    }
+
+
+@router.post("/resumable", status_code=201)
+def create_resumable(body: ResumableCreate) -> dict:
+    content_type = _content_type(body.content_type)
+    if body.size <= 0:
+        raise HTTPException(400, "Upload size must be positive.")
+    _check_size(body.size)
+    if body.project_id:
+        _target_project(body.project_id, ProjectOptions())  # fail early on a bad or full project
+    upload = resumable.create_upload(
+        body.filename, content_type, body.size, body.remove_background, body.enhanced_detail, body.project_id
+    )
+    return _upload_state(upload)
+
+
+@router.get("/resumable/{upload_id}")
+def read_resumable(upload_id: str) -> dict:
+    return _upload_state(_get_upload(upload_id))
+
+
+@router.delete("/resumable/{upload_id}", status_code=204)
+async def abort_resumable(upload_id: str) -> None:
+    async with resumable.lock_for(_get_upload(upload_id)):
+        resumable.discard_upload(_get_upload(upload_id))
+
+
+@router.patch("/resumable/{upload_id}")
+async def patch_resumable(upload_id: str, request: Request) -> dict:
+    try:
+        offset = int(request.headers["upload-offset"])
+    except (KeyError, ValueError):
+        raise HTTPException(400, "Upload-Offset header is required.") from None
+    async with resumable.lock_for(_get_upload(upload_id)):
+        upload = _get_upload(upload_id)
+        try:
+            await resumable.append_chunk(upload, offset, request.stream())
+        except resumable.OffsetMismatch as exc:
+            raise HTTPException(409, {"message": str(exc), "offset": exc.expected}) from None
+        except resumable.ChunkOverflow as exc:
+            raise HTTPException(413, str(exc)) from None
+    return _upload_state(upload)
+
+
+@router.post("/resumable/{upload_id}/finalize", status_code=201)
+async def finalize_resumable(upload_id: str) -> dict:
+    async with resumable.lock_for(_get_upload(upload_id)):
+        upload = _get_upload(upload_id)
+        if not upload.complete:
+            raise HTTPException(409, {"message": "Upload is incomplete.", "offset": upload.offset})
+        with open(upload.part_path, "rb") as f:
+            try:
+                info, admission = _inspect(f)
+            except HTTPException:
+                resumable.discard_upload(upload)
+                raise
+        options = ProjectOptions(upload.remove_background, upload.enhanced_detail)
+        sha256 = await run_in_threadpool(resumable.content_hash, upload, get_settings().upload_chunk_size)
+        repeat = _repeat(upload.project_id, options)
+        decoded = quality = None
+        if repeat is None or not repeat(sha256):
+            try:
+                async with get_budget().reserve(admission):
+                    decoded, quality = await run_in_threadpool(_decode_and_assess, upload.part_path, info)
+            except HTTPException:
+                resumable.discard_upload(upload)
+                raise
+        async with project_lock(upload.project_id):
+            project = _target_project(upload.project_id, options)
+            path = _source_path(project, info)
+            os.replace(upload.part_path, path)
+            resumable.discard_upload(upload)
+            predecoded = {}
+            if decoded is not None:
+                decoded_path = project.dir / f"decoded-{len(project.sources)}.png"
+                predecoded = await run_in_threadpool(save_decoded, decoded, decoded_path)
+            return _add_source(
+                project, path, upload.filename, upload.size, sha256, info, admission, quality, predecoded
+            )
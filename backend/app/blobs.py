@@ -0,0 +1,65 @@
+"""Content-addressed blob storage for derived images.
+
+Blobs are named by the SHA-256 of their bytes, so a URL never changes
+meaning and can be cached forever by browsers and proxies; identical
+outputs from different projects are stored once.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import tempfile
+import uuid
+from pathlib import Path
+
+from .config import get_settings
+
+MEDIA_TYPES = {"png": "image/png", "jpg": "image/jpeg", "webp": "image/webp"}
+
+
+def blob_path(name: str) -> Path:
+    return get_settings().data_dir / "blobs" / name[:2] / name
+
+
+def blob_url(name: str) -> str:
+    return f"/api/blobs/{name}"
+
+
+def _commit(tmp: Path, name: str) -> str:
+    dest = blob_path(name)
+    if dest.exists():
+        tmp.unlink()
+    else:
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp, dest)
+    return name
+
+
+def put_bytes(data: bytes, ext: str) -> str:
+    """Store ``data`` and return its blob name (``<sha256>.<ext>``)."""
+    name = f"{hashlib.sha256(data).hexdigest()}.{ext}"
+    if blob_path(name).exists():
+        return name
+    tmp_dir = get_settings().data_dir / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=tmp_dir)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return _commit(Path(tmp), name)
+
+
+def put_file(path: Path, sha256: str, ext: str) -> str:
+    """Store an existing file whose hash is already known, hard-linking when possible."""
+    name = f"{sha256}.{ext}"
+    if blob_path(name).exists():
+        return name
+    tmp_dir = get_settings().data_dir / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    tmp = tmp_dir / f"{name}.{uuid.uuid4().hex}"
+    try:
+        os.link(path, tmp)
+    except OSError:
+        shutil.copyfile(path, tmp)
+    return _commit(tmp, name)
@@ -0,0 +1,114 @@
+"""Runtime settings, read once from ``PROTOSCALE_*`` environment variables."""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+MiB = 1024 * 1024
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    return value.lower() not in ("0", "false", "no") if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+@dataclass(frozen=True)
+class Settings:
+    data_dir: Path
+    # Size of each write to the spool; also the most request body we buffer per upload.
+    upload_chunk_size: int = 1 * MiB
+    # Spooled files roll over to disk past this size.
+    spool_max_size: int = 1 * MiB
+    max_upload_bytes: int = 64 * MiB
+    # Suggested PATCH size for resumable uploads; what a dropped connection costs at most.
+    resumable_chunk_size: int = 4 * MiB
+    # Seconds an unfinished resumable upload is kept after its last chunk.
+    resumable_ttl: int = 24 * 3600
+    # Header-probe limits; anything over these is refused before decoding.
+    max_image_pixels: int = 100_000_000
+    max_image_dimension: int = 20_000
+    # Shortest side worth reconstructing from; smaller images are refused before decoding.
+    min_image_dimension: int = 32
+    # Processing tiers by pixel count: small <= small_image_pixels < standard <= large_image_pixels < large.
+    small_image_pixels: int = 2_000_000
+    large_image_pixels: int = 16_000_000
+    # Memory the upload decodes in flight may take together, by their admission estimates; 0 disables.
+    # Small-tier images aren't counted.
+    decode_memory_budget: int = 1024 * MiB
+    # Hamming radius (of 64 bits) within which perceptual hashes count as near-duplicates.
+    phash_radius: int = 6
+    # Photos per project; two or more make it a multi-view project.
+    max_sources: int = 30
+    # Size of the process pool CPU-bound stages fan out over; 0 means one per CPU.
+    worker_processes: int = 0
+    # Start the pool with the server and load the configured models in every worker before the first request.
+    warm_workers: bool = True
+    # Longest side of the working image the preprocessing stages operate on.
+    working_size: int = 1024
+    # Background removal model (see app/segmentation/models.py) and, for "onnx", its weights file.
+    segmentation_model: str = "classical"
+    segmentation_weights: Path | None = None
+    # Share of margin pixels that must match one colour for the uniform-backdrop fast path; above 1 disables it.
+    backdrop_uniformity: float = 0.97
+    # In-memory budget of each process's segmentation mask cache (a disk tier sits behind it).
+    mask_cache_bytes: int = 64 * MiB
+    # Uploads whose preflight quality score (0-1) falls below this are refused; 0 disables the gate.
+    min_quality_score: float = 0.35
+    # View-synthesis backend (see app/synthesis/models.py): a registered name or a "module:factory" path.
+    view_backend: str = "silhouette"
+    # View requests (from any number of jobs) are collected for up to this many seconds and sent
+    # to the workers in batches of at most view_batch_size, one batched backend call each.
+    view_batch_latency: float = 0.005
+    view_batch_size: int = 8
+    # Least time between two progress events on one job event stream, in seconds.
+    event_interval: float = 0.1
+    cors_origins: tuple[str, ...] = ("http://localhost:5173",)
+
+
+@lru_cache
+def get_settings() -> Settings:
+    data_dir = Path(os.environ.get("PROTOSCALE_DATA_DIR", Path(__file__).resolve().parent.parent / "data"))
+    origins = os.environ.get("PROTOSCALE_CORS_ORIGINS")
+    weights = os.environ.get("PROTOSCALE_SEGMENTATION_WEIGHTS")
+    return Settings(
+        data_dir=data_dir,
+        upload_chunk_size=_env_int("PROTOSCALE_UPLOAD_CHUNK_SIZE", Settings.upload_chunk_size),
+        spool_max_size=_env_int("PROTOSCALE_SPOOL_MAX_SIZE", Settings.spool_max_size),
+        max_upload_bytes=_env_int("PROTOSCALE_MAX_UPLOAD_BYTES", Settings.max_upload_bytes),
+        resumable_chunk_size=_env_int("PROTOSCALE_RESUMABLE_CHUNK_SIZE", Settings.resumable_chunk_size),
+        resumable_ttl=_env_int("PROTOSCALE_RESUMABLE_TTL", Settings.resumable_ttl),
+        max_image_pixels=_env_int("PROTOSCALE_MAX_IMAGE_PIXELS", Settings.max_image_pixels),
+        max_image_dimension=_env_int("PROTOSCALE_MAX_IMAGE_DIMENSION", Settings.max_image_dimension),
+        min_image_dimension=_env_int("PROTOSCALE_MIN_IMAGE_DIMENSION", Settings.min_image_dimension),
+        small_image_pixels=_env_int("PROTOSCALE_SMALL_IMAGE_PIXELS", Settings.small_image_pixels),
+        large_image_pixels=_env_int("PROTOSCALE_LARGE_IMAGE_PIXELS", Settings.large_image_pixels),
+        decode_memory_budget=_env_int("PROTOSCALE_DECODE_MEMORY_BUDGET", Settings.decode_memory_budget),
+        phash_radius=_env_int("PROTOSCALE_PHASH_RADIUS", Settings.phash_radius),
+        max_sources=_env_int("PROTOSCALE_MAX_SOURCES", Settings.max_sources),
+        worker_processes=_env_int("PROTOSCALE_WORKER_PROCESSES", Settings.worker_processes),
+        warm_workers=_env_bool("PROTOSCALE_WARM_WORKERS", Settings.warm_workers),
+        working_size=_env_int("PROTOSCALE_WORKING_SIZE", Settings.working_size),
+        segmentation_model=os.environ.get("PROTOSCALE_SEGMENTATION_MODEL", Settings.segmentation_model),
+        segmentation_weights=Path(weights) if weights else None,
+        backdrop_uniformity=_env_float("PROTOSCALE_BACKDROP_UNIFORMITY", Settings.backdrop_uniformity),
+        mask_cache_bytes=_env_int("PROTOSCALE_MASK_CACHE_BYTES", Settings.mask_cache_bytes),
+        min_quality_score=_env_float("PROTOSCALE_MIN_QUALITY_SCORE", Settings.min_quality_score),
+        view_backend=os.environ.get("PROTOSCALE_VIEW_BACKEND", Settings.view_backend),
+        view_batch_latency=_env_float("PROTOSCALE_VIEW_BATCH_LATENCY", Settings.view_batch_latency),
+        view_batch_size=_env_int("PROTOSCALE_VIEW_BATCH_SIZE", Settings.view_batch_size),
+        event_interval=_env_float("PROTOSCALE_EVENT_INTERVAL", Settings.event_interval),
+        cors_origins=tuple(origins.split(",")) if origins else Settings.cors_origins,
+    )
@@ -0,0 +1,159 @@
+"""Content-hash index from uploaded bytes to already-produced artifacts.
+
+Keys are the source's SHA-256 plus the project options, since both change
+what the pipeline produces. Entries are written by the pipeline stages as
+they finish (``record_artifacts``), and consulted on upload so a repeat
+image starts its new project with everything already in place: the
+producing project's preprocessing (working images, masks, pyramids) is
+copied over with its artifacts, so the repeat is neither decoded nor
+preprocessed again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import shutil
+import sqlite3
+import threading
+import time
+from dataclasses import asdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from . import metrics
+from .config import get_settings
+from .pipeline.cutout import cutout_url
+from .pipeline.preprocess import working_files
+from .projects import Project, ProjectNotFound, ProjectOptions, load_project, save_project
+
+dedup_hits = metrics.counter("protoscale_dedup_hits_total", "Uploads whose artifacts were found in the content index.")
+dedup_misses = metrics.counter("protoscale_dedup_misses_total", "Uploads with no entry in the content index.")
+
+
+def _options_key(options: ProjectOptions) -> str:
+    return json.dumps(asdict(options), sort_keys=True, separators=(",", ":"))
+
+
+class ArtifactIndex:
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts ("
+            " sha256 TEXT NOT NULL, options TEXT NOT NULL, project_id TEXT NOT NULL,"
+            " artifacts TEXT NOT NULL, updated_at REAL NOT NULL,"
+            " PRIMARY KEY (sha256, options))"
+        )
+        self._lock = threading.Lock()
+
+    def lookup(self, sha256: str, options: ProjectOptions) -> tuple[str, dict[str, Any]] | None:
+        """Return ``(project_id, artifacts)`` of the run that produced them, if any."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT project_id, artifacts FROM artifacts WHERE sha256 = ? AND options = ?",
+                (sha256, _options_key(options)),
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def record(self, sha256: str, options: ProjectOptions, project_id: str, artifacts: dict[str, Any]) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?, ?)",
+                (sha256, _options_key(options), project_id, json.dumps(artifacts), time.time()),
+            )
+
+
+@lru_cache
+def get_index() -> ArtifactIndex:
+    return ArtifactIndex(get_settings().data_dir / "index.sqlite3")
+
+
+def source_hash(project: Project) -> str:
+    """Content key of the project's input: the photo's hash, or a hash over all of them in order."""
+    hashes = [source.sha256 for source in project.sources]
+    if len(hashes) <= 1 or not all(hashes):
+        return hashes[0] if hashes else ""
+    return hashlib.sha256(",".join(hashes).encode()).hexdigest()
+
+
+def record_artifacts(project: Project, **artifacts: Any) -> None:
+    """Store produced artifacts on the project and publish them to the index.
+
+    Passing ``None`` for a name drops it, which is how downstream artifacts
+    are invalidated when an upstream one changes.
+    """
+    for name, value in artifacts.items():
+        if value is None:
+            project.artifacts.pop(name, None)
+        else:
+            project.artifacts[name] = value
+    save_project(project)
+    if sha256 := source_hash(project):
+        get_index().record(sha256, project.options, project.id, project.artifacts)
+
+
+def find_producer(sha256: str, options: ProjectOptions) -> Project | None:
+    """The project whose results the index holds for these inputs, if it still has them.
+
+    An entry goes stale when its project gains photos afterwards; such a
+    project no longer counts, nor does one whose photos aren't all
+    preprocessed.
+    """
+    found = get_index().lookup(sha256, options) if sha256 else None
+    if not found or not found[1]:
+        return None
+    try:
+        producer = load_project(found[0])
+    except ProjectNotFound:
+        return None
+    if source_hash(producer) != sha256 or producer.options != options or not producer.artifacts:
+        return None
+    if any(not source.working for source in producer.sources):
+        return None
+    return producer
+
+
+def adopt_artifacts(project: Project, artifacts: dict[str, Any]) -> None:
+    """Replace the project's artifacts with another project's, publishing them under its own inputs.
+
+    Views are served from the blob store, so the records are all there is to
+    copy. The caller holds the project lock.
+    """
+    names = set(project.artifacts) | set(artifacts)
+    record_artifacts(project, **{name: artifacts.get(name) for name in names})
+
+
+def _copy_working(producer: Project, project: Project, index: int) -> None:
+    done = producer.sources[index]
+    for name in working_files(done.working):
+        shutil.copyfile(producer.dir / name, project.dir / name)
+    pyramid = dict(done.working["pyramid"])
+    if pyramid.get("full") == cutout_url(producer.id, index):
+        pyramid["full"] = cutout_url(project.id, index)
+    source = project.sources[index]
+    source.working = {**done.working, "pyramid": pyramid}
+    source.quality = source.quality or done.quality
+
+
+def adopt_cached(project: Project) -> bool:
+    """Seed a project whose inputs just changed with the results of an earlier run on the same bytes.
+
+    On a hit the project gets the producer's preprocessing and artifacts and
+    needs no further work. On a miss whatever it held before is dropped,
+    since it was produced from a different set of photos.
+    """
+    producer = find_producer(source_hash(project), project.options)
+    if producer is None or producer.id == project.id:
+        dedup_misses.inc()
+        if project.artifacts:
+            project.artifacts = {}
+            save_project(project)
+        return False
+    dedup_hits.inc()
+    for index in range(len(project.sources)):
+        _copy_working(producer, project, index)
+    adopt_artifacts(project, producer.artifacts)
+    return True
@@ -0,0 +1,75 @@
+"""Cropping a cut-out subject to a square, centred canvas.
+
+View synthesis and carving only care about the subject, so once it has an
+alpha mask the frame is cut down to the subject's bounding box plus a
+margin, centred in a square, and scaled to at most the working size. The
+transform is kept so anything computed on the square maps back to the
+working image (and from there, by the decode scale, to the source).
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+
+import numpy as np
+from PIL import Image
+
+# Alpha at or above this counts as subject when finding the bounding box.
+ALPHA_THRESHOLD = 8
+# Space left around the subject, as a fraction of its longer bounding-box side, on each side.
+MARGIN = 0.08
+
+
+@dataclass
+class CropTransform:
+    # Square crop in working-image pixels; may reach past the image edges, which are padded transparent.
+    left: int
+    top: int
+    side: int
+    # Side of the square canvas the crop was scaled to.
+    size: int
+
+    @property
+    def scale(self) -> float:
+        """Canvas pixels per working-image pixel."""
+        return self.size / self.side
+
+    def to_working(self, x: float, y: float) -> tuple[float, float]:
+        return self.left + x / self.scale, self.top + y / self.scale
+
+    def to_canvas(self, x: float, y: float) -> tuple[float, float]:
+        return (x - self.left) * self.scale, (y - self.top) * self.scale
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "scale": round(self.scale, 6)}
+
+
+def subject_box(alpha: np.ndarray) -> tuple[int, int, int, int] | None:
+    """``(left, top, right, bottom)`` of the subject, exclusive, or None if the mask is empty."""
+    solid = alpha >= ALPHA_THRESHOLD
+    rows = np.flatnonzero(solid.any(1))
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero(solid.any(0))
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def square_crop(box: tuple[int, int, int, int], max_size: int) -> CropTransform:
+    left, top, right, bottom = box
+    longest = max(right - left, bottom - top)
+    side = longest + 2 * max(1, round(MARGIN * longest))
+    cx, cy = (left + right) / 2, (top + bottom) / 2
+    return CropTransform(round(cx - side / 2), round(cy - side / 2), side, min(side, max_size))
+
+
+def crop_to_subject(cutout: Image.Image, alpha: np.ndarray, max_size: int) -> tuple[Image.Image, CropTransform] | None:
+    """The RGBA ``cutout`` cropped, centred and scaled to its square canvas, or None with no subject."""
+    box = subject_box(alpha)
+    if box is None:
+        return None
+    crop = square_crop(box, max_size)
+    # Pillow pads a crop reaching outside the image with zeros: transparent black for RGBA.
+    square = cutout.crop((crop.left, crop.top, crop.left + crop.side, crop.top + crop.side))
+    if crop.size != crop.side:
+        square = square.resize((crop.size, crop.size), Image.Resampling.LANCZOS, reducing_gap=2.0)
+    return square, crop
@@ -0,0 +1,172 @@
+"""Decoding sources straight to working resolution.
+
+JPEG decoders can produce a 1/2, 1/4 or 1/8 scale image directly from the
+DCT coefficients, skipping most of the IDCT and never materializing the
+full-size frame. We pick the strongest of those reductions that still
+leaves the longest side at or above the working size, then finish with a
+single high-quality resize. PNG has no such shortcut and is decoded in full
+before being reduced.
+"""
+
+from __future__ import annotations
+
+import io
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+from PIL import Image
+
+from .probe import ImageInfo, jpeg_scale
+
+
+def working_dimensions(width: int, height: int, target: int) -> tuple[int, int]:
+    longest = max(width, height)
+    if longest <= target:
+        return width, height
+    return max(1, round(width * target / longest)), max(1, round(height * target / longest))
+
+
+@dataclass
+class DecodedImage:
+    image: Image.Image
+    # DCT scale denominator used while decoding (1 = full decode).
+    decode_scale: int
+    # Dimensions straight out of the decoder, before the final resize.
+    decoded_size: tuple[int, int]
+    icc_profile: bytes | None = None
+
+
+def _draft(im: Image.Image, info: ImageInfo, target: int) -> int:
+    """Ask the JPEG decoder for DCT-domain scaling; returns the denominator chosen."""
+    if info.format != "jpeg":
+        return 1
+    decode_scale = jpeg_scale(info.width, info.height, target)
+    if decode_scale > 1:
+        mode = "L" if info.color_type == "gray" else "RGB"
+        im.draft(mode, (-(-info.width // decode_scale), -(-info.height // decode_scale)))
+    return decode_scale
+
+
+def _from_16bit(im: Image.Image) -> Image.Image:
+    """8-bit ``L`` (``LA`` with a transparent grey) of a 16-bit greyscale PNG, opened as ``I;16`` or ``I``.
+
+    ``convert`` would clip every value above 255, i.e. almost all of them, to white.
+    """
+    values = np.asarray(im).astype(np.uint32)
+    grey = Image.fromarray((values >> 8).astype(np.uint8), "L")
+    transparent = im.info.get("transparency")
+    if not isinstance(transparent, int):
+        return grey
+    alpha = Image.fromarray(np.where(values == transparent, 0, 255).astype(np.uint8), "L")
+    return Image.merge("LA", (grey, alpha))
+
+
+def _finish(im: Image.Image, decode_scale: int, target: int) -> DecodedImage:
+    """Bring a loaded decoder output to an 8-bit mode at working size."""
+    decoded_size = im.size
+    icc_profile = im.info.get("icc_profile")
+    if im.mode == "I" or im.mode.startswith("I;16"):
+        im = _from_16bit(im)
+    if im.mode in ("RGB", "RGBA", "L"):
+        image = im
+    else:
+        alpha = "A" in im.getbands() or "transparency" in im.info
+        image = im.convert("RGBA" if alpha else "RGB")
+    size = working_dimensions(*image.size, target)
+    if size != image.size:
+        # reducing_gap lets Pillow box-reduce by an integer factor before the Lanczos pass.
+        image = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+    elif image is im:
+        image = im.copy()
+    return DecodedImage(image, decode_scale, decoded_size, icc_profile)
+
+
+def load_working_image(path: Path | BinaryIO, info: ImageInfo, target: int) -> DecodedImage:
+    """Decode ``path`` at, or as close above as the format allows, ``target`` px on its longest side.
+
+    Orientation is not applied here; the decoded image is in stored pixel
+    order, matching ``info``.
+    """
+    with Image.open(path) as im:
+        decode_scale = _draft(im, info, target)
+        im.load()
+        return _finish(im, decode_scale, target)
+
+
+def save_decoded(decoded: DecodedImage, path: Path) -> dict:
+    """Keep a decoder output for a later stage; returns the record ``load_decoded`` needs."""
+    # Uncompressed: this file is read back once, moments later.
+    decoded.image.save(path, "PNG", compress_level=0, icc_profile=decoded.icc_profile)
+    return {"path": path.name, "decode_scale": decoded.decode_scale, "decoded_size": list(decoded.decoded_size)}
+
+
+def load_decoded(path: Path, record: dict) -> DecodedImage:
+    with Image.open(path) as im:
+        im.load()
+        return DecodedImage(im, record["decode_scale"], tuple(record["decoded_size"]), im.info.get("icc_profile"))
+
+
+class IncrementalDecoder:
+    """Decodes a JPEG from body chunks as they arrive, at the same DCT scale as ``load_working_image``.
+
+    Built on the same decoder hooks as ``PIL.ImageFile.Parser``, which can't
+    be told to draft. For progressive JPEGs the entropy decoding of every
+    scan happens as data arrives and only the final IDCT waits for the end.
+    Pillow has no incremental PNG decoder, so PNGs are not handled here.
+    """
+
+    def __init__(self, info: ImageInfo, target: int) -> None:
+        if info.format != "jpeg":
+            raise ValueError("incremental decoding is only supported for JPEG")
+        self.info = info
+        self.target = target
+        self.decode_scale = 1
+        self.finished = False
+        self._image: Image.Image | None = None
+        self._decoder = None
+        self._pending = b""
+
+    def _start(self) -> None:
+        try:
+            im = Image.open(io.BytesIO(self._pending))
+        except (OSError, SyntaxError, struct.error):
+            return  # header tables not all here yet
+        self.decode_scale = _draft(im, self.info, self.target)
+        im.load_prepare()
+        codec, extents, offset, args = im.tile[0]
+        im.tile = []
+        self._decoder = Image._getdecoder(im.mode, codec, args, im.decoderconfig)
+        self._decoder.setimage(im.im, extents)
+        self._image = im
+        self._pending = self._pending[offset:]
+
+    def feed(self, data: bytes) -> None:
+        if self.finished:
+            return
+        self._pending += data
+        if self._decoder is None:
+            self._start()
+            if self._decoder is None:
+                return
+        consumed, error = self._decoder.decode(self._pending)
+        if consumed < 0:
+            self.finished = True
+            self._pending = b""
+            if error < 0:
+                raise OSError(f"JPEG decoder error {error}")
+        else:
+            self._pending = self._pending[consumed:]
+
+    def close(self) -> DecodedImage:
+        """Flush the decoder and return the working image."""
+        if self._decoder is not None and not self.finished:
+            self.feed(b"")
+        if self._decoder is not None:
+            self._decoder.cleanup()
+            self._decoder = None
+        if self._image is None or not self.finished:
+            raise OSError("image was incomplete")
+        return _finish(self._image, self.decode_scale, self.target)
@@ -0,0 +1,176 @@
+"""Orientation and colour normalization of decoded images.
+
+Everything after preprocessing works on upright, linear-light sRGB float32
+arrays. Orientation is applied as NumPy flips/transposes, which are strided
+views and copy nothing. Colour is converted in one pass: a per-channel
+256-entry LUT takes 8-bit samples through the source transfer curve to
+linear light, and a single 3x3 matrix multiply maps the source primaries
+to sRGB's. Only matrix/TRC ICC profiles (what cameras and phones embed,
+Display P3 included) are understood; anything else is treated as sRGB.
+"""
+
+from __future__ import annotations
+
+import struct
+from dataclasses import dataclass
+
+import numpy as np
+
+# Linear sRGB -> PCS XYZ (D50, Bradford-adapted), i.e. the rXYZ/gXYZ/bXYZ columns of an sRGB profile.
+SRGB_TO_XYZ_D50 = np.array(
+    [
+        [0.4360747, 0.3850649, 0.1430804],
+        [0.2225045, 0.7168786, 0.0606169],
+        [0.0139322, 0.0971045, 0.7141733],
+    ],
+    dtype=np.float64,
+)
+XYZ_D50_TO_SRGB = np.linalg.inv(SRGB_TO_XYZ_D50)
+
+ENCODE_LUT_SIZE = 4096
+
+
+def _srgb_eotf(v: np.ndarray) -> np.ndarray:
+    return np.where(v <= 0.04045, v / 12.92, ((v + 0.055) / 1.055) ** 2.4)
+
+
+def _srgb_oetf(v: np.ndarray) -> np.ndarray:
+    return np.where(v <= 0.0031308, v * 12.92, 1.055 * np.power(v, 1 / 2.4) - 0.055)
+
+
+_CODES = np.arange(256, dtype=np.float64) / 255
+SRGB_DECODE_LUT = _srgb_eotf(_CODES).astype(np.float32)
+SRGB_ENCODE_LUT = np.round(_srgb_oetf(np.linspace(0, 1, ENCODE_LUT_SIZE)) * 255).astype(np.uint8)
+
+
+def orient(pixels: np.ndarray, orientation: int) -> np.ndarray:
+    """Return an upright view of ``pixels`` (H, W[, C]) for an EXIF orientation; no data is copied."""
+    if orientation == 2:
+        return pixels[:, ::-1]
+    if orientation == 3:
+        return pixels[::-1, ::-1]
+    if orientation == 4:
+        return pixels[::-1]
+    if orientation == 5:
+        return pixels.swapaxes(0, 1)
+    if orientation == 6:
+        return pixels.swapaxes(0, 1)[:, ::-1]
+    if orientation == 7:
+        return pixels.swapaxes(0, 1)[::-1, ::-1]
+    if orientation == 8:
+        return pixels.swapaxes(0, 1)[::-1]
+    return pixels
+
+
+@dataclass
+class ColorProfile:
+    name: str
+    # Per-channel 8-bit code -> linear light, shape (3, 256).
+    decode_luts: np.ndarray
+    # Linear source RGB -> linear sRGB, or None when the primaries already are sRGB's.
+    matrix: np.ndarray | None
+
+
+SRGB = ColorProfile("srgb", np.stack([SRGB_DECODE_LUT] * 3), None)
+
+
+def _s15(data: bytes, offset: int) -> float:
+    return struct.unpack_from(">i", data, offset)[0] / 65536
+
+
+def _curve_lut(data: bytes, offset: int) -> np.ndarray:
+    kind = data[offset : offset + 4]
+    x = _CODES
+    if kind == b"curv":
+        (count,) = struct.unpack_from(">I", data, offset + 8)
+        if count == 0:
+            y = x
+        elif count == 1:
+            y = x ** (struct.unpack_from(">H", data, offset + 12)[0] / 256)
+        else:
+            table = np.frombuffer(data, ">u2", count, offset + 12).astype(np.float64) / 65535
+            y = np.interp(x, np.linspace(0, 1, count), table)
+    elif kind == b"para":
+        (function,) = struct.unpack_from(">H", data, offset + 8)
+        n = {0: 1, 1: 3, 2: 4, 3: 5, 4: 7}[function]
+        g, a, b, c, d, e, f = ([_s15(data, offset + 12 + 4 * i) for i in range(n)] + [0.0] * 7)[:7]
+        if function == 0:
+            y = x**g
+        elif function == 1:
+            y = np.where(x >= -b / a, np.maximum(a * x + b, 0) ** g, 0)
+        elif function == 2:
+            y = np.where(x >= -b / a, np.maximum(a * x + b, 0) ** g + c, c)
+        elif function == 3:
+            y = np.where(x >= d, np.maximum(a * x + b, 0) ** g, c * x)
+        else:
+            y = np.where(x >= d, np.maximum(a * x + b, 0) ** g + e, c * x + f)
+    else:
+        raise ValueError(f"unsupported TRC type {kind!r}")
+    return np.clip(y, 0, 1).astype(np.float32)
+
+
+def parse_icc(data: bytes) -> ColorProfile:
+    """Build the decode LUTs and primaries matrix of a matrix/TRC RGB ICC profile.
+
+    Falls back to sRGB for profiles that aren't RGB matrix/TRC or can't be read.
+    """
+    try:
+        if data[16:20] != b"RGB ":
+            return SRGB
+        (count,) = struct.unpack_from(">I", data, 128)
+        tags = {}
+        for i in range(count):
+            sig, offset, _ = struct.unpack_from(">4sII", data, 132 + 12 * i)
+            tags[sig] = offset
+        columns = [[_s15(data, tags[t] + 8 + 4 * k) for k in range(3)] for t in (b"rXYZ", b"gXYZ", b"bXYZ")]
+        luts = np.stack([_curve_lut(data, tags[t]) for t in (b"rTRC", b"gTRC", b"bTRC")])
+    except (KeyError, ValueError, struct.error):
+        return SRGB
+    matrix = XYZ_D50_TO_SRGB @ np.array(columns, dtype=np.float64).T
+    if np.allclose(matrix, np.eye(3), atol=2e-3) and np.allclose(luts, SRGB_DECODE_LUT, atol=2e-3):
+        return SRGB
+    identity = np.allclose(matrix, np.eye(3), atol=2e-3)
+    return ColorProfile("icc", luts, None if identity else matrix.astype(np.float32))
+
+
+@dataclass
+class Normalized:
+    # Upright linear sRGB, float32 (H, W, 3); may be slightly outside [0, 1] for wide-gamut sources.
+    linear: np.ndarray
+    # Upright alpha in [0, 1], float32 (H, W), or None for opaque images.
+    alpha: np.ndarray | None
+    profile: str
+
+
+def profile_for(icc_profile: bytes | None) -> ColorProfile:
+    return parse_icc(icc_profile) if icc_profile else SRGB
+
+
+def normalize(pixels: np.ndarray, orientation: int = 1, profile: ColorProfile = SRGB) -> Normalized:
+    """Orient and linearize 8-bit L/RGB/RGBA ``pixels`` into linear sRGB."""
+    pixels = orient(pixels, orientation)
+    if pixels.ndim == 2:
+        pixels = pixels[..., None]
+    alpha = pixels[..., 3].astype(np.float32) * (1 / 255) if pixels.shape[-1] == 4 else None
+    luts = profile.decode_luts
+    if pixels.shape[-1] == 1:
+        linear = np.repeat(luts[1][pixels], 3, axis=-1)
+    elif np.array_equal(luts[0], luts[1]) and np.array_equal(luts[1], luts[2]):
+        # One gather over all three channels; it also makes the result contiguous whatever the view.
+        linear = luts[0][pixels[..., :3]]
+    else:
+        linear = np.empty(pixels.shape[:2] + (3,), dtype=np.float32)
+        for c in range(3):
+            linear[..., c] = luts[c][pixels[..., c]]
+    if profile.matrix is not None:
+        # Writes a fresh C-contiguous buffer whatever the strides of the gather result.
+        linear = np.matmul(linear, profile.matrix.T)
+    else:
+        linear = np.ascontiguousarray(linear)
+    return Normalized(linear, alpha, profile.name)
+
+
+def encode_srgb(linear: np.ndarray) -> np.ndarray:
+    """Linear light -> 8-bit sRGB codes via a quantized OETF LUT."""
+    index = np.clip(linear, 0, 1) * (ENCODE_LUT_SIZE - 1)
+    return SRGB_ENCODE_LUT[(index + 0.5).astype(np.intp)]
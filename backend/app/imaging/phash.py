@@ -0,0 +1,39 @@
+"""64-bit perceptual hash (DCT pHash).
+
+The image is reduced to 32x32 grey, transformed with a 2-D DCT, and each of
+the 64 lowest-frequency coefficients becomes one bit: set if above the
+median. Re-encoding, rescaling, mild crops and colour shifts move few of
+those bits, so near-duplicates land within a small Hamming distance.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 8
+SAMPLE_SIZE = 32
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    m[0] /= np.sqrt(2)
+    return m.astype(np.float32)
+
+
+DCT = _dct_matrix(SAMPLE_SIZE)
+
+
+def phash(image: Image.Image) -> int:
+    if image.mode == "RGBA":
+        # Judge the object, not whatever happens to be under transparent pixels.
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    small = np.asarray(image.convert("L").resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.Resampling.BOX), np.float32)
+    low = (DCT @ small @ DCT.T)[:HASH_SIZE, :HASH_SIZE].ravel()
+    # The DC term only tracks overall brightness; leave it out of the threshold.
+    bits = low > np.median(low[1:])
+    return int(np.packbits(bits).view(">u8")[0])
@@ -0,0 +1,227 @@
+"""Header-only image probing.
+
+Reads just enough of a PNG or JPEG to learn its geometry and sample layout,
+never touching compressed pixel data, so oversized or malformed inputs can
+be refused (and admitted ones routed and budgeted) before anything
+allocates a decode buffer.
+"""
+
+from __future__ import annotations
+
+import struct
+from dataclasses import asdict, dataclass
+from typing import BinaryIO
+
+from ..config import Settings
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_COLOR_TYPES = {0: ("gray", 1), 2: ("rgb", 3), 3: ("palette", 1), 4: ("gray_alpha", 2), 6: ("rgba", 4)}
+JPEG_COLOR_TYPES = {1: "gray", 3: "ycbcr", 4: "cmyk"}
+# Start-of-frame markers; SOF2, SOF6, SOF10 and SOF14 are progressive.
+JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+JPEG_PROGRESSIVE = {0xC2, 0xC6, 0xCA, 0xCE}
+EXIF_ORIENTATION = 0x0112
+# DCT scale denominators a JPEG decoder can produce directly (see ``imaging.decode``).
+JPEG_SCALES = (8, 4, 2, 1)
+# Decodes Pillow hands over as-is; anything else is converted to an 8-bit RGB(A) copy first.
+KEPT_LAYOUTS = {("jpeg", "ycbcr"), ("jpeg", "gray"), ("png", "rgb"), ("png", "rgba"), ("png", "gray")}
+
+
+def jpeg_scale(width: int, height: int, target: int) -> int:
+    """Largest DCT scale denominator keeping the longest side >= ``target``."""
+    longest = max(width, height)
+    for denominator in JPEG_SCALES:
+        if -(-longest // denominator) >= target:
+            return denominator
+    return 1
+
+
+class ProbeError(ValueError):
+    """The header is missing, truncated or not a supported format."""
+
+
+class TruncatedHeader(ProbeError):
+    """The data ended before the header did; more bytes may still make it readable."""
+
+
+class ImageRejected(ValueError):
+    """The image is well-formed but outside what the pipeline accepts."""
+
+
+@dataclass
+class ImageInfo:
+    format: str  # "png" or "jpeg"
+    width: int
+    height: int
+    bit_depth: int
+    channels: int
+    color_type: str
+    orientation: int = 1  # EXIF orientation, 1 = upright
+    progressive: bool = False  # progressive JPEG or interlaced PNG
+    icc_profile: bool = False
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+    def decoded_pixels(self, target: int) -> int:
+        """Pixels the decoder materializes for a ``target`` px working image; JPEGs decode at DCT scale."""
+        scale = jpeg_scale(self.width, self.height, target) if self.format == "jpeg" else 1
+        return -(-self.width // scale) * -(-self.height // scale)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _read_exact(f: BinaryIO, n: int) -> bytes:
+    data = f.read(n)
+    if len(data) != n:
+        raise TruncatedHeader("truncated image header")
+    return data
+
+
+def _exif_orientation(payload: bytes) -> int:
+    """Orientation tag from an APP1/eXIf TIFF block, 1 if absent or unreadable."""
+    if len(payload) < 8 or payload[:2] not in (b"II", b"MM"):
+        return 1
+    endian = "<" if payload[:2] == b"II" else ">"
+    (ifd,) = struct.unpack_from(endian + "I", payload, 4)
+    if ifd + 2 > len(payload):
+        return 1
+    (count,) = struct.unpack_from(endian + "H", payload, ifd)
+    for i in range(count):
+        entry = ifd + 2 + 12 * i
+        if entry + 12 > len(payload):
+            break
+        tag, kind, _ = struct.unpack_from(endian + "HHI", payload, entry)
+        if tag == EXIF_ORIENTATION and kind == 3:  # SHORT
+            (value,) = struct.unpack_from(endian + "H", payload, entry + 8)
+            return value if 1 <= value <= 8 else 1
+    return 1
+
+
+def _probe_png(f: BinaryIO) -> ImageInfo:
+    length, kind = struct.unpack(">I4s", _read_exact(f, 8))
+    if kind != b"IHDR" or length != 13:
+        raise ProbeError("PNG does not start with IHDR")
+    width, height, bit_depth, color, _, _, interlace = struct.unpack(">IIBBBBB", _read_exact(f, 13))
+    if color not in PNG_COLOR_TYPES:
+        raise ProbeError(f"unknown PNG color type {color}")
+    color_type, channels = PNG_COLOR_TYPES[color]
+    info = ImageInfo("png", width, height, bit_depth, channels, color_type, progressive=interlace == 1)
+    f.read(4)  # IHDR CRC
+    # Ancillary chunks we care about must precede the image data.
+    while True:
+        length, kind = struct.unpack(">I4s", _read_exact(f, 8))
+        if kind in (b"IDAT", b"IEND"):
+            break
+        if kind == b"eXIf":
+            info.orientation = _exif_orientation(_read_exact(f, length))
+        else:
+            f.seek(length, 1)
+            info.icc_profile |= kind == b"iCCP"
+        _read_exact(f, 4)
+    return info
+
+
+def _probe_jpeg(f: BinaryIO) -> ImageInfo:
+    orientation = 1
+    icc_profile = False
+    while True:
+        byte = _read_exact(f, 1)
+        if byte != b"\xff":
+            raise ProbeError("corrupt JPEG marker stream")
+        marker = _read_exact(f, 1)[0]
+        while marker == 0xFF:  # fill bytes
+            marker = _read_exact(f, 1)[0]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue
+        if marker in (0xD9, 0xDA):
+            raise ProbeError("JPEG has no frame header")
+        (length,) = struct.unpack(">H", _read_exact(f, 2))
+        if length < 2:
+            raise ProbeError("corrupt JPEG segment length")
+        if marker in JPEG_SOF:
+            precision, height, width, components = struct.unpack(">BHHB", _read_exact(f, 6))
+            color_type = JPEG_COLOR_TYPES.get(components)
+            if color_type is None:
+                raise ProbeError(f"unsupported JPEG component count {components}")
+            return ImageInfo(
+                "jpeg", width, height, precision, components, color_type,
+                orientation=orientation, progressive=marker in JPEG_PROGRESSIVE, icc_profile=icc_profile,
+            )
+        if marker == 0xE1 and orientation == 1:
+            payload = _read_exact(f, length - 2)
+            if payload.startswith(b"Exif\x00\x00"):
+                orientation = _exif_orientation(payload[6:])
+        elif marker == 0xE2:
+            payload = _read_exact(f, length - 2)
+            icc_profile |= payload.startswith(b"ICC_PROFILE\x00")
+        else:
+            f.seek(length - 2, 1)
+
+
+def probe(f: BinaryIO) -> ImageInfo:
+    """Parse the header of the image at the current position of ``f``.
+
+    Raises ``TruncatedHeader`` if ``f`` ends first, so callers holding only
+    the start of a stream can retry once more has arrived.
+    """
+    magic = f.read(8)
+    if len(magic) < 8:
+        raise TruncatedHeader("truncated image header")
+    if magic == PNG_SIGNATURE:
+        return _probe_png(f)
+    if magic[:2] == b"\xff\xd8":
+        f.seek(-6, 1)
+        return _probe_jpeg(f)
+    raise ProbeError("not a PNG or JPEG file")
+
+
+@dataclass
+class Admission:
+    tier: str  # "small", "standard" or "large"
+    memory_estimate: int  # peak bytes decoding this image to working size takes
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def admit(info: ImageInfo, settings: Settings) -> Admission:
+    """Check ``info`` against the size limits and pick a processing tier.
+
+    Raises ``ImageRejected`` for images the pipeline won't take, including
+    decompression bombs, whose tiny files declare huge canvases.
+    """
+    if info.width == 0 or info.height == 0:
+        raise ImageRejected("image has zero width or height")
+    if max(info.width, info.height) > settings.max_image_dimension:
+        raise ImageRejected(f"image side exceeds {settings.max_image_dimension} px")
+    if min(info.width, info.height) < settings.min_image_dimension:
+        raise ImageRejected(
+            f"image is too small ({info.width}x{info.height}); each side needs {settings.min_image_dimension} px"
+        )
+    if info.pixels > settings.max_image_pixels:
+        raise ImageRejected(
+            f"image is {info.pixels / 1e6:.0f} MP, the limit is {settings.max_image_pixels / 1e6:.0f} MP"
+        )
+    if info.pixels <= settings.small_image_pixels:
+        tier = "small"
+    elif info.pixels <= settings.large_image_pixels:
+        tier = "standard"
+    else:
+        tier = "large"
+    return Admission(tier, memory_estimate(info, settings.working_size))
+
+
+def memory_estimate(info: ImageInfo, target: int) -> int:
+    """Peak bytes decoding ``info`` to ``target`` px on its longest side takes.
+
+    The decoder's output in its native layout, an 8-bit RGBA copy if it
+    needs converting, and float32 RGBA working buffers.
+    """
+    decoded = info.decoded_pixels(target)
+    native = decoded * info.channels * (2 if info.bit_depth > 8 else 1)
+    kept = (info.format, info.color_type) in KEPT_LAYOUTS and info.bit_depth <= 8
+    working = target**2 * 4 * 4
+    return native + (0 if kept else decoded * 4) + 2 * working
@@ -0,0 +1,48 @@
+"""Thumbnail pyramids for grid display.
+
+Each level fits inside a square of its size. The largest level is
+resampled once from the input with Lanczos; every smaller level is a 2x
+box reduction of the one above it, so the full-size pixels are only ever
+read once per image.
+"""
+
+from __future__ import annotations
+
+import io
+
+from PIL import Image
+
+from ..blobs import blob_url, put_bytes
+
+PYRAMID_SIZES = (512, 256, 128)
+THUMBNAIL_QUALITY = 82
+
+
+def _encode(image: Image.Image) -> str:
+    buf = io.BytesIO()
+    image.save(buf, "WEBP", quality=THUMBNAIL_QUALITY, method=4)
+    return put_bytes(buf.getvalue(), "webp")
+
+
+def _fit(image: Image.Image, size: int) -> Image.Image:
+    longest = max(image.size)
+    if longest <= size:
+        return image
+    scale = size / longest
+    return image.resize(
+        (max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+        Image.Resampling.LANCZOS,
+        reducing_gap=2.0,
+    )
+
+
+def build_pyramid(image: Image.Image, full_url: str) -> dict[str, str]:
+    """Encode the thumbnail levels of ``image`` and return ``{size: url}`` plus ``full``."""
+    levels: dict[str, str] = {}
+    level = _fit(image, PYRAMID_SIZES[0])
+    for size in PYRAMID_SIZES:
+        if max(level.size) > size:
+            level = level.reduce(2) if max(level.size) >= 2 * size else _fit(level, size)
+        levels[str(size)] = blob_url(_encode(level))
+    levels["full"] = full_url
+    return levels
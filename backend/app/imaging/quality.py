@@ -0,0 +1,144 @@
+"""Preflight image quality analysis.
+
+Cheap statistics that predict whether reconstruction has a chance: edge
+energy (variance of the Laplacian), exposure (luma histogram), how much of
+the frame the subject fills, and sensor noise (Immerkaer's estimator). All
+are computed with array slicing over one downscaled greyscale copy, so the
+whole report costs a few milliseconds. Exposure is judged on the subject
+alone: a blown-out white sweep is what product photos are shot on. In a
+cut-out (RGBA with transparency) only the opaque pixels are measured at all.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import asdict, dataclass, field
+
+import numpy as np
+from PIL import Image
+
+from .probe import ImageRejected
+
+ANALYSIS_SIZE = 512
+# Rec. 709 luma weights on 8-bit sRGB codes.
+LUMA = np.array([0.2126, 0.7152, 0.0722], dtype=np.float32)
+# Colour distance from the border colour above which a pixel counts as subject.
+SUBJECT_DISTANCE = 40.0
+# Below this coverage there are too few subject pixels to judge exposure by; the whole frame is used.
+MIN_SUBJECT = 0.01
+
+
+@dataclass
+class QualityReport:
+    score: float  # 0 (unusable) .. 1
+    sharpness: float  # variance of the 4-neighbour Laplacian on the 0-255 luma scale
+    mean_luma: float  # of the subject, as are the clipping fractions
+    shadows_clipped: float  # fraction of pixels at or below code 5
+    highlights_clipped: float  # fraction of pixels at or above code 250
+    coverage: float  # fraction of the frame occupied by the subject
+    noise: float  # estimated noise standard deviation, 0-255 scale
+    issues: list[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class QualityRejected(ImageRejected):
+    def __init__(self, report: QualityReport, min_score: float) -> None:
+        reasons = ", ".join(report.issues) or "low overall quality"
+        super().__init__(f"photo is unlikely to reconstruct well ({reasons}; score {report.score} < {min_score})")
+        self.report = report
+
+
+def _ramp(value: float, bad: float, good: float) -> float:
+    """0 at ``bad``, 1 at ``good``, linear in between (either direction)."""
+    t = (value - bad) / (good - bad)
+    return min(1.0, max(0.0, t))
+
+
+def _interior(mask: np.ndarray) -> np.ndarray:
+    """``mask[1:-1, 1:-1]`` where the whole 3x3 neighbourhood is in ``mask``."""
+    h, w = mask.shape
+    if h < 3 or w < 3:
+        return np.zeros((max(h - 2, 0), max(w - 2, 0)), dtype=bool)
+    inner = np.ones((h - 2, w - 2), dtype=bool)
+    for dy in range(3):
+        for dx in range(3):
+            inner &= mask[dy : dy + h - 2, dx : dx + w - 2]
+    return inner
+
+
+def _edges(gray: np.ndarray, inner: np.ndarray | None) -> tuple[float, float]:
+    """Laplacian variance and noise estimate of ``gray`` over ``inner`` (default: everywhere)."""
+    if min(gray.shape) < 3:
+        # No 3x3 neighbourhood to measure; a sliver this thin has no usable detail either.
+        return 0.0, 0.0
+    centre = gray[1:-1, 1:-1]
+    up, down, left, right = gray[:-2, 1:-1], gray[2:, 1:-1], gray[1:-1, :-2], gray[1:-1, 2:]
+    laplacian = up + down + left + right - 4 * centre
+    # Immerkaer (1996): the 3x3 kernel [1 -2 1; -2 4 -2; 1 -2 1] cancels image structure up to second order.
+    corners = gray[:-2, :-2] + gray[:-2, 2:] + gray[2:, :-2] + gray[2:, 2:]
+    residual = corners - 2 * (up + down + left + right) + 4 * centre
+    if inner is None or not inner.any():
+        inner = np.ones(centre.shape, dtype=bool)
+    sharpness = float(laplacian[inner].var())
+    noise = float(math.sqrt(math.pi / 2) * np.abs(residual[inner]).mean() / 6)
+    return sharpness, noise
+
+
+def assess(image: Image.Image) -> QualityReport:
+    """Score an 8-bit L/RGB/RGBA working image."""
+    small = image.copy()
+    small.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE), Image.Resampling.BOX)
+    pixels = np.asarray(small)
+    rgb = pixels[..., :3].astype(np.float32) if pixels.ndim == 3 else pixels.astype(np.float32)[..., None]
+    gray = rgb @ LUMA if rgb.shape[-1] == 3 else rgb[..., 0]
+
+    cut_out = small.mode == "RGBA" and pixels[..., 3].min() < 128
+    if cut_out:
+        # Resizing premultiplies alpha, so transparent pixels come back black: measure opaque ones only.
+        subject = pixels[..., 3] >= 128
+    else:
+        border = np.concatenate([rgb[0], rgb[-1], rgb[:, 0], rgb[:, -1]])
+        background = np.median(border, axis=0)
+        subject = np.sqrt(((rgb - background) ** 2).sum(axis=-1)) > SUBJECT_DISTANCE
+    coverage = float(subject.mean())
+
+    # Edge statistics over the whole frame, or a cut-out's opaque interior (its outline is not detail).
+    sharpness, noise = _edges(gray, _interior(subject) if cut_out else None)
+
+    # Exposure of the subject; the whole frame only when there is (next to) none to go by.
+    tone = gray[subject] if cut_out or coverage >= MIN_SUBJECT else gray.ravel()
+    if tone.size == 0:
+        tone = gray.ravel()
+    histogram = np.bincount(np.clip(tone, 0, 255).astype(np.uint8), minlength=256) / tone.size
+    mean_luma = float(histogram @ np.arange(256))
+    shadows = float(histogram[:6].sum())
+    highlights = float(histogram[250:].sum())
+
+    scores = {
+        "blurry": _ramp(math.log10(sharpness + 1), math.log10(15), math.log10(150)),
+        "underexposed": _ramp(mean_luma, 25, 70) * _ramp(shadows, 0.5, 0.1),
+        "overexposed": _ramp(mean_luma, 245, 215) * _ramp(highlights, 0.6, 0.25),
+        "subject too small": _ramp(coverage, 0.01, 0.08),
+        "noisy": _ramp(noise, 18, 6),
+    }
+    # Geometric mean: one failing aspect drags the score down hard.
+    score = math.prod(max(s, 1e-3) for s in scores.values()) ** (1 / len(scores))
+    issues = [name for name, s in scores.items() if s < 0.5]
+    return QualityReport(
+        score=round(score, 3),
+        sharpness=round(sharpness, 2),
+        mean_luma=round(mean_luma, 2),
+        shadows_clipped=round(shadows, 4),
+        highlights_clipped=round(highlights, 4),
+        coverage=round(coverage, 4),
+        noise=round(noise, 3),
+        issues=issues,
+    )
+
+
+def check(report: QualityReport, min_score: float) -> None:
+    """Raise ``QualityRejected`` if ``report`` scores below ``min_score``."""
+    if report.score < min_score:
+        raise QualityRejected(report, min_score)
@@ -0,0 +1,89 @@
+"""Memory budget for decoding uploads.
+
+Every admitted image carries an estimate of the memory its decode takes
+(``probe.admit``). A decode reserves that much of
+``PROTOSCALE_DECODE_MEMORY_BUDGET`` while it runs, and decodes that would
+overdraw the budget wait their turn, first come first served, so a burst of
+large uploads queues instead of exhausting memory. An image larger than the
+whole budget runs alone. ``small``-tier images cost too little to count and
+never wait, so phone snapshots aren't held up behind a panorama.
+
+Incremental JPEG decoders hold their frame for as long as the body takes to
+arrive; they only start if the budget has room right away, otherwise the
+upload is decoded from the spool once complete, after waiting its turn.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from .. import metrics
+from ..config import get_settings
+from ..imaging.probe import Admission
+
+reserved_bytes = metrics.gauge("protoscale_decode_memory_reserved_bytes", "Decode memory currently reserved.")
+decode_waits = metrics.counter("protoscale_decode_waits_total", "Decodes that waited for the memory budget.")
+
+
+class MemoryBudget:
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.reserved = 0
+        self._queue: list[object] = []
+        self._changed = asyncio.Condition()
+
+    def cost(self, admission: Admission) -> int:
+        """What decoding an image takes out of the budget: nothing when small or unlimited, at most all of it."""
+        if not self.limit or admission.tier == "small":
+            return 0
+        return min(admission.memory_estimate, self.limit)
+
+    def try_reserve(self, admission: Admission) -> int | None:
+        """Reserve the image's cost now if nobody is waiting and it fits; returns the amount, for ``release``."""
+        amount = self.cost(admission)
+        if amount and (self._queue or self.reserved + amount > self.limit):
+            return None
+        self._take(amount)
+        return amount
+
+    async def release(self, amount: int) -> None:
+        if not amount:
+            return
+        async with self._changed:
+            self._take(-amount)
+            self._changed.notify_all()
+
+    @asynccontextmanager
+    async def reserve(self, admission: Admission) -> AsyncIterator[None]:
+        """Hold the image's cost for the duration of the block, waiting in line until it fits."""
+        amount = self.cost(admission)
+        if amount:
+            async with self._changed:
+                if self._queue or self.reserved + amount > self.limit:
+                    decode_waits.inc()
+                ticket = object()
+                self._queue.append(ticket)
+                try:
+                    await self._changed.wait_for(
+                        lambda: self._queue[0] is ticket and self.reserved + amount <= self.limit
+                    )
+                finally:
+                    self._queue.remove(ticket)
+                    self._changed.notify_all()
+                self._take(amount)
+        try:
+            yield
+        finally:
+            await self.release(amount)
+
+    def _take(self, amount: int) -> None:
+        self.reserved += amount
+        reserved_bytes.set(self.reserved)
+
+
+@lru_cache
+def get_budget() -> MemoryBudget:
+    return MemoryBudget(get_settings().decode_memory_budget)
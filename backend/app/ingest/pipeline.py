@@ -0,0 +1,167 @@
+"""Streaming ingest: spool, hash, probe and decode an upload while it arrives.
+
+The request body flows through a chain of async generator stages, each
+passing chunks on as it sees them::
+
+    ChunkSpool.chunks  ->  _probed  ->  _decoded  ->  drain  ->  quality gate
+
+The spool writes and hashes each fixed-size chunk; the probe stage parses
+the header as soon as enough of it is in (rejecting oversized images
+before the rest of the body is even read); the decode stage feeds JPEGs to
+an incremental decoder at DCT scale. By the time the last byte lands, the
+working image only needs its final resize. PNGs, which Pillow can't decode
+incrementally, are decoded from the spool once complete. Decodes draw on
+a memory budget (``budget.py``) sized by each image's admission estimate.
+
+The working image is then scored by the preflight quality analyzer, and
+photos too blurred, badly exposed or empty to reconstruct from are refused
+before a project is created or any further work is spent on them. Exact
+repeats of an upload whose results exist (``dedup``) skip both: their hash
+is known with the last byte, before any decode is finished.
+"""
+
+from __future__ import annotations
+
+import io
+import time
+from collections.abc import AsyncIterable, AsyncIterator, Callable
+from dataclasses import dataclass
+
+from starlette.concurrency import run_in_threadpool
+
+from .. import metrics
+from ..config import MiB, Settings
+from ..imaging.decode import DecodedImage, IncrementalDecoder, load_working_image
+from ..imaging.probe import Admission, ImageInfo, ProbeError, TruncatedHeader, admit, probe
+from ..imaging.quality import QualityReport, assess, check
+from .budget import get_budget
+from .stream import ChunkSpool, SpoolStats, upload_bytes, uploads_total
+
+# Give up probing in-stream past this much header; the file is probed once complete instead.
+PROBE_HEAD_LIMIT = 1 * MiB
+
+ready_seconds = metrics.counter(
+    "protoscale_ingest_ready_seconds_total", "Sum of time from an upload's last byte to its working image being ready."
+)
+ready_count = metrics.counter("protoscale_ingest_ready_total", "Uploads counted in protoscale_ingest_ready_seconds_total.")
+
+
+@dataclass
+class IngestResult:
+    stats: SpoolStats
+    info: ImageInfo
+    admission: Admission
+    # Both None for a repeat upload whose results already exist.
+    decoded: DecodedImage | None
+    # True if the working image came out of the incremental decoder rather than a decode of the spool.
+    decoded_in_stream: bool
+    quality: QualityReport | None
+    # Seconds from the last body byte to the working image being decoded and scored.
+    ready_after_last_byte: float
+
+
+class IngestPipeline:
+    def __init__(self, spool: ChunkSpool, settings: Settings) -> None:
+        self.spool = spool
+        self.settings = settings
+        self.info: ImageInfo | None = None
+        self.admission: Admission | None = None
+        self.decoder: IncrementalDecoder | None = None
+        self._head: bytearray | None = bytearray()
+        # Decode memory budget held by the incremental decoder.
+        self._reserved: int | None = None
+        # Everything received up to the chunk that completed the header, for the decoder to start from.
+        self._backlog = b""
+
+    async def _probed(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        async for chunk in chunks:
+            if self._head is not None:
+                self._head += chunk
+                try:
+                    self.info = probe(io.BytesIO(self._head))
+                except TruncatedHeader:
+                    if len(self._head) >= PROBE_HEAD_LIMIT:
+                        self._head = None
+                else:
+                    self.admission = admit(self.info, self.settings)
+                    self._backlog = bytes(self._head)
+                    self._head = None
+            yield chunk
+
+    async def _decoded(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        failed = False
+        async for chunk in chunks:
+            if self.decoder is None and not failed and self.info is not None and self.info.format == "jpeg":
+                # The decoder holds its frame until the body is in; without room for it now, decode the spool later.
+                self._reserved = get_budget().try_reserve(self.admission)
+                if self._reserved is None:
+                    failed = True
+                    yield chunk
+                    continue
+                self.decoder = IncrementalDecoder(self.info, self.settings.working_size)
+                chunk, self._backlog = self._backlog, b""
+            if self.decoder is not None:
+                try:
+                    await run_in_threadpool(self.decoder.feed, chunk)
+                except OSError:
+                    # Retried from the spool once complete, where corrupt data surfaces properly.
+                    self.decoder, failed = None, True
+            yield chunk
+
+    def _probe_file(self) -> tuple[ImageInfo, Admission]:
+        self.spool.file.seek(0)
+        info = probe(self.spool.file)
+        return info, admit(info, self.settings)
+
+    def _decode_file(self) -> DecodedImage:
+        self.spool.file.seek(0)
+        try:
+            return load_working_image(self.spool.file, self.info, self.settings.working_size)
+        except (OSError, SyntaxError) as exc:
+            raise ProbeError(f"cannot decode image ({exc})") from None
+
+    async def run(self, stream: AsyncIterable[bytes], known: Callable[[str], bool] | None = None) -> IngestResult:
+        """Drain ``stream`` through the stages.
+
+        Raises ``ProbeError`` / ``ImageRejected`` for unusable images, as
+        early in the stream as the header allows, and ``QualityRejected``
+        for photos that fail the quality gate. ``known`` is asked about the
+        body's SHA-256 once it is in; if it answers true the decode and the
+        quality gate are skipped and the result has neither.
+        """
+        started = time.perf_counter()
+        try:
+            async for _ in self._decoded(self._probed(self.spool.chunks(stream))):
+                pass
+            last_byte = time.perf_counter()
+            if self.info is None or self.admission is None:
+                self.info, self.admission = await run_in_threadpool(self._probe_file)
+            stats = SpoolStats(
+                bytes=self.spool.size,
+                seconds=last_byte - started,
+                peak_buffer_bytes=self.spool.peak_buffer_bytes,
+                sha256=self.spool.sha256.hexdigest(),
+            )
+            upload_bytes.inc(self.spool.size)
+            uploads_total.inc()
+            if known is not None and known(stats.sha256):
+                return IngestResult(stats, self.info, self.admission, None, False, None, time.perf_counter() - last_byte)
+            decoded = None
+            if self.decoder is not None:
+                try:
+                    decoded = await run_in_threadpool(self.decoder.close)
+                except OSError:
+                    decoded = None
+        finally:
+            if self._reserved:
+                await get_budget().release(self._reserved)
+        decoded_in_stream = decoded is not None
+        if decoded is None:
+            async with get_budget().reserve(self.admission):
+                decoded = await run_in_threadpool(self._decode_file)
+        quality = await run_in_threadpool(assess, decoded.image)
+        ready = time.perf_counter() - last_byte
+        ready_seconds.inc(ready)
+        ready_count.inc()
+        check(quality, self.settings.min_quality_score)
+        return IngestResult(stats, self.info, self.admission, decoded, decoded_in_stream, quality, ready)
@@ -0,0 +1,226 @@
+"""Offset-addressed resumable uploads.
+
+An upload is created with its total size, receives ``PATCH`` chunks that
+must start exactly at the committed offset, and is finalized into a project
+once complete. State lives in ``<data_dir>/uploads/<id>/``: the body being
+assembled in ``data.part`` and the committed offset in ``state.json``. Bytes
+past the committed offset (from a chunk whose connection dropped) are
+truncated away before the next chunk is appended, so a client only ever
+needs to ask for the offset and carry on from there.
+
+The content hash is updated as chunks arrive; only if the process restarted
+mid-upload is the assembled file re-read to compute it. Uploads nobody has
+touched for ``PROTOSCALE_RESUMABLE_TTL`` are discarded when the next one is
+created.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections.abc import AsyncIterable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from starlette.concurrency import run_in_threadpool
+
+from .. import metrics
+from ..config import get_settings
+from .stream import upload_bytes
+
+uploads_expired = metrics.counter(
+    "protoscale_resumable_expired_total", "Resumable uploads discarded after going unfinished for the TTL."
+)
+
+
+class UploadNotFound(KeyError):
+    pass
+
+
+class OffsetMismatch(Exception):
+    def __init__(self, expected: int) -> None:
+        super().__init__(f"chunk must start at offset {expected}")
+        self.expected = expected
+
+
+class ChunkOverflow(Exception):
+    pass
+
+
+@dataclass
+class ResumableUpload:
+    id: str
+    filename: str
+    content_type: str
+    size: int
+    offset: int
+    created_at: float
+    updated_at: float
+    remove_background: bool = True
+    enhanced_detail: bool = False
+    # Existing project to add the finished file to; a new one is created if empty.
+    project_id: str | None = None
+
+    @property
+    def dir(self) -> Path:
+        return upload_dir(self.id)
+
+    @property
+    def part_path(self) -> Path:
+        return self.dir / "data.part"
+
+    @property
+    def complete(self) -> bool:
+        return self.offset == self.size
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+_locks: dict[str, asyncio.Lock] = {}
+# upload id -> (offset the hash covers, running hash)
+_hashers: dict[str, tuple[int, Any]] = {}
+
+
+def upload_dir(upload_id: str) -> Path:
+    return get_settings().data_dir / "uploads" / upload_id
+
+
+def lock_for(upload: ResumableUpload) -> asyncio.Lock:
+    """Serializes changes to ``upload``; dropped along with it by ``discard_upload``.
+
+    Takes a loaded upload so ids that name none never get a lock. Holders
+    should load the upload again once they have the lock.
+    """
+    return _locks.setdefault(upload.id, asyncio.Lock())
+
+
+def _save(upload: ResumableUpload) -> None:
+    path = upload.dir / "state.json"
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(upload.to_dict()))
+    os.replace(tmp, path)
+
+
+def create_upload(
+    filename: str,
+    content_type: str,
+    size: int,
+    remove_background: bool = True,
+    enhanced_detail: bool = False,
+    project_id: str | None = None,
+) -> ResumableUpload:
+    _expire()
+    now = time.time()
+    upload = ResumableUpload(
+        id=uuid.uuid4().hex,
+        filename=filename,
+        content_type=content_type,
+        size=size,
+        offset=0,
+        created_at=now,
+        updated_at=now,
+        remove_background=remove_background,
+        enhanced_detail=enhanced_detail,
+        project_id=project_id,
+    )
+    upload.dir.mkdir(parents=True)
+    upload.part_path.touch()
+    _save(upload)
+    _hashers[upload.id] = (0, hashlib.sha256())
+    return upload
+
+
+def _expire() -> None:
+    """Discard uploads idle for longer than the TTL, unless a request is working on one."""
+    root = get_settings().data_dir / "uploads"
+    if not root.is_dir():
+        return
+    cutoff = time.time() - get_settings().resumable_ttl
+    for path in root.iterdir():
+        lock = _locks.get(path.name)
+        if lock is not None and lock.locked():
+            continue
+        try:
+            upload = load_upload(path.name)
+        except UploadNotFound:
+            continue
+        if upload.updated_at < cutoff:
+            discard_upload(upload)
+            uploads_expired.inc()
+
+
+def load_upload(upload_id: str) -> ResumableUpload:
+    if len(upload_id) != 32 or not all(c in "0123456789abcdef" for c in upload_id):
+        raise UploadNotFound(upload_id)
+    try:
+        return ResumableUpload(**json.loads((upload_dir(upload_id) / "state.json").read_text()))
+    except FileNotFoundError:
+        raise UploadNotFound(upload_id) from None
+
+
+async def append_chunk(upload: ResumableUpload, offset: int, stream: AsyncIterable[bytes]) -> int:
+    """Append a chunk starting at ``offset`` and commit it; returns bytes written.
+
+    The new offset is only committed once the whole chunk is on disk and
+    fsynced, so a dropped connection leaves the previous offset in force.
+    """
+    if offset != upload.offset:
+        raise OffsetMismatch(upload.offset)
+    hashed_to, running = _hashers.get(upload.id, (-1, None))
+    # Hash a copy so an aborted chunk doesn't poison the committed state.
+    hasher = running.copy() if running is not None and hashed_to == upload.offset else None
+    f = await run_in_threadpool(open, upload.part_path, "r+b")
+
+    def write(data: bytes) -> None:
+        f.write(data)
+        if hasher is not None:
+            hasher.update(data)
+
+    try:
+        await run_in_threadpool(f.truncate, upload.offset)
+        f.seek(upload.offset)
+        written = 0
+        async for data in stream:
+            if not data:
+                continue
+            written += len(data)
+            if upload.offset + written > upload.size:
+                raise ChunkOverflow(f"chunk runs past declared size {upload.size}")
+            await run_in_threadpool(write, data)
+        await run_in_threadpool(f.flush)
+        await run_in_threadpool(os.fsync, f.fileno())
+    finally:
+        f.close()
+    upload.offset += written
+    upload.updated_at = time.time()
+    _save(upload)
+    if hasher is not None:
+        _hashers[upload.id] = (upload.offset, hasher)
+    upload_bytes.inc(written)
+    return written
+
+
+def content_hash(upload: ResumableUpload, chunk_size: int) -> str:
+    """SHA-256 of the assembled body, re-reading it only if the running hash was lost."""
+    hashed_to, hasher = _hashers.get(upload.id, (-1, None))
+    if hasher is not None and hashed_to == upload.offset:
+        return hasher.hexdigest()
+    hasher = hashlib.sha256()
+    with open(upload.part_path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def discard_upload(upload: ResumableUpload) -> None:
+    for path in upload.dir.iterdir():
+        path.unlink()
+    upload.dir.rmdir()
+    _locks.pop(upload.id, None)
+    _hashers.pop(upload.id, None)
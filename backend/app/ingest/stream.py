@@ -0,0 +1,136 @@
+"""Bounded-memory spooling of streamed request bodies."""
+
+from __future__ import annotations
+
+import hashlib
+import shutil
+import tempfile
+from collections.abc import AsyncIterable, AsyncIterator
+from dataclasses import dataclass
+from pathlib import Path
+
+from starlette.concurrency import run_in_threadpool
+
+from .. import metrics
+
+upload_bytes = metrics.counter("protoscale_upload_bytes_total", "Request body bytes spooled by uploads.")
+uploads_total = metrics.counter("protoscale_uploads_total", "Completed uploads.")
+inflight_buffer = metrics.gauge(
+    "protoscale_upload_buffer_bytes", "Request body bytes currently held in memory across uploads."
+)
+peak_inflight_buffer = metrics.gauge(
+    "protoscale_upload_buffer_peak_bytes", "High-water mark of protoscale_upload_buffer_bytes."
+)
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, limit: int) -> None:
+        super().__init__(f"upload exceeds {limit} bytes")
+        self.limit = limit
+
+
+@dataclass
+class SpoolStats:
+    bytes: int
+    seconds: float
+    peak_buffer_bytes: int
+    sha256: str
+
+    @property
+    def bytes_per_sec(self) -> float:
+        return self.bytes / self.seconds if self.seconds > 0 else 0.0
+
+    def to_dict(self) -> dict[str, float]:
+        return {
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 4),
+            "bytes_per_sec": round(self.bytes_per_sec, 1),
+            "peak_buffer_bytes": self.peak_buffer_bytes,
+        }
+
+
+class ChunkSpool:
+    """Re-chunks an incoming byte stream into fixed-size writes to a spooled temp file.
+
+    Each chunk is hashed as it is written, so the SHA-256 of the body is
+    known the moment the last byte lands, without a second read.
+
+    At most one chunk of body plus the spool's in-memory head (until it rolls
+    over to disk) is resident at any time; ``peak_buffer_bytes`` records the
+    largest that footprint got.
+    """
+
+    def __init__(self, chunk_size: int, spool_max_size: int, max_bytes: int, tmp_dir: Path) -> None:
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.chunk_size = chunk_size
+        self.spool_max_size = spool_max_size
+        self.max_bytes = max_bytes
+        self.file = tempfile.SpooledTemporaryFile(max_size=spool_max_size, dir=tmp_dir)
+        self.size = 0
+        self.peak_buffer_bytes = 0
+        self.sha256 = hashlib.sha256()
+        self._buffer = bytearray()
+        self._written = 0
+        self._accounted = 0
+
+    def _spooled_in_memory(self) -> int:
+        return 0 if self.file._rolled else self._written
+
+    def _account(self) -> None:
+        resident = len(self._buffer) + self._spooled_in_memory()
+        self.peak_buffer_bytes = max(self.peak_buffer_bytes, resident)
+        inflight_buffer.inc(resident - self._accounted)
+        peak_inflight_buffer.set_max(inflight_buffer.value)
+        self._accounted = resident
+
+    def _write_and_hash(self, chunk: bytes) -> None:
+        self.file.write(chunk)
+        self.sha256.update(chunk)
+
+    async def _write_chunk(self, chunk: bytes) -> None:
+        await run_in_threadpool(self._write_and_hash, chunk)
+        self._written += len(chunk)
+
+    async def chunks(self, stream: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+        """Spool ``stream`` and yield each fixed-size chunk once it is written.
+
+        This is the source stage of the ingest pipeline: downstream stages
+        see exactly the bytes on disk, in order, one chunk at a time.
+        """
+        async for data in stream:
+            self.size += len(data)
+            if self.size > self.max_bytes:
+                raise UploadTooLarge(self.max_bytes)
+            view = memoryview(data)
+            while view:
+                take = self.chunk_size - len(self._buffer)
+                self._buffer += view[:take]
+                view = view[take:]
+                self._account()
+                if len(self._buffer) == self.chunk_size:
+                    yield await self._emit()
+        if self._buffer:
+            yield await self._emit()
+
+    async def _emit(self) -> bytes:
+        chunk = bytes(self._buffer)
+        self._buffer.clear()
+        await self._write_chunk(chunk)
+        self._account()
+        return chunk
+
+    async def persist(self, dest: Path) -> None:
+        """Copy the fully spooled body to ``dest`` one chunk at a time."""
+
+        def copy() -> None:
+            self.file.seek(0)
+            with open(dest, "wb") as out:
+                shutil.copyfileobj(self.file, out, self.chunk_size)
+
+        await run_in_threadpool(copy)
+
+    def close(self) -> None:
+        inflight_buffer.dec(self._accounted)
+        self._accounted = 0
+        self.file.close()
+
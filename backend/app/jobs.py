@@ -0,0 +1,166 @@
+"""Background jobs with coalesced progress.
+
+A job is a coroutine running on the event loop (handing CPU work to the
+process pool) plus a small mutable state record. Progress updates only
+overwrite that record and flag each watcher; they never queue messages.
+A watcher (one per Server-Sent Events stream) wakes on the flag, reads the
+latest state and then sleeps for ``event_interval`` before looking again,
+so however fast a job reports, each client gets at most one event per
+interval and the loop does a constant amount of work per watcher. Jobs
+producing several results publish them in ``items`` as they finish; since
+every event carries all of them so far, coalescing never loses one.
+
+Jobs live in memory and are forgotten ``JOB_RETENTION`` seconds after they
+finish; a restarted server has no record of earlier jobs.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from . import metrics
+from .config import get_settings
+
+JOB_RETENTION = 600.0
+TERMINAL = ("done", "failed")
+
+jobs_running = metrics.gauge("protoscale_jobs_running", "Background jobs currently running.")
+job_events = metrics.counter("protoscale_job_events_total", "Progress events sent to job watchers.")
+job_updates = metrics.counter("protoscale_job_updates_total", "Progress updates reported by jobs.")
+
+
+class JobNotFound(KeyError):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    project_id: str
+    # What the job was asked to do; a request with other params doesn't join it.
+    params: dict[str, Any] = field(default_factory=dict)
+    status: str = "queued"  # queued, running, done, failed
+    completed: int = 0
+    total: int = 0
+    message: str = ""
+    # Partial results, slot per item, None until it's ready.
+    items: list[Any] | None = None
+    result: Any = None
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+    # Bumped on every update; watchers compare it to what they last sent.
+    version: int = 0
+    _watchers: set[asyncio.Event] = field(default_factory=set, repr=False)
+
+    @property
+    def progress(self) -> float:
+        if self.status == "done":
+            return 1.0
+        return self.completed / self.total if self.total else 0.0
+
+    def snapshot(self) -> dict[str, Any]:
+        state = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "project_id": self.project_id,
+            "params": self.params,
+            "status": self.status,
+            "progress": round(self.progress, 4),
+            "completed": self.completed,
+            "total": self.total,
+            "message": self.message,
+        }
+        if self.status == "done":
+            state["result"] = self.result
+        elif self.items is not None:
+            state["items"] = self.items
+        if self.error:
+            state["error"] = self.error
+        return state
+
+    def update(self, **changes: Any) -> None:
+        """Change the job's state and wake its watchers; cheap enough to call per work item."""
+        for name, value in changes.items():
+            setattr(self, name, value)
+        self.version += 1
+        job_updates.inc()
+        for event in self._watchers:
+            event.set()
+
+    async def watch(self, interval: float | None = None) -> AsyncIterator[dict[str, Any]]:
+        """Yield snapshots as the job changes, at most one per ``interval``, ending with the terminal one."""
+        interval = get_settings().event_interval if interval is None else interval
+        event = asyncio.Event()
+        self._watchers.add(event)
+        try:
+            seen = -1
+            while True:
+                if self.version == seen:
+                    await event.wait()
+                event.clear()
+                seen = self.version
+                job_events.inc()
+                yield self.snapshot()
+                if self.status in TERMINAL:
+                    return
+                await asyncio.sleep(interval)
+        finally:
+            self._watchers.discard(event)
+
+
+_jobs: dict[str, Job] = {}
+_tasks: set[asyncio.Task] = set()
+
+
+def _expire() -> None:
+    cutoff = time.time() - JOB_RETENTION
+    for job_id in [j.id for j in _jobs.values() if j.finished_at and j.finished_at < cutoff]:
+        del _jobs[job_id]
+
+
+def get_job(job_id: str) -> Job:
+    try:
+        return _jobs[job_id]
+    except KeyError:
+        raise JobNotFound(job_id) from None
+
+
+def active_job(project_id: str, kind: str) -> Job | None:
+    for job in _jobs.values():
+        if job.project_id == project_id and job.kind == kind and job.status not in TERMINAL:
+            return job
+    return None
+
+
+def start_job(
+    kind: str, project_id: str, work: Callable[[Job], Awaitable[Any]], params: dict[str, Any] | None = None
+) -> Job:
+    """Run ``work(job)`` in the background; its return value becomes the job's result."""
+    _expire()
+    job = Job(uuid.uuid4().hex, kind, project_id, params or {})
+    _jobs[job.id] = job
+
+    async def run() -> None:
+        jobs_running.inc()
+        job.update(status="running")
+        try:
+            result = await work(job)
+        except Exception as exc:
+            job.update(status="failed", error=str(exc) or type(exc).__name__, finished_at=time.time())
+        else:
+            job.update(status="done", result=result, finished_at=time.time())
+        finally:
+            jobs_running.dec()
+
+    task = asyncio.get_running_loop().create_task(run())
+    # The loop only keeps weak references to tasks.
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return job
@@ -0,0 +1,42 @@
+"""ASGI entry point: ``uvicorn app.main:app``."""
+
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+from . import metrics
+from .api import blobs, jobs, projects, uploads
+from .config import get_settings
+from .workers import report_workers, shutdown_pool, start_pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    if get_settings().warm_workers:
+        await start_pool()
+    yield
+    shutdown_pool()
+
+
+app = FastAPI(title="ProtoScale", lifespan=lifespan)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=list(get_settings().cors_origins),
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+app.include_router(uploads.router)
+app.include_router(projects.router)
+app.include_router(blobs.router)
+app.include_router(jobs.router)
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def read_metrics() -> str:
+    report_workers()
+    return metrics.render()
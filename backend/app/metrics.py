@@ -0,0 +1,62 @@
+"""Process-wide counters and gauges, exposed in Prometheus text format."""
+
+from __future__ import annotations
+
+import threading
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def render(self) -> str:
+        value = int(self.value) if float(self.value).is_integer() else self.value
+        return f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.kind}\n{self.name} {value}\n"
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def set_max(self, value: float) -> None:
+        with self._lock:
+            if value > self.value:
+                self.value = value
+
+
+_registry: dict[str, Metric] = {}
+
+
+def counter(name: str, help: str) -> Counter:
+    return _registry.setdefault(name, Counter(name, help))  # type: ignore[return-value]
+
+
+def gauge(name: str, help: str) -> Gauge:
+    return _registry.setdefault(name, Gauge(name, help))  # type: ignore[return-value]
+
+
+def render() -> str:
+    return "".join(metric.render() for metric in _registry.values())
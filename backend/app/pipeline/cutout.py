@@ -0,0 +1,93 @@
+"""Full-resolution cut-outs, built on first request.
+
+Preprocessing only mattes the working image. The source-resolution matte is
+produced from the same stored model output by boundary-band refinement, so
+even a 24 MP photo only has its outline re-examined, and is kept next to
+the project for later requests. The source is decoded and normalized like
+it is for preprocessing, only without the reduction, so the matte is
+computed on the same upright sRGB pixels the working image came from. The
+build runs on the process pool and holds its full-resolution decode cost
+of the decode memory budget.
+"""
+
+from __future__ import annotations
+
+import os
+import uuid
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from ..imaging.decode import load_working_image
+from ..imaging.normalize import encode_srgb, normalize, profile_for
+from ..imaging.probe import Admission, ImageInfo, memory_estimate
+from ..ingest.budget import get_budget
+from ..projects import Project, load_project
+from ..segmentation.refine import refine_alpha
+from ..workers import fan_out
+
+
+class NotSegmented(LookupError):
+    pass
+
+
+def cutout_url(project_id: str, index: int) -> str:
+    return f"/api/projects/{project_id}/sources/{index}/cutout"
+
+
+def full_cutout_path(project: Project, index: int) -> Path:
+    return project.dir / f"cutout-full-{index}.png"
+
+
+def _segmentation(project: Project, index: int) -> dict:
+    segmentation = project.sources[index].working.get("segmentation")
+    if not segmentation:
+        raise NotSegmented(f"source {index} has no background removal")
+    return segmentation
+
+
+def _source_srgb(project: Project, index: int) -> np.ndarray:
+    """Source ``index`` decoded in full, upright and as 8-bit sRGB (H, W, 3)."""
+    source = project.sources[index]
+    info = ImageInfo(**source.info)
+    decoded = load_working_image(project.dir / source.path, info, max(info.width, info.height))
+    normalized = normalize(np.asarray(decoded.image), info.orientation, profile_for(decoded.icc_profile))
+    return encode_srgb(normalized.linear)
+
+
+def build_full_cutout(project: Project, index: int) -> Path:
+    """Path of source ``index`` cut out at its own resolution, building it if needed."""
+    source = project.sources[index]
+    segmentation = _segmentation(project, index)
+    path = full_cutout_path(project, index)
+    if path.exists():
+        return path
+    with Image.open(project.dir / segmentation["coarse"]) as im:
+        probability = np.asarray(im, dtype=np.float32) / 255
+    with Image.open(project.dir / source.working["path"]) as im:
+        small = np.asarray(im.convert("RGB").resize(probability.shape[::-1], Image.Resampling.BOX))
+    rgb = _source_srgb(project, index)
+    alpha = refine_alpha(rgb, small, probability).alpha
+    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    Image.fromarray(np.dstack([rgb, alpha]), "RGBA").save(tmp, "PNG", compress_level=1)
+    os.replace(tmp, path)
+    return path
+
+
+def _build_in_worker(project_id: str, index: int) -> Path:
+    return build_full_cutout(load_project(project_id), index)
+
+
+async def full_cutout(project: Project, index: int) -> Path:
+    """``build_full_cutout`` on the process pool, within the decode memory budget."""
+    _segmentation(project, index)
+    path = full_cutout_path(project, index)
+    if path.exists():
+        return path
+    source = project.sources[index]
+    info = ImageInfo(**source.info)
+    admission = Admission(source.tier, memory_estimate(info, max(info.width, info.height)))
+    async with get_budget().reserve(admission):
+        (path,) = await fan_out(_build_in_worker, [(project.id, index)])
+    return path
@@ -0,0 +1,199 @@
+"""Preprocessing: turn uploaded sources into the working images later stages use.
+
+Sources are independent, so a project's photos are dealt out over the
+process pool, one group per worker; each worker reads its sources from
+disk and writes its outputs back, and only the small result records travel
+between processes. A worker removes the backgrounds of its whole group in
+one batched model pass, so a set of photos larger than the pool pays the
+model's per-call cost (an ONNX session run, say) once per worker rather
+than once per photo, while the pool still runs the groups side by side.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+from PIL import Image
+
+from ..blobs import blob_url, put_file
+from ..config import get_settings
+from ..imaging.crop import crop_to_subject
+from ..imaging.decode import DecodedImage, load_decoded, load_working_image
+from ..imaging.normalize import Normalized, encode_srgb, normalize, profile_for
+from ..imaging.phash import phash
+from ..imaging.probe import ImageInfo
+from ..imaging.pyramid import build_pyramid
+from ..projects import Project, load_project, save_project
+from ..segmentation.cache import cache_hits, cache_misses
+from ..segmentation.engine import Segmentation, backdrop_runs, cutout, model_runs, remove_background_batch
+from ..timing import Timings
+from ..workers import fan_out, pool_size
+from .cutout import cutout_url, full_cutout_path
+
+
+def to_image(normalized: Normalized) -> Image.Image:
+    """8-bit sRGB(A) rendition of a normalized image, for storage and display."""
+    rgb = encode_srgb(normalized.linear)
+    if normalized.alpha is None:
+        return Image.fromarray(rgb, "RGB")
+    alpha = (normalized.alpha * 255 + 0.5).astype(np.uint8)
+    return Image.fromarray(np.dstack([rgb, alpha]), "RGBA")
+
+
+@dataclass
+class _Working:
+    """A source decoded and normalized to working size, ready for background removal."""
+
+    index: int
+    image: Image.Image
+    decoded: DecodedImage
+    profile: str
+    phash: int
+    timings: Timings
+
+
+def _load_working(project: Project, index: int) -> _Working:
+    source = project.sources[index]
+    info = ImageInfo(**source.info)
+    timings = Timings()
+    with timings.stage("decode"):
+        if source.predecoded:
+            decoded = load_decoded(project.dir / source.predecoded["path"], source.predecoded)
+        else:
+            decoded = load_working_image(project.dir / source.path, info, get_settings().working_size)
+    with timings.stage("normalize"):
+        normalized = normalize(np.asarray(decoded.image), info.orientation, profile_for(decoded.icc_profile))
+    working = to_image(normalized)
+    with timings.stage("save"):
+        # Working images are rewritten often and read once; favour speed over size.
+        working.save(project.dir / f"working-{index}.png", compress_level=1)
+    with timings.stage("phash"):
+        perceptual = phash(working)
+    return _Working(index, working, decoded, normalized.profile, perceptual, timings)
+
+
+def _finish(project: Project, working: _Working, segmentation: Segmentation | None) -> dict[str, Any]:
+    """Write the segmentation outputs and pyramid of a loaded source and build its record."""
+    index, timings = working.index, working.timings
+    source = project.sources[index]
+    settings = get_settings()
+    display = working.image
+    cropped = None
+    if segmentation is not None:
+        with timings.stage("segment"):
+            display = cutout(working.image, segmentation.alpha)
+        with timings.stage("save"):
+            Image.fromarray(segmentation.alpha, "L").save(project.dir / f"mask-{index}.png", compress_level=1)
+            coarse = (segmentation.probability * 255 + 0.5).astype(np.uint8)
+            Image.fromarray(coarse, "L").save(project.dir / f"coarse-{index}.png")
+            display.save(project.dir / f"cutout-{index}.png", compress_level=1)
+            full_cutout_path(project, index).unlink(missing_ok=True)
+        with timings.stage("crop"):
+            cropped = crop_to_subject(display, segmentation.alpha, settings.working_size)
+        if cropped is not None:
+            display, crop = cropped
+            with timings.stage("save"):
+                display.save(project.dir / f"subject-{index}.png", compress_level=1)
+    with timings.stage("pyramid"):
+        if segmentation is not None:
+            # The full-size cut-out is matted from the source on first request.
+            full = cutout_url(project.id, index)
+        else:
+            ext = "jpg" if source.info["format"] == "jpeg" else source.info["format"]
+            full = blob_url(put_file(project.dir / source.path, source.sha256, ext))
+        pyramid = build_pyramid(display, full)
+    source.working = {
+        "path": f"working-{index}.png",
+        "width": working.image.width,
+        "height": working.image.height,
+        "decode_scale": working.decoded.decode_scale,
+        "decoded_size": list(working.decoded.decoded_size),
+        "decoded_in_stream": bool(source.predecoded.get("in_stream")),
+        "color_profile": working.profile,
+        "phash": f"{working.phash:016x}",
+        "pyramid": pyramid,
+        "timings_ms": timings.to_dict(),
+    }
+    if segmentation is not None:
+        source.working["segmentation"] = {
+            "mask": f"mask-{index}.png",
+            "cutout": f"cutout-{index}.png",
+            "coarse": f"coarse-{index}.png",
+            **segmentation.to_dict(),
+        }
+        if cropped is not None:
+            source.working["subject"] = {"path": f"subject-{index}.png", "crop": crop.to_dict()}
+    return source.working
+
+
+def preprocess_sources(project: Project, indices: list[int]) -> list[dict[str, Any]]:
+    """Decode sources ``indices`` to working resolution and write ``working-<index>.png`` for each.
+
+    With background removal on, also writes each subject's alpha mask
+    (``mask-<index>.png``), the cut-out subject (``cutout-<index>.png``) and
+    that cut-out cropped and centred on a square canvas
+    (``subject-<index>.png``, see ``imaging.crop``), which later stages and
+    the thumbnail pyramid use instead of the full frame; the pyramid's
+    ``full`` level is the full-resolution cut-out endpoint. The model's
+    coarse output is kept (``coarse-<index>.png``) for that endpoint to
+    matte from. Other pyramid levels and unsegmented sources are published
+    as blobs. The sources' backgrounds are removed together, in one
+    ``remove_background_batch`` call, whose time each record's ``segment``
+    stage includes.
+
+    Returns the records stored as ``SourceImage.working``, in the order of
+    ``indices``; the caller saves the project.
+    """
+    loaded = [_load_working(project, index) for index in indices]
+    segmentations: list[Segmentation | None] = [None] * len(loaded)
+    if project.options.remove_background and loaded:
+        batch = Timings()
+        with batch.stage("segment"):
+            segmentations = remove_background_batch(
+                [working.image for working in loaded],
+                get_settings(),
+                [project.sources[working.index].sha256 for working in loaded],
+            )
+        for working in loaded:
+            working.timings.stages.update(batch.stages)
+    return [_finish(project, working, segmentation) for working, segmentation in zip(loaded, segmentations)]
+
+
+def working_files(working: dict[str, Any]) -> list[str]:
+    """Names of the files in the project directory that a ``SourceImage.working`` record refers to."""
+    names = [working["path"]]
+    if "segmentation" in working:
+        names += [working["segmentation"][name] for name in ("mask", "cutout", "coarse")]
+    if "subject" in working:
+        names.append(working["subject"]["path"])
+    return names
+
+
+def _preprocess_in_worker(project_id: str, indices: list[int]) -> list[dict[str, Any]]:
+    return preprocess_sources(load_project(project_id), indices)
+
+
+async def preprocess_project(project: Project) -> list[dict[str, Any]]:
+    """Preprocess every source of ``project`` in parallel and save the results in upload order."""
+    count = len(project.sources)
+    workers = min(pool_size(), count)
+    # Dealt round-robin so the groups differ in size by at most one photo.
+    groups = [list(range(start, count, workers)) for start in range(workers)]
+    results: list[dict[str, Any]] = [{}] * count
+    for group, records in zip(groups, await fan_out(_preprocess_in_worker, [(project.id, g) for g in groups])):
+        for index, working in zip(group, records):
+            results[index] = working
+    for source, working in zip(project.sources, results):
+        source.working = working
+        # Workers can't update this process's metrics; count segmentation paths and cache use from their records.
+        segmentation = working.get("segmentation")
+        if segmentation:
+            (backdrop_runs if segmentation["path"] == "backdrop" else model_runs).inc()
+            if segmentation["cache"] in ("memory", "disk"):
+                cache_hits.inc()
+            elif segmentation["cache"] == "miss":
+                cache_misses.inc()
+    save_project(project)
+    return results
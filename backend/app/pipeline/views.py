@@ -0,0 +1,336 @@
+"""Multi-angle views: the images reconstruction works from.
+
+A multi-photo project already has its views: each preprocessed photo is
+one. A single photo gets a ring of 4, 6, 8 or 12 views evenly spaced
+around the subject, optionally plus views from straight above and below:
+the front is the photo's own subject, the others come from the
+view-synthesis backend (``app.synthesis``). Views are rendered in the
+process pool and reported to the job as each one lands. Every view
+request, from any job, goes through one ``Batcher``: requests arriving
+within a few milliseconds of each other are dealt out over the workers,
+one task per view while workers are idle, batches of several views (one
+backend call each) under load. With enough workers the stage takes about
+as long as its slowest view. The subject is decoded once, in the parent,
+into shared memory that every task maps. Synthesized views are
+cached across projects (``app.synthesis.cache``), so a task whose view
+was made before, for this or any project, only links it. A single
+synthesized view can be redone with another seed (``regenerate_view``)
+without touching the rest.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+from contextlib import ExitStack, nullcontext
+from typing import Any
+
+import numpy as np
+from PIL import Image
+
+from ..blobs import blob_url, put_bytes
+from ..config import Settings, get_settings
+from ..dedup import record_artifacts
+from ..imaging.pyramid import build_pyramid
+from ..jobs import Job, active_job
+from ..projects import Project, SourceImage, load_project, project_lock
+from ..synthesis.cache import get_view_cache, view_cache_bytes_saved, view_cache_hits, view_cache_misses, view_key
+from ..synthesis.models import BackendUnavailable, ViewSynthesizer, get_backend
+from ..timing import Timings
+from ..workers import Batcher, SharedArray, share_array
+
+RING_SIZES = (4, 6, 8, 12)
+# Names of the azimuths (degrees, clockwise seen from above, 0 = facing the camera) that have one.
+AZIMUTH_NAMES = {
+    0: "front",
+    45: "front-right",
+    90: "right",
+    135: "back-right",
+    180: "back",
+    225: "back-left",
+    270: "left",
+    315: "front-left",
+}
+SEED = 0
+
+# A single-photo view: name, azimuth and elevation in degrees.
+Angle = tuple[str, float, float]
+
+
+def view_layout(ring: int = 4, top: bool = False, bottom: bool = False) -> list[Angle]:
+    """The views of a single-photo project: ``ring`` around the subject, front first, then top and bottom."""
+    if ring not in RING_SIZES:
+        raise ValueError(f"ring must be one of {RING_SIZES}")
+    azimuths = [i * 360 // ring for i in range(ring)]
+    layout = [(AZIMUTH_NAMES.get(a, f"{a}°"), a, 0) for a in azimuths]
+    if top:
+        layout.append(("top", 0, 90))
+    if bottom:
+        layout.append(("bottom", 0, -90))
+    return layout
+
+
+RING = view_layout()
+
+
+class NotPreprocessed(RuntimeError):
+    pass
+
+
+class NotSynthesized(ValueError):
+    """The view is a photo (or the photo's own front), not something a seed can change."""
+
+
+class ViewsRunning(RuntimeError):
+    """A view job is under way for the project; it will replace every view when it ends."""
+
+
+def subject_path(source: SourceImage) -> str:
+    """File name of the best image of the source's subject: cropped, cut out, or the working frame."""
+    if "subject" in source.working:
+        return source.working["subject"]["path"]
+    if "segmentation" in source.working:
+        return source.working["segmentation"]["cutout"]
+    return source.working["path"]
+
+
+def view_count(project: Project, layout: list[Angle] = RING) -> int:
+    return len(project.sources) if project.multi_view else len(layout)
+
+
+def resolve_backend(settings: Settings) -> tuple[ViewSynthesizer, str | None]:
+    """The configured backend, or the CPU stand-in plus the reason it had to stand in."""
+    try:
+        return get_backend(settings.view_backend), None
+    except BackendUnavailable as exc:
+        return get_backend("silhouette"), str(exc)
+
+
+def load_subject(project: Project) -> np.ndarray:
+    """The single-photo project's subject as 8-bit HxWx4, the input of every synthesized view."""
+    with Image.open(project.dir / subject_path(project.sources[0])) as im:
+        return np.asarray(im.convert("RGBA"))
+
+
+def subject_params(project: Project, source: SourceImage) -> dict[str, object]:
+    """Everything besides the photo's bytes that shapes its subject image: the view cache key's options."""
+    segmentation = source.working.get("segmentation", {})
+    return {
+        "remove_background": project.options.remove_background,
+        "working_size": get_settings().working_size,
+        "segmentation": f"{segmentation.get('model')}/{segmentation.get('model_version')}",
+    }
+
+
+# One view to render: project, view position, angle (single-photo projects), subject if loaded, seed.
+ViewTask = tuple[Project, int, Angle | None, np.ndarray | None, int]
+
+
+def render_views(tasks: list[ViewTask]) -> list[dict[str, Any]]:
+    """Produce each task's view record (name, angles, pyramid levels).
+
+    Views not in the cache go to the backend together, in one batched
+    call; views of the same project share one subject image.
+    """
+    backend, fallback = resolve_backend(get_settings())
+    cache = get_view_cache()
+    subjects: dict[str, np.ndarray] = {}
+    records: list[dict[str, Any]] = []
+    misses: list[tuple[dict[str, Any], Project, str, np.ndarray, int]] = []
+    for project, index, angle, subject, seed in tasks:
+        if project.multi_view:
+            source = project.sources[index]
+            records.append({"name": f"photo {index + 1}", "azimuth": None, "elevation": None, **source.working["pyramid"]})
+            continue
+        name, azimuth, elevation = angle or RING[index]
+        source = project.sources[0]
+        record: dict[str, Any] = {"name": name, "azimuth": azimuth, "elevation": elevation}
+        records.append(record)
+        if azimuth == 0 and elevation == 0:
+            record.update(source.working["pyramid"])
+            continue
+        if fallback:
+            record["fallback"] = fallback
+        key = view_key(
+            source.sha256,
+            backend.name,
+            backend.version,
+            azimuth=azimuth,
+            elevation=elevation,
+            seed=seed,
+            **subject_params(project, source),
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            record.update(cached, cache="hit")
+            continue
+        if subject is None:
+            subject = subjects.get(project.id)
+            if subject is None:
+                subject = subjects[project.id] = load_subject(project)
+        misses.append((record, project, key, subject, seed))
+    if not misses:
+        return records
+
+    timings = Timings()
+    images = backend.synthesize_batch(
+        [subject for _, _, _, subject, _ in misses],
+        [record["azimuth"] for record, *_ in misses],
+        [record["elevation"] for record, *_ in misses],
+        [seed for *_, seed in misses],
+        timings,
+    )
+    for (record, project, _, _, seed), image in zip(misses, images):
+        view = Image.fromarray(image, "RGBA")
+        with timings.stage("save"):
+            buf = io.BytesIO()
+            view.save(buf, "PNG", compress_level=1)
+            pyramid = build_pyramid(view, blob_url(put_bytes(buf.getvalue(), "png")))
+        record.update(
+            seed=seed,
+            backend=backend.name,
+            backend_version=backend.version,
+            bytes=len(buf.getvalue()),
+            cache="miss",
+            **pyramid,
+        )
+    # The timings cover the whole batch, as one backend call did.
+    for record, project, key, _, _ in misses:
+        record["timings_ms"] = timings.to_dict()
+        if len(misses) > 1:
+            record["batch_size"] = len(misses)
+        cache.put(key, record)
+    return records
+
+
+def render_view(
+    project: Project, index: int, angle: Angle | None = None, subject: np.ndarray | None = None, seed: int = SEED
+) -> dict[str, Any]:
+    """``render_views`` for one view; single-photo projects default to ``RING``'s angle."""
+    return render_views([(project, index, angle, subject, seed)])[0]
+
+
+def _detached(exc: Exception) -> Exception:
+    """``exc`` without its traceback, whose frames may still hold a shared subject's mapping open.
+
+    Exceptions cross to the parent pickled, which drops the traceback anyway.
+    """
+    exc.__traceback__ = exc.__context__ = exc.__cause__ = None
+    return exc
+
+
+def _render_alone(task: ViewTask) -> dict[str, Any] | Exception:
+    try:
+        return render_view(*task)
+    except Exception as exc:
+        return _detached(exc)
+
+
+def _render_batch_in_worker(
+    items: list[tuple[str, int, Angle | None, SharedArray | None, int]],
+) -> list[dict[str, Any] | Exception]:
+    """Pool side of the view batcher: map each shared subject once and render the batch.
+
+    The items may belong to different users' jobs, so a failure is kept to
+    its own item: each entry is the view's record or the exception it raised.
+    """
+    results: list[Any] = [None] * len(items)
+    with ExitStack() as stack:
+        subjects: dict[str, np.ndarray] = {}
+        projects: dict[str, Project] = {}
+        tasks: list[ViewTask] = []
+        positions = []
+        for position, (project_id, index, angle, shared, seed) in enumerate(items):
+            try:
+                if shared is not None and shared.name not in subjects:
+                    subjects[shared.name] = stack.enter_context(shared.attach())
+                if project_id not in projects:
+                    projects[project_id] = load_project(project_id)
+            except Exception as exc:
+                results[position] = _detached(exc)
+                continue
+            tasks.append((projects[project_id], index, angle, subjects[shared.name] if shared else None, seed))
+            positions.append(position)
+        try:
+            records: list[dict[str, Any] | Exception] = list(render_views(tasks))
+        except Exception:
+            # Render the views one by one to pin the failure on the ones that cause it.
+            records = [_render_alone(task) for task in tasks]
+        for position, record in zip(positions, records):
+            results[position] = record
+        del subjects, tasks  # the mappings close with the block
+    return results
+
+
+_batcher: Batcher | None = None
+
+
+def view_batcher() -> Batcher:
+    """The process-wide batcher all view requests go through, whichever job or request they belong to."""
+    global _batcher
+    if _batcher is None:
+        settings = get_settings()
+        _batcher = Batcher("view", _render_batch_in_worker, settings.view_batch_size, settings.view_batch_latency)
+    return _batcher
+
+
+def _count_cache(view: dict[str, Any]) -> None:
+    # Workers have their own metrics registries; count in the parent from the record.
+    if view.get("cache") == "hit":
+        view_cache_hits.inc()
+        view_cache_bytes_saved.inc(view["bytes"])
+    elif view.get("cache") == "miss":
+        view_cache_misses.inc()
+
+
+async def generate_views(project: Project, job: Job, layout: list[Angle] = RING) -> list[dict[str, Any]]:
+    """Job body: render every view, then store them as the ``multi_angle_images`` artifact.
+
+    Each view is published in ``job.items`` as soon as it is ready.
+    Downstream artifacts (mesh, analysis) are dropped, since they were
+    built from the previous views.
+    """
+    if any(not source.working for source in project.sources):
+        raise NotPreprocessed("project has not been preprocessed")
+    total = view_count(project, layout)
+    views: list[dict[str, Any] | None] = [None] * total
+    job.update(total=total, items=list(views), message="rendering views")
+    subject = None if project.multi_view else await asyncio.to_thread(load_subject, project)
+    with share_array(subject) if subject is not None else nullcontext() as shared:
+        angles = [None] * total if project.multi_view else layout
+        tasks = [(project.id, i, angles[i], shared, SEED) for i in range(total)]
+        async for index, view in view_batcher().map_completed(tasks):
+            views[index] = view
+            _count_cache(view)
+            job.update(completed=job.completed + 1, items=list(views), message=f"{view['name']} view ready")
+    async with project_lock(project.id):
+        project = load_project(project.id)
+        record_artifacts(project, multi_angle_images=views, model_url=None, analysis=None)
+    return views
+
+
+async def regenerate_view(project_id: str, index: int, seed: int | None = None) -> dict[str, Any]:
+    """Synthesize view ``index`` again with another seed (default: the next one) and return its record.
+
+    The other views, the mask and the preprocessing results stay as they
+    are; only what was built from the whole set (mesh, analysis) is dropped.
+    Raises IndexError for a view that doesn't exist, NotSynthesized for
+    one that is a photo, and ViewsRunning while a view job could still
+    overwrite the result (checked under the lock ``start_views`` takes too).
+    """
+    async with project_lock(project_id):
+        if active_job(project_id, "views") is not None:
+            raise ViewsRunning("views are still being generated for this project")
+        project = load_project(project_id)
+        views = list(project.artifacts.get("multi_angle_images") or [])
+        if not 0 <= index < len(views):
+            raise IndexError(index)
+        view = views[index]
+        if project.multi_view or "seed" not in view:
+            raise NotSynthesized(f"view {index} is the photo itself")
+        seed = view["seed"] + 1 if seed is None else seed
+        angle = (view["name"], view["azimuth"], view["elevation"])
+        views[index] = await view_batcher().submit((project.id, index, angle, None, seed))
+        record_artifacts(project, multi_angle_images=views, model_url=None, analysis=None)
+    _count_cache(views[index])
+    return views[index]
@@ -0,0 +1,119 @@
+"""On-disk project records.
+
+Each project lives in ``<data_dir>/projects/<id>/`` with a ``project.json``
+describing it and the uploaded source file next to it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+from .config import get_settings
+
+
+@dataclass
+class SourceImage:
+    filename: str
+    content_type: str
+    size: int
+    path: str
+    sha256: str = ""
+    # Header probe results (ImageInfo fields) plus the admitted tier and memory estimate.
+    info: dict[str, Any] = field(default_factory=dict)
+    tier: str = ""
+    memory_estimate: int = 0
+    # Working-size decoder output produced at upload time (see ingest.pipeline), if any.
+    predecoded: dict[str, Any] = field(default_factory=dict)
+    # Preflight quality report (QualityReport fields).
+    quality: dict[str, Any] = field(default_factory=dict)
+    # Preprocessing output: working image file name, its size and how it was produced.
+    working: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class ProjectOptions:
+    """The upload-time toggles; part of the cache key for everything derived."""
+
+    remove_background: bool = True
+    enhanced_detail: bool = False
+
+
+@dataclass
+class Project:
+    id: str
+    created_at: float
+    options: ProjectOptions = field(default_factory=ProjectOptions)
+    sources: list[SourceImage] = field(default_factory=list)
+    # Produced outputs by name (multi_angle_images, model_url, analysis), as served to the client.
+    artifacts: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def dir(self) -> Path:
+        return project_dir(self.id)
+
+    @property
+    def multi_view(self) -> bool:
+        """Several real photos of the object, which replace synthetic view generation."""
+        return len(self.sources) > 1
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> Project:
+        data = dict(data)
+        data["options"] = ProjectOptions(**data.get("options", {}))
+        data["sources"] = [SourceImage(**s) for s in data.get("sources", [])]
+        return cls(**data)
+
+
+class ProjectNotFound(KeyError):
+    pass
+
+
+_locks: dict[str, asyncio.Lock] = {}
+
+
+def project_lock(project_id: str | None) -> asyncio.Lock:
+    """Serializes read-modify-write of one project's record within this process.
+
+    ``None`` (a project about to be created) gets a fresh, uncontended lock.
+    """
+    if project_id is None:
+        return asyncio.Lock()
+    return _locks.setdefault(project_id, asyncio.Lock())
+
+
+def project_dir(project_id: str) -> Path:
+    return get_settings().data_dir / "projects" / project_id
+
+
+def new_project(options: ProjectOptions | None = None) -> Project:
+    project = Project(id=uuid.uuid4().hex, created_at=time.time(), options=options or ProjectOptions())
+    project.dir.mkdir(parents=True, exist_ok=True)
+    return project
+
+
+def save_project(project: Project) -> None:
+    path = project.dir / "project.json"
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(project.to_dict(), indent=2))
+    os.replace(tmp, path)
+
+
+def load_project(project_id: str) -> Project:
+    # Ids are uuid hex; anything else can't name a project and must not reach the filesystem.
+    if len(project_id) != 32 or not all(c in "0123456789abcdef" for c in project_id):
+        raise ProjectNotFound(project_id)
+    path = project_dir(project_id) / "project.json"
+    try:
+        return Project.from_dict(json.loads(path.read_text()))
+    except FileNotFoundError:
+        raise ProjectNotFound(project_id) from None
@@ -0,0 +1,85 @@
+"""Fast path for photos shot on a plain sweep (white, grey, green...).
+
+If the image margins are one near-uniform colour, the subject is simply
+whatever differs from it: a colour-distance threshold in CIELAB, cleaned up
+with a morphological open and close, produces the coarse probability map
+the model would have, for a fraction of the cost. The map goes through the
+same caching and boundary refinement as a model's.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from .classical import srgb_to_lab
+
+NAME = "backdrop"
+VERSION = "1"
+# Margin sampled for the backdrop colour, as a fraction of the shorter side.
+MARGIN = 0.04
+# A margin pixel within this Delta E of the median counts as backdrop.
+TOLERANCE = 10.0
+# Width of the Delta E ramp from backdrop to subject beyond the margin's own spread.
+RAMP = 8.0
+
+
+@dataclass
+class Backdrop:
+    color: np.ndarray  # CIELAB
+    # Share of margin pixels within TOLERANCE of ``color``.
+    uniformity: float
+    # 95th percentile Delta E of the margin from ``color``: how much the sweep itself varies.
+    spread: float
+
+    def to_dict(self) -> dict:
+        return {
+            "color_lab": [round(float(c), 1) for c in self.color],
+            "uniformity": round(self.uniformity, 4),
+        }
+
+
+def _margin(a: np.ndarray, width: int) -> np.ndarray:
+    sides = (a[:width], a[-width:], a[width:-width, :width], a[width:-width, -width:])
+    return np.concatenate([side.reshape(-1, 3) for side in sides])
+
+
+def detect(lab: np.ndarray) -> Backdrop:
+    """Backdrop estimate from the margins of a CIELAB image."""
+    width = max(2, round(MARGIN * min(lab.shape[:2])))
+    margin = _margin(lab, width)
+    color = np.median(margin, axis=0)
+    distance = np.sqrt(((margin - color) ** 2).sum(-1))
+    return Backdrop(color, float((distance <= TOLERANCE).mean()), float(np.percentile(distance, 95)))
+
+
+def _shift_reduce(mask: np.ndarray, op) -> np.ndarray:
+    """3x3 dilation (``np.logical_or``) or erosion (``np.logical_and``), edges replicated."""
+    h, w = mask.shape
+    padded = np.pad(mask, 1, mode="edge")
+    out = padded[1 : h + 1, 1 : w + 1].copy()
+    for dy in range(3):
+        for dx in range(3):
+            op(out, padded[dy : dy + h, dx : dx + w], out=out)
+    return out
+
+
+def opened_closed(mask: np.ndarray, radius: int) -> np.ndarray:
+    """Morphological open then close with a (2r+1)^2 square, as r repeated 3x3 passes each."""
+    for op in (np.logical_and,) * radius + (np.logical_or,) * (2 * radius) + (np.logical_and,) * radius:
+        mask = _shift_reduce(mask, op)
+    return mask
+
+
+def segment(rgb: np.ndarray, backdrop: Backdrop, lab: np.ndarray | None = None) -> np.ndarray:
+    """Foreground probability, float32 HxW, for an image on ``backdrop``."""
+    if lab is None:
+        lab = srgb_to_lab(rgb)
+    distance = np.sqrt(((lab - backdrop.color) ** 2).sum(-1))
+    low = max(backdrop.spread, TOLERANCE / 2)
+    probability = np.clip((distance - low) / RAMP, 0, 1).astype(np.float32)
+    hard = probability >= 0.5
+    cleaned = opened_closed(hard, radius=max(1, round(min(rgb.shape[:2]) / 200)))
+    # Keep the soft ramp where morphology agreed; pixels it flipped become certain.
+    return np.where(cleaned == hard, probability, cleaned.astype(np.float32))
@@ -0,0 +1,110 @@
+"""Cache of segmentation model outputs.
+
+The model pass is the expensive part of background removal; refining its
+output to any resolution is cheap. So what is cached is the model's coarse
+probability map, keyed by the source's content hash, the model's name and
+version and everything else that shapes its input. Toggling options that
+don't (``enhanced_detail``, say) reuses it.
+
+Maps are stored compactly: a 1-bit packed foreground mask, plus 8-bit
+probabilities only for the cells on the boundary, the only place the
+refinement reads soft values. A 256 px map packs into a few KiB. A
+byte-budgeted in-memory LRU sits in front of a directory of packed files;
+each worker process has its own memory tier over the shared disk tier.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import struct
+import threading
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from .. import metrics
+from ..config import get_settings
+from .refine import boundary_cells
+
+HEADER = struct.Struct("<HHI")  # height, width, number of boundary values
+
+cache_hits = metrics.counter("protoscale_mask_cache_hits_total", "Segmentation runs served from the mask cache.")
+cache_misses = metrics.counter("protoscale_mask_cache_misses_total", "Segmentation runs that ran the model.")
+
+
+def pack(probability: np.ndarray) -> bytes:
+    h, w = probability.shape
+    soft = (probability[boundary_cells(probability)] * 255 + 0.5).astype(np.uint8)
+    return HEADER.pack(h, w, soft.size) + np.packbits(probability >= 0.5).tobytes() + soft.tobytes()
+
+
+def unpack(data: bytes) -> np.ndarray:
+    """Inverse of ``pack``: confident cells come back as exactly 0 or 1."""
+    h, w, count = HEADER.unpack_from(data)
+    bits = -(-h * w // 8)
+    hard = np.unpackbits(np.frombuffer(data, np.uint8, bits, HEADER.size), count=h * w).reshape(h, w)
+    probability = hard.astype(np.float32)
+    soft = np.frombuffer(data, np.uint8, count, HEADER.size + bits)
+    probability[boundary_cells(probability)] = soft / np.float32(255)
+    return probability
+
+
+def mask_key(content_hash: str, model: str, version: str, **params: object) -> str:
+    parts = [content_hash, model, version, *(f"{k}={params[k]}" for k in sorted(params))]
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+class MaskCache:
+    def __init__(self, directory: Path, memory_budget: int) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self.memory_bytes = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.bin"
+
+    def _remember(self, key: str, data: bytes) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = data
+            self.memory_bytes += len(data)
+            while self.memory_bytes > self.memory_budget and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.memory_bytes -= len(evicted)
+
+    def get(self, key: str) -> tuple[bytes, str] | None:
+        """Packed map and the tier it came from (``"memory"`` or ``"disk"``), or None."""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                return data, "memory"
+        try:
+            data = self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+        self._remember(key, data)
+        return data, "disk"
+
+    def put(self, key: str, data: bytes) -> None:
+        self._remember(key, data)
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+
+@lru_cache
+def get_cache() -> MaskCache:
+    settings = get_settings()
+    return MaskCache(settings.data_dir / "masks", settings.mask_cache_bytes)
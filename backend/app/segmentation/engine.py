@@ -0,0 +1,189 @@
+"""Background removal: runs the configured segmentation model and builds the alpha mask.
+
+The model sees the working image downscaled to its input size. Its
+probability map is brought to the output resolution by boundary-band
+refinement (``refine.py``), which only visits pixels near the outline, so
+the same coarse result can produce a matte for the working image or for
+the full-resolution source. Photos on a plain, uniform backdrop skip the
+model for a colour-distance threshold (``backdrop.py``); which path ran is
+recorded in the result. Coarse outputs are cached by content hash
+(``cache.py``), so a photo seen before skips the model entirely. If the
+configured model can't be loaded (no runtime, no weights), the weight-free
+classical segmenter is used instead and the fallback is noted in the
+result.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image
+
+from .. import metrics
+from ..config import Settings
+from ..timing import Timings
+from . import backdrop
+from .cache import get_cache, mask_key, pack, unpack
+from .classical import srgb_to_lab
+from .models import ModelUnavailable, SegmentationModel, get_model
+from .refine import refine_alpha
+
+backdrop_runs = metrics.counter(
+    "protoscale_segmentation_backdrop_total", "Segmentations that took the uniform-backdrop fast path."
+)
+model_runs = metrics.counter("protoscale_segmentation_model_total", "Segmentations that needed the model.")
+
+
+@dataclass
+class Segmentation:
+    alpha: np.ndarray  # uint8 HxW at working size
+    # Model output at its input size, and the image it saw; enough to matte any resolution later.
+    probability: np.ndarray
+    small: np.ndarray
+    model: str
+    model_version: str
+    timings: Timings
+    band_fraction: float = 0.0  # share of output pixels the refinement visited
+    batch_size: int = 1  # images segmented together; ``timings`` covers the whole batch
+    path: str = "model"  # "model", or "backdrop" for the uniform-backdrop fast path
+    backdrop: backdrop.Backdrop | None = None
+    cache: str = "off"  # "memory" / "disk" hit, "miss", or "off" when no content hash was given
+    fallback: str | None = None  # why the configured model wasn't used
+
+    @property
+    def coverage(self) -> float:
+        return float(np.count_nonzero(self.alpha >= 128)) / self.alpha.size
+
+    def to_dict(self) -> dict:
+        record = {
+            "path": self.path,
+            "model": self.model,
+            "model_version": self.model_version,
+            "coverage": round(self.coverage, 4),
+            "band_fraction": round(self.band_fraction, 4),
+            "cache": self.cache,
+            "timings_ms": self.timings.to_dict(),
+        }
+        if self.backdrop is not None:
+            record["backdrop"] = self.backdrop.to_dict()
+        if self.batch_size > 1:
+            record["batch_size"] = self.batch_size
+        if self.fallback:
+            record["fallback"] = self.fallback
+        return record
+
+
+def resolve_model(settings: Settings) -> tuple[SegmentationModel, str | None]:
+    """The configured model, or the classical one plus the reason it had to stand in."""
+    try:
+        return get_model(settings.segmentation_model), None
+    except ModelUnavailable as exc:
+        return get_model("classical"), str(exc)
+
+
+def downscale(image: Image.Image, size: int) -> np.ndarray:
+    """The 8-bit RGB array a model with input size ``size`` sees for ``image``."""
+    small = image.convert("RGB")
+    small.thumbnail((size, size), Image.Resampling.BOX)
+    return np.asarray(small)
+
+
+def remove_background(image: Image.Image, settings: Settings, content_hash: str | None = None) -> Segmentation:
+    """Segment the subject of an 8-bit RGB(A) working image.
+
+    ``content_hash`` identifies the source the image was decoded from; with
+    it, the model output is looked up in and added to the mask cache.
+    """
+    return remove_background_batch([image], settings, [content_hash])[0]
+
+
+def remove_background_batch(
+    images: list[Image.Image], settings: Settings, content_hashes: list[str | None] | None = None
+) -> list[Segmentation]:
+    """Segment several images, e.g. the photos of a multi-photo project, in one model pass.
+
+    Cache misses are stacked by input shape and handed to the model's
+    ``predict_batch`` together, so per-call overhead (and, for the
+    classical model, every array operation) is paid once per batch rather
+    than once per image. The results share the batch's ``Timings``.
+    """
+    model, fallback = resolve_model(settings)
+    hashes = content_hashes or [None] * len(images)
+    timings = Timings()
+    with timings.stage("resize"):
+        smalls = [downscale(image, model.input_size) for image in images]
+    labs = []
+    backdrops: list[backdrop.Backdrop | None] = []
+    with timings.stage("backdrop"):
+        for small in smalls:
+            labs.append(srgb_to_lab(small))
+            found = backdrop.detect(labs[-1])
+            backdrops.append(found if found.uniformity >= settings.backdrop_uniformity else None)
+    keys = [
+        mask_key(
+            h,
+            *((backdrop.NAME, backdrop.VERSION) if found else (model.name, model.version)),
+            input_size=model.input_size,
+            working_size=settings.working_size,
+        )
+        if h
+        else None
+        for h, found in zip(hashes, backdrops)
+    ]
+    packed: list[bytes | None] = [None] * len(images)
+    tiers = ["miss" if key else "off" for key in keys]
+    with timings.stage("cache"):
+        for i, key in enumerate(keys):
+            hit = get_cache().get(key) if key else None
+            if hit is not None:
+                packed[i], tiers[i] = hit
+    by_shape: dict[tuple[int, ...], list[int]] = {}
+    for i, data in enumerate(packed):
+        if data is not None:
+            continue
+        if backdrops[i] is not None:
+            with timings.stage("backdrop"):
+                packed[i] = pack(backdrop.segment(smalls[i], backdrops[i], labs[i]))
+            if keys[i]:
+                get_cache().put(keys[i], packed[i])
+        else:
+            by_shape.setdefault(smalls[i].shape, []).append(i)
+    for indices in by_shape.values():
+        probabilities = model.predict_batch(np.stack([smalls[i] for i in indices]), timings)
+        with timings.stage("cache"):
+            for i, probability in zip(indices, probabilities):
+                packed[i] = pack(probability)
+                if keys[i]:
+                    get_cache().put(keys[i], packed[i])
+
+    results = []
+    for image, small, data, tier, found in zip(images, smalls, packed, tiers, backdrops):
+        # Always go through the packed form, so a cache hit reproduces a fresh run exactly.
+        probability = unpack(data)
+        with timings.stage("band"):
+            refined = refine_alpha(np.asarray(image.convert("RGB")), small, probability)
+        results.append(
+            Segmentation(
+                refined.alpha,
+                probability,
+                small,
+                backdrop.NAME if found else model.name,
+                backdrop.VERSION if found else model.version,
+                timings,
+                refined.band_fraction,
+                batch_size=len(images),
+                path="backdrop" if found else "model",
+                backdrop=found,
+                cache=tier,
+                fallback=None if found else fallback,
+            )
+        )
+    return results
+
+
+def cutout(image: Image.Image, alpha: np.ndarray) -> Image.Image:
+    """``image`` with ``alpha`` as its alpha channel."""
+    rgba = image.convert("RGBA")
+    rgba.putalpha(Image.fromarray(alpha, "L"))
+    return rgba
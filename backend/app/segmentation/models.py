@@ -0,0 +1,69 @@
+"""Segmentation model interface and registry.
+
+A model turns a small RGB image into a foreground probability map; the
+engine (``app.segmentation.engine``) takes care of resizing to and from the
+model's input size. Models are looked up by name from ``MODELS``, one
+instance per process, so anything expensive (weights, sessions) is paid for
+once per worker.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from functools import lru_cache
+from typing import Protocol
+
+import numpy as np
+
+from ..config import get_settings
+from ..timing import Timings
+
+
+class SegmentationModel(Protocol):
+    name: str
+    # Bumped whenever the model's output for a given input can change; part of cache keys.
+    version: str
+    # Longest side of the image ``predict`` wants; the engine resizes to it.
+    input_size: int
+
+    def predict(self, rgb: np.ndarray, timings: Timings) -> np.ndarray:
+        """Foreground probability in [0, 1], float32 HxW, for an 8-bit HxWx3 sRGB image."""
+        ...
+
+    def predict_batch(self, rgb: np.ndarray, timings: Timings) -> np.ndarray:
+        """``predict`` over a stack of same-sized images, BxHxWx3 -> BxHxW, in one pass."""
+        ...
+
+
+class ModelUnavailable(RuntimeError):
+    """The configured model can't be loaded here (missing runtime or weights)."""
+
+
+def _classical() -> SegmentationModel:
+    from .classical import ClassicalSegmenter
+
+    return ClassicalSegmenter()
+
+
+def _onnx() -> SegmentationModel:
+    from .onnx import OnnxSegmenter
+
+    weights = get_settings().segmentation_weights
+    if weights is None:
+        raise ModelUnavailable("PROTOSCALE_SEGMENTATION_WEIGHTS is not set")
+    return OnnxSegmenter(weights)
+
+
+MODELS: dict[str, Callable[[], SegmentationModel]] = {
+    "classical": _classical,
+    "onnx": _onnx,
+}
+
+
+@lru_cache
+def get_model(name: str) -> SegmentationModel:
+    try:
+        factory = MODELS[name]
+    except KeyError:
+        raise ModelUnavailable(f"unknown segmentation model {name!r}") from None
+    return factory()
@@ -0,0 +1,97 @@
+"""Salient-object segmentation with an ONNX model (U^2-Net / IS-Net style).
+
+Optional: needs ``onnxruntime`` and a weights file named by
+``PROTOSCALE_SEGMENTATION_WEIGHTS``. The model is expected to take a
+normalized NCHW float32 image and return a single-channel saliency map as
+its first output, as the rembg family of models do.
+
+If a safetensors file with the same stem sits next to the graph
+(``u2net.onnx`` and ``u2net.safetensors``), its tensors are memory-mapped
+(``app.weights.map_weights``) and handed to onnxruntime as the graph's
+initializers, which it uses in place: every worker then reads the one
+page-cache copy of the weights instead of parsing its own out of the
+graph file.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from PIL import Image
+
+from ..timing import Timings
+from ..weights import WeightsError, map_weights
+from .models import ModelUnavailable
+
+MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+def _fingerprint(*paths: Path) -> str:
+    """Identifies the files' contents by name, size and modification time, without reading them.
+
+    Hashing a multi-GB checkpoint would read all of it in every worker at start-up.
+    """
+    stats = [f"{path.name}:{path.stat().st_size}:{path.stat().st_mtime_ns}" for path in paths if path.is_file()]
+    return hashlib.sha256("\0".join(stats).encode()).hexdigest()[:12]
+
+
+class OnnxSegmenter:
+    name = "onnx"
+
+    def __init__(self, weights: Path) -> None:
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ModelUnavailable("onnxruntime is not installed") from None
+        if not weights.is_file():
+            raise ModelUnavailable(f"segmentation weights not found at {weights}")
+        options = onnxruntime.SessionOptions()
+        tensors = weights.with_suffix(".safetensors")
+        # onnxruntime reads the arrays without copying them, so they must outlive the session.
+        self.initializers: list[Any] = []
+        if tensors.is_file():
+            try:
+                mapped = map_weights(tensors)
+            except WeightsError as exc:
+                raise ModelUnavailable(str(exc)) from None
+            if any(array.dtype == np.uint16 for array in mapped.values()):
+                raise ModelUnavailable(f"{tensors} holds bfloat16 tensors, which can't be mapped into onnxruntime")
+            self.initializers = [onnxruntime.OrtValue.ortvalue_from_numpy(array) for array in mapped.values()]
+            options.add_external_initializers(list(mapped), self.initializers)
+        self.session = onnxruntime.InferenceSession(str(weights), options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        side = model_input.shape[-1]
+        self.input_size = side if isinstance(side, int) else 320
+        # Models exported with a fixed batch of 1 are run once per image.
+        self.dynamic_batch = not isinstance(model_input.shape[0], int) or model_input.shape[0] != 1
+        self.version = f"{weights.stem}-{_fingerprint(weights, tensors)}"
+
+    def predict(self, rgb: np.ndarray, timings: Timings) -> np.ndarray:
+        return self.predict_batch(rgb[None], timings)[0]
+
+    def predict_batch(self, rgb: np.ndarray, timings: Timings) -> np.ndarray:
+        batch, h, w = rgb.shape[:3]
+        with timings.stage("features"):
+            tensor = np.empty((batch, 3, self.input_size, self.input_size), dtype=np.float32)
+            for i, image in enumerate(rgb):
+                square = Image.fromarray(image).resize((self.input_size,) * 2, Image.Resampling.BILINEAR)
+                tensor[i] = ((np.asarray(square) / np.float32(255) - MEAN) / STD).transpose(2, 0, 1)
+        with timings.stage("inference"):
+            if self.dynamic_batch:
+                saliency = self.session.run(None, {self.input_name: tensor})[0][:, 0]
+            else:
+                saliency = np.concatenate(
+                    [self.session.run(None, {self.input_name: tensor[i : i + 1]})[0][:, 0] for i in range(batch)]
+                )
+        with timings.stage("postprocess"):
+            out = np.empty((batch, h, w), dtype=np.float32)
+            for i, map_ in enumerate(saliency):
+                low, high = float(map_.min()), float(map_.max())
+                map_ = ((map_ - low) / max(high - low, 1e-6)).astype(np.float32)
+                out[i] = np.asarray(Image.fromarray(map_, "F").resize((w, h), Image.Resampling.BILINEAR))
+        return out
@@ -0,0 +1,222 @@
+"""Near-duplicate lookup over perceptual hashes.
+
+Multi-index hashing: each 64-bit hash is split into four 16-bit words, and
+for each word position the index keeps the words sorted alongside the row
+they came from. Two hashes within Hamming distance ``r`` must agree to
+within ``r // 4`` bits on at least one word (pigeonhole), so a query only
+enumerates the few word values that close to each of its own words, finds
+their rows with ``searchsorted``, and verifies those candidates with a
+popcount. Per entry the index costs 8 bytes of hash, 16 of project id and
+4 x 6 bytes of word tables.
+
+Rows are persisted as ``hashes.npy`` / ``owners.npy`` plus an append-only
+``pending.log`` of recent additions, which is replayed on start and folded
+into the arrays when it grows.
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+import threading
+from collections.abc import Iterator
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from . import metrics
+from .config import get_settings
+from .dedup import adopt_artifacts
+from .projects import Project, ProjectNotFound, load_project
+
+WORDS = 4
+WORD_BITS = 16
+RECORD = np.dtype([("hash", "<u8"), ("owner", "V16")])
+COMPACT_AFTER = 4096
+# Most earlier projects offered to one upload.
+MAX_OFFERS = 10
+
+similar_offers = metrics.counter(
+    "protoscale_similar_offers_total", "Uploads offered artifacts from a perceptually similar earlier project."
+)
+similar_adoptions = metrics.counter(
+    "protoscale_similar_adoptions_total", "Offers of a similar project's artifacts that were taken up."
+)
+
+
+class NotSimilar(ValueError):
+    """The other project is no near-duplicate of this one, or has nothing to offer."""
+
+
+def _words(hashes: np.ndarray) -> np.ndarray:
+    """(n,) uint64 -> (WORDS, n) uint16."""
+    shifts = np.arange(WORDS, dtype=np.uint64) * np.uint64(WORD_BITS)
+    return ((hashes[None, :] >> shifts[:, None]) & np.uint64(0xFFFF)).astype(np.uint16)
+
+
+@lru_cache(maxsize=8)
+def _flip_masks(radius: int) -> np.ndarray:
+    """All 16-bit masks with at most ``radius`` bits set."""
+    masks = [0]
+    for r in range(1, radius + 1):
+        masks += [sum(1 << b for b in bits) for bits in itertools.combinations(range(WORD_BITS), r)]
+    return np.array(masks, dtype=np.uint16)
+
+
+class PerceptualIndex:
+    def __init__(self, directory: Path) -> None:
+        self.dir = directory
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        hashes_path, owners_path = self.dir / "hashes.npy", self.dir / "owners.npy"
+        if hashes_path.exists():
+            self.hashes = np.load(hashes_path)
+            self.owners = np.load(owners_path)
+        else:
+            self.hashes = np.empty(0, np.uint64)
+            self.owners = np.empty(0, "V16")
+        self._pending: list[tuple[int, bytes]] = []
+        log = self.dir / "pending.log"
+        if log.exists():
+            data = log.read_bytes()
+            records = np.frombuffer(data[: len(data) // RECORD.itemsize * RECORD.itemsize], RECORD)
+            self._pending = [(int(r["hash"]), bytes(r["owner"])) for r in records]
+        self._log = open(log, "ab")
+        self._build()
+        if len(self._pending) >= COMPACT_AFTER:
+            self.compact()
+
+    def _build(self) -> None:
+        words = _words(self.hashes)
+        self._order = np.argsort(words, axis=1, kind="stable").astype(np.int32)
+        self._sorted = np.take_along_axis(words, self._order, axis=1)
+
+    def __len__(self) -> int:
+        return len(self.hashes) + len(self._pending)
+
+    def add(self, value: int, owner: str) -> None:
+        """Index ``owner`` under ``value``; adding the same pair again changes nothing."""
+        key = bytes.fromhex(owner)
+        with self._lock:
+            _, owners = self._near_locked(value, 0)
+            if key in {bytes(o) for o in owners}:
+                return
+            self._pending.append((value, key))
+            self._log.write(np.array([(value, key)], RECORD).tobytes())
+            self._log.flush()
+            if len(self._pending) >= COMPACT_AFTER:
+                self._compact_locked()
+
+    def compact(self) -> None:
+        with self._lock:
+            self._compact_locked()
+
+    def _compact_locked(self) -> None:
+        if not self._pending:
+            return
+        self.hashes = np.concatenate([self.hashes, np.array([h for h, _ in self._pending], np.uint64)])
+        self.owners = np.concatenate([self.owners, np.array([o for _, o in self._pending], "V16")])
+        for name, array in (("hashes", self.hashes), ("owners", self.owners)):
+            tmp = self.dir / f"{name}.tmp.npy"
+            np.save(tmp, array)
+            os.replace(tmp, self.dir / f"{name}.npy")
+        self._log.truncate(0)
+        self._log.seek(0)
+        self._pending = []
+        self._build()
+
+    def _near_locked(self, value: int, radius: int) -> tuple[np.ndarray, np.ndarray]:
+        """Hashes and owners of every row that may lie within ``radius`` of ``value``, unverified."""
+        flips = _flip_masks(radius // WORDS)
+        candidates = []
+        for w, word in enumerate(_words(np.array([value], np.uint64))[:, 0]):
+            probes = np.unique(word ^ flips)
+            starts = np.searchsorted(self._sorted[w], probes, side="left")
+            ends = np.searchsorted(self._sorted[w], probes, side="right")
+            for s, e in zip(starts, ends):
+                if e > s:
+                    candidates.append(self._order[w, s:e])
+        rows = np.unique(np.concatenate(candidates)) if candidates else np.empty(0, np.int32)
+        hashes = np.concatenate([self.hashes[rows], np.array([h for h, _ in self._pending], np.uint64)])
+        owners = np.concatenate([self.owners[rows], np.array([o for _, o in self._pending], "V16")])
+        return hashes, owners
+
+    def matches(self, value: int, radius: int) -> Iterator[tuple[str, int]]:
+        """Owners of hashes within ``radius`` bits of ``value``, nearest first, each once."""
+        with self._lock:
+            hashes, owners = self._near_locked(value, radius)
+        distances = np.bitwise_count(hashes ^ np.uint64(value))
+        hits = np.flatnonzero(distances <= radius)
+        seen = set()
+        for i in hits[np.argsort(distances[hits], kind="stable")]:
+            owner = bytes(owners[i]).hex()
+            if owner not in seen:
+                seen.add(owner)
+                yield owner, int(distances[i])
+
+    def search(self, value: int, radius: int, limit: int = 10) -> list[tuple[str, int]]:
+        """The ``limit`` nearest of ``matches``."""
+        return list(itertools.islice(self.matches(value, radius), limit))
+
+
+@lru_cache
+def get_index() -> PerceptualIndex:
+    return PerceptualIndex(get_settings().data_dir / "phash")
+
+
+def match_and_register(project: Project) -> list[dict]:
+    """Find earlier single-photo projects that look like this one, then index this one.
+
+    Only matches that already produced artifacts are returned, nearest first,
+    as ``{project_id, distance, artifacts}``. Multi-photo projects are
+    neither matched nor indexed.
+    """
+    value = _phash(project)
+    if value is None:
+        return []
+    index = get_index()
+    offers = []
+    # Filter before counting, so this project's own row or artifact-less matches don't crowd out usable ones.
+    for owner, distance in index.matches(value, get_settings().phash_radius):
+        if owner == project.id:
+            continue
+        try:
+            other = load_project(owner)
+        except ProjectNotFound:
+            continue
+        if other.artifacts and other.options == project.options:
+            offers.append({"project_id": owner, "distance": distance, "artifacts": other.artifacts})
+            if len(offers) == MAX_OFFERS:
+                break
+    index.add(value, project.id)
+    if offers:
+        similar_offers.inc()
+    return offers
+
+
+def _phash(project: Project) -> int | None:
+    if project.multi_view or not project.sources or "phash" not in project.sources[0].working:
+        return None
+    return int(project.sources[0].working["phash"], 16)
+
+
+def adopt_similar(project: Project, other_id: str) -> dict:
+    """Give ``project`` the artifacts of ``other_id``, one of its ``match_and_register`` offers, and return them.
+
+    The match is checked again, so only a real offer can be taken up.
+    Whatever the project held is replaced (``dedup.adopt_artifacts``, as for
+    an exact repeat). The caller holds the project lock.
+    Raises ProjectNotFound for an unknown ``other_id``.
+    """
+    other = load_project(other_id)
+    value, other_value = _phash(project), _phash(other)
+    if other.id == project.id or value is None or other_value is None:
+        raise NotSimilar("only another single-photo project can be adopted")
+    if (value ^ other_value).bit_count() > get_settings().phash_radius or other.options != project.options:
+        raise NotSimilar(f"project {other.id} does not match this photo and options")
+    if not other.artifacts:
+        raise NotSimilar(f"project {other.id} has no results yet")
+    adopt_artifacts(project, other.artifacts)
+    similar_adoptions.inc()
+    return project.artifacts
@@ -0,0 +1,70 @@
+"""Cache of synthesized views.
+
+A view is a pure function of the subject it was synthesized from, its
+angles, the backend (name and version) and the seed, so it is cached under
+a key of exactly those: the source photo's content hash together with the
+project options and segmentation that shaped the subject, then the rest.
+What is stored is the view's record, whose image and thumbnails already
+live in the content-addressed blob store; an entry is a few hundred bytes
+of JSON. The cache is shared by every project, so revisiting one, or
+someone else uploading the same photo, reuses its views.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import uuid
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from .. import metrics
+from ..blobs import blob_path
+from ..config import get_settings
+
+view_cache_hits = metrics.counter("protoscale_view_cache_hits_total", "Views served from the view cache.")
+view_cache_misses = metrics.counter("protoscale_view_cache_misses_total", "Views the backend had to synthesize.")
+view_cache_bytes_saved = metrics.counter(
+    "protoscale_view_cache_bytes_saved_total", "Encoded size of the views served from the view cache."
+)
+
+# Record fields that describe the synthesized image rather than the project it was made for.
+CACHED_FIELDS = ("backend", "backend_version", "seed", "timings_ms", "bytes", "128", "256", "512", "full")
+
+
+def view_key(content_hash: str, backend: str, version: str, **params: object) -> str:
+    parts = [content_hash, backend, version, *(f"{k}={params[k]}" for k in sorted(params))]
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+class ViewCache:
+    def __init__(self, directory: Path) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        self.directory = directory
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """The cached view's fields, or None; entries whose image blob is gone count as missing."""
+        try:
+            entry = json.loads(self._path(key).read_text())
+        except FileNotFoundError:
+            return None
+        if not blob_path(entry["full"].rsplit("/", 1)[-1]).exists():
+            return None
+        return entry
+
+    def put(self, key: str, record: dict[str, Any]) -> None:
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        tmp.write_text(json.dumps({name: record[name] for name in CACHED_FIELDS}))
+        os.replace(tmp, path)
+
+
+@lru_cache
+def get_view_cache() -> ViewCache:
+    return ViewCache(get_settings().data_dir / "views")
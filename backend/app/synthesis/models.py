@@ -0,0 +1,78 @@
+"""View-synthesis backend interface and registry.
+
+A backend renders the subject as seen from another camera position: it
+gets the cropped RGBA subject (the front view) and returns an RGBA image of
+the same size. ``PROTOSCALE_VIEW_BACKEND`` names a backend in ``BACKENDS``
+or, for backends living outside this package, a ``module:factory`` path
+whose factory takes no arguments; either way there is one instance per
+process, so weights load once per worker.
+"""
+
+from __future__ import annotations
+
+import importlib
+from collections.abc import Callable
+from functools import lru_cache
+from typing import Protocol
+
+import numpy as np
+
+from ..timing import Timings
+
+
+class ViewSynthesizer(Protocol):
+    name: str
+    # Bumped whenever the output for a given input can change; recorded with each view.
+    version: str
+
+    def synthesize(self, rgba: np.ndarray, azimuth: float, elevation: float, seed: int, timings: Timings) -> np.ndarray:
+        """The subject (8-bit HxWx4, seen from azimuth 0, elevation 0) seen from the given angles, in degrees.
+
+        Azimuth turns the camera clockwise around the subject seen from
+        above (90 shows its right side); elevation raises it. Same inputs
+        and seed, same output.
+        """
+        ...
+
+    def synthesize_batch(
+        self,
+        rgba: list[np.ndarray],
+        azimuths: list[float],
+        elevations: list[float],
+        seeds: list[int],
+        timings: Timings,
+    ) -> list[np.ndarray]:
+        """``synthesize`` for several views in one pass; the same subject array may appear more than once."""
+        ...
+
+
+class BackendUnavailable(RuntimeError):
+    """The configured backend can't be loaded here (unknown name, missing runtime or weights)."""
+
+
+def _silhouette() -> ViewSynthesizer:
+    from .silhouette import SilhouetteSynthesizer
+
+    return SilhouetteSynthesizer()
+
+
+BACKENDS: dict[str, Callable[[], ViewSynthesizer]] = {
+    "silhouette": _silhouette,
+}
+
+
+def _import_factory(path: str) -> Callable[[], ViewSynthesizer]:
+    module, _, attribute = path.partition(":")
+    try:
+        return getattr(importlib.import_module(module), attribute)
+    except (ImportError, AttributeError) as exc:
+        raise BackendUnavailable(f"can't load view backend {path!r}: {exc}") from None
+
+
+@lru_cache
+def get_backend(name: str) -> ViewSynthesizer:
+    if name in BACKENDS:
+        return BACKENDS[name]()
+    if ":" in name:
+        return _import_factory(name)()
+    raise BackendUnavailable(f"unknown view backend {name!r}")
@@ -0,0 +1,210 @@
+"""Deterministic CPU stand-in for a view-synthesis model.
+
+Treats the subject as a solid that is mirror-symmetric front to back. Its
+half-thickness at each silhouette pixel is the distance to the outline,
+smoothed so the surface is rounded yet never steeper than 45 degrees; the
+front surface carries the photo's colours and, by the symmetry assumption,
+so does the back. Both surfaces are rotated to the requested azimuth and
+elevation, splatted through a z-buffer and relit from their rotated
+normals. Inflating the subject doesn't depend on the view, so a batch of
+views of one subject does it once. The result looks like the subject seen
+from elsewhere and costs a few hundred milliseconds and a few hundred MiB
+at working size, in the range a real backend's CPU pre- and
+post-processing does; it is not a reconstruction. Output depends only on
+the input and the seed (which nudges the light).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image
+
+from ..timing import Timings
+
+NAME = "silhouette"
+VERSION = "3"
+# Resolution the distance transform runs at; depth is upsampled from it.
+DEPTH_SIZE = 256
+# Radius of the box filter rounding the distance ridge, as a fraction of DEPTH_SIZE.
+SMOOTHING = 0.03
+# Rows per block of the distance transform's column pass (bounds its temporary to block*H*W floats).
+BLOCK = 32
+# Share of the front-view brightness kept regardless of the relit normal.
+AMBIENT = 0.5
+LIGHT = np.array([-0.3, -0.5, 1.0])
+
+
+def distance_to_outline(inside: np.ndarray) -> np.ndarray:
+    """Exact Euclidean distance from each inside pixel to the nearest outside one (the frame counts as outside)."""
+    h, w = inside.shape
+    x = np.arange(w)
+    # Row pass: distance to the nearest outside pixel on the same row.
+    left = np.maximum.accumulate(np.where(inside, -1, x), axis=1)
+    right = np.minimum.accumulate(np.where(inside, w, x)[:, ::-1], axis=1)[:, ::-1]
+    row = np.minimum(x - left, right - x).astype(np.float32)
+    squared = row * row
+    # Column pass: d^2(y, x) = min over y' of row(y', x)^2 + (y - y')^2.
+    y = np.arange(h, dtype=np.float32)
+    out = np.empty_like(squared)
+    for start in range(0, h, BLOCK):
+        offsets = (y[start : start + BLOCK, None] - y[None, :]) ** 2
+        out[start : start + BLOCK] = (squared[None] + offsets[..., None]).min(axis=1)
+    # The rows just above and below the frame are outside too.
+    frame = np.minimum(y + 1, h - y) ** 2
+    return np.sqrt(np.minimum(out, frame[:, None]))
+
+
+def _box_mean(a: np.ndarray, radius: int) -> np.ndarray:
+    padded = np.pad(a, radius + 1, mode="edge")
+    c = padded.cumsum(0).cumsum(1)
+    size = 2 * radius + 1
+    window = c[size:, size:] - c[:-size, size:] - c[size:, :-size] + c[:-size, :-size]
+    return window[: a.shape[0], : a.shape[1]] / size**2
+
+
+def half_thickness(inside: np.ndarray) -> np.ndarray:
+    """Half-thickness of the solid at each pixel, in pixels, float32 at ``inside``'s size."""
+    h, w = inside.shape
+    scale = DEPTH_SIZE / max(h, w)
+    small_size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    small = np.array(Image.fromarray(inside).resize(small_size, Image.Resampling.BOX))
+    distance = distance_to_outline(small)
+    # Box means and minima of 1-Lipschitz functions are 1-Lipschitz: the ridge rounds, the rim stays at 0
+    # and the surface never gets steeper than 45 degrees.
+    rounded = np.minimum(_box_mean(distance, max(1, round(SMOOTHING * DEPTH_SIZE))), distance)
+    depth = Image.fromarray(rounded.astype(np.float32), "F").resize((w, h), Image.Resampling.BILINEAR)
+    return np.asarray(depth) / np.float32(scale)
+
+
+def _outline(inside: np.ndarray) -> np.ndarray:
+    """Inside pixels with an outside 4-neighbour (or on the frame)."""
+    padded = np.pad(inside, 1)
+    interior = padded[:-2, 1:-1] & padded[2:, 1:-1] & padded[1:-1, :-2] & padded[1:-1, 2:]
+    return inside & ~interior
+
+
+def _rotation(azimuth: float, elevation: float) -> np.ndarray:
+    """Object rotation putting the camera at ``azimuth`` (clockwise from above) and ``elevation`` (up)."""
+    a, e = np.radians(azimuth), np.radians(elevation)
+    yaw = np.array([[np.cos(a), 0, np.sin(a)], [0, 1, 0], [-np.sin(a), 0, np.cos(a)]])
+    # Image y points down, so looking from above tips the top (negative y) towards the camera.
+    pitch = np.array([[1, 0, 0], [0, np.cos(e), np.sin(e)], [0, -np.sin(e), np.cos(e)]])
+    return (pitch @ yaw).astype(np.float32)
+
+
+def _fill_pinholes(rgba: np.ndarray) -> None:
+    """Cover empty pixels with at least three covered 4-neighbours by their mean, in place."""
+    covered = rgba[..., 3] > 0
+    padded = np.pad(rgba.astype(np.float32), ((1, 1), (1, 1), (0, 0)))
+    mask = np.pad(covered, 1).astype(np.float32)
+    neighbours = (padded[:-2, 1:-1], padded[2:, 1:-1], padded[1:-1, :-2], padded[1:-1, 2:])
+    weights = (mask[:-2, 1:-1], mask[2:, 1:-1], mask[1:-1, :-2], mask[1:-1, 2:])
+    count = sum(weights)
+    holes = ~covered & (count >= 3)
+    total = sum(n * m[..., None] for n, m in zip(neighbours, weights))
+    rgba[holes] = (total[holes] / count[holes, None] + 0.5).astype(np.uint8)
+
+
+@dataclass
+class Solid:
+    """The inflated subject, ready to be rotated: one row per surface point."""
+
+    rgba: np.ndarray
+    points: np.ndarray  # x, y, z relative to the canvas centre
+    normals: np.ndarray
+    colors: np.ndarray  # the photo's colour at each point
+    photographed: np.ndarray  # the normal the photo saw each point's colour under
+
+
+def inflate(rgba: np.ndarray, timings: Timings) -> Solid:
+    """Everything about the subject that doesn't depend on the view; shared by every view of it."""
+    h, w = rgba.shape[:2]
+    inside = rgba[..., 3] >= 128
+    with timings.stage("depth"):
+        depth = half_thickness(inside)
+        dy, dx = np.gradient(depth)
+    with timings.stage("surface"):
+        ys, xs = np.nonzero(inside)
+        d = depth[ys, xs]
+        gx, gy = -dx[ys, xs], -dy[ys, xs]
+        front = np.stack([gx, gy, np.ones_like(gx)], axis=1)
+        # Front surface at +d facing the camera, its mirror image at -d facing away, and a wall
+        # joining them along the outline, where the two are still apart by the rim's thickness.
+        rim = _outline(inside)[ys, xs]
+        steps = np.ceil(2 * d[rim]).astype(np.intp) + 1
+        wall = np.repeat(np.flatnonzero(rim), steps)
+        fraction = np.arange(len(wall)) - np.repeat(np.cumsum(steps) - steps, steps)
+        fraction = fraction / np.repeat(np.maximum(steps - 1, 1), steps)
+        index = np.concatenate([np.arange(len(xs)), np.arange(len(xs)), wall])
+        points = np.stack(
+            [xs[index] - (w - 1) / 2, ys[index] - (h - 1) / 2, np.concatenate([d, -d, d[wall] * (1 - 2 * fraction)])],
+            axis=1,
+        ).astype(np.float32)
+        normals = np.concatenate([front, front * [1, 1, -1], front[wall] * [1, 1, 0]])
+        normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-6)
+        photographed = (front / np.linalg.norm(front, axis=1, keepdims=True))[index]
+        colors = rgba[ys, xs, :3].astype(np.float32)[index]
+    return Solid(rgba, points, normals.astype(np.float32), colors, photographed.astype(np.float32))
+
+
+def render(solid: Solid, azimuth: float, elevation: float, seed: int, timings: Timings) -> np.ndarray:
+    h, w = solid.rgba.shape[:2]
+    with timings.stage("project"):
+        rotation = _rotation(azimuth, elevation)
+        points = solid.points @ rotation.T
+        normals = solid.normals @ rotation.T
+    with timings.stage("shade"):
+        rng = np.random.default_rng(seed)
+        light = LIGHT + rng.normal(0, 0.15, 3)
+        light = (light / np.linalg.norm(light)).astype(np.float32)
+        # The photo already shows the front lit; scale by how the light changed, not by the light itself.
+        before = AMBIENT + (1 - AMBIENT) * np.clip(solid.photographed @ light, 0, 1)
+        after = AMBIENT + (1 - AMBIENT) * np.clip(normals @ light, 0, 1)
+        colors = solid.colors * (after / before)[:, None]
+    with timings.stage("splat"):
+        out = np.zeros_like(solid.rgba)
+        u = np.floor(points[:, 0] + (w - 1) / 2).astype(np.intp)
+        v = np.floor(points[:, 1] + (h - 1) / 2).astype(np.intp)
+        # A 2x2 footprint closes the gaps a surface at most 45 degrees steep leaves under rotation.
+        u = np.concatenate([u, u + 1, u, u + 1])
+        v = np.concatenate([v, v, v + 1, v + 1])
+        near = -np.tile(points[:, 2], 4)
+        source = np.tile(np.arange(len(points)), 4)
+        visible = (u >= 0) & (u < w) & (v >= 0) & (v < h)
+        pixel = v[visible] * w + u[visible]
+        order = np.lexsort((near[visible], pixel))
+        pixel, first = np.unique(pixel[order], return_index=True)
+        winners = source[visible][order[first]]
+        flat = out.reshape(-1, 4)
+        flat[pixel, :3] = np.clip(colors[winners] + 0.5, 0, 255).astype(np.uint8)
+        flat[pixel, 3] = 255
+        _fill_pinholes(out)
+    return out
+
+
+class SilhouetteSynthesizer:
+    name = NAME
+    version = VERSION
+
+    def synthesize(self, rgba: np.ndarray, azimuth: float, elevation: float, seed: int, timings: Timings) -> np.ndarray:
+        return render(inflate(rgba, timings), azimuth, elevation, seed, timings)
+
+    def synthesize_batch(
+        self,
+        rgba: list[np.ndarray],
+        azimuths: list[float],
+        elevations: list[float],
+        seeds: list[int],
+        timings: Timings,
+    ) -> list[np.ndarray]:
+        # Views of the same subject (the same array) share its inflation, the view-independent half of the work.
+        solids: dict[int, Solid] = {}
+        for subject in rgba:
+            if id(subject) not in solids:
+                solids[id(subject)] = inflate(subject, timings)
+        return [
+            render(solids[id(subject)], azimuth, elevation, seed, timings)
+            for subject, azimuth, elevation, seed in zip(rgba, azimuths, elevations, seeds)
+        ]
@@ -0,0 +1,30 @@
+"""Per-stage wall-clock timings for pipeline metadata."""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+
+class Timings:
+    """Accumulates named stage durations in milliseconds."""
+
+    def __init__(self) -> None:
+        self.stages: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stages[name] = round(self.stages.get(name, 0.0) + elapsed, 3)
+
+    @property
+    def total(self) -> float:
+        return round(sum(self.stages.values()), 3)
+
+    def to_dict(self) -> dict[str, float]:
+        return {**self.stages, "total": self.total}
@@ -0,0 +1,272 @@
+"""Shared process pool for CPU-bound pipeline stages.
+
+Work is submitted as (module-level function, small arguments); workers load
+what they need from the data directory themselves rather than receiving
+pixel buffers through pickling. When several tasks read the same decoded
+image, the parent decodes it once into shared memory and passes a
+``SharedArray`` handle, which each worker maps without copying.
+
+With ``PROTOSCALE_WARM_WORKERS`` (the default) the pool starts with the
+server and each worker loads the configured segmentation model and view
+backend as it starts, so no request pays for a model load; any other
+model is loaded on first use. Workers' load times and memory are exported
+as metrics (``report_workers``).
+
+A ``Batcher`` sits in front of the pool for work that is cheaper in bulk:
+items submitted by any number of coroutines within a short window go to
+the workers together, as one call of a batch function per worker.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import partial
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, TypeVar
+
+import numpy as np
+
+from . import metrics
+from .config import get_settings
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+worker_count = metrics.gauge("protoscale_workers", "Live worker processes in the pool.")
+worker_warmup = metrics.gauge("protoscale_worker_warmup_seconds", "Slowest worker's model loading at start-up.")
+worker_rss = metrics.gauge("protoscale_worker_rss_max_bytes", "Resident memory of the largest worker process.")
+worker_pss = metrics.gauge(
+    "protoscale_worker_pss_bytes", "Proportional set size of all workers: shared pages counted once in total."
+)
+
+_pool: ProcessPoolExecutor | None = None
+# Seconds this worker spent loading models at start-up.
+_warmup = 0.0
+
+
+def pool_size() -> int:
+    return get_settings().worker_processes or os.cpu_count() or 1
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Workers must inherit the parent's resource tracker: one of their own would flag every
+        # shared memory block they attach as leaked (and try to unlink it) when they exit.
+        resource_tracker.ensure_running()
+        warm = get_settings().warm_workers
+        _pool = ProcessPoolExecutor(max_workers=pool_size(), initializer=_warm_models if warm else None)
+    return _pool
+
+
+def _warm_models() -> None:
+    """Pool initializer: load the configured models so the worker's first task doesn't."""
+    global _warmup
+    from .pipeline.views import resolve_backend
+    from .segmentation.engine import resolve_model
+
+    started = time.perf_counter()
+    settings = get_settings()
+    for resolve in (resolve_model, resolve_backend):
+        # An exception here would break the whole pool; the first task needing the model reports it instead.
+        try:
+            resolve(settings)
+        except Exception:
+            logger.exception("worker %d could not warm up (%s)", os.getpid(), resolve.__name__)
+    _warmup = time.perf_counter() - started
+
+
+def _worker_status() -> tuple[int, float]:
+    return os.getpid(), _warmup
+
+
+async def start_pool() -> None:
+    """Start every worker now (warming its models) rather than on the first request."""
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    # One task per worker makes the pool launch them all; each reports its warm-up.
+    statuses = await asyncio.gather(*(loop.run_in_executor(pool, _worker_status) for _ in range(pool_size())))
+    worker_warmup.set(round(max(warmup for _, warmup in statuses), 4))
+
+
+def _memory(pid: int) -> tuple[int, int]:
+    """Resident and proportional set size of a process, in bytes (Linux; zeros elsewhere)."""
+    rss = pss = 0
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Rss:"):
+                    rss = int(line.split()[1]) * 1024
+                elif line.startswith("Pss:"):
+                    pss = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return rss, pss
+
+
+def report_workers() -> None:
+    """Refresh the worker gauges; called when metrics are scraped."""
+    processes = list(_pool._processes) if _pool is not None else []  # type: ignore[attr-defined]
+    memory = [_memory(pid) for pid in processes]
+    worker_count.set(len(processes))
+    worker_rss.set(max((rss for rss, _ in memory), default=0))
+    worker_pss.set(sum(pss for _, pss in memory))
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+async def fan_out(fn: Callable[..., T], arguments: Iterable[tuple[Any, ...]]) -> list[T]:
+    """Run ``fn(*args)`` for each argument tuple in the pool; results keep input order."""
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    return await asyncio.gather(*(loop.run_in_executor(pool, fn, *args) for args in arguments))
+
+
+async def fan_out_completed(fn: Callable[..., T], arguments: Iterable[tuple[Any, ...]]) -> AsyncIterator[tuple[int, T]]:
+    """Like ``fan_out``, but yield ``(position, result)`` pairs as each task finishes."""
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    async for position, result in _completed([loop.run_in_executor(pool, fn, *args) for args in arguments]):
+        yield position, result
+
+
+async def _completed(futures: list[asyncio.Future]) -> AsyncIterator[tuple[int, Any]]:
+    """Yield ``(position, result)`` as the futures finish; the rest are cancelled if the caller stops early."""
+    positions = {future: i for i, future in enumerate(futures)}
+    pending = set(positions)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                yield positions[future], future.result()
+    finally:
+        for future in positions:
+            if not future.done():
+                future.cancel()
+            elif not future.cancelled():
+                future.exception()  # mark failures after the one raised as seen
+
+
+class Batcher:
+    """Coalesces items submitted from anywhere into batched calls of ``fn`` in the pool.
+
+    ``fn`` is a module-level function taking a list of items and returning
+    one entry per item: its result, or the exception it raised. A batch
+    mixes items from unrelated requests, so ``fn`` must not let one item's
+    failure fail the rest; each submitter gets only its own. The first
+    item submitted opens a window of ``max_latency`` seconds; when it
+    closes (or as soon as every worker could be handed a full batch) the
+    items collected are dealt out over the workers, at most ``max_batch``
+    per call. A lone request is therefore delayed by at most the window
+    and still spread over idle workers, while a busy server gets full
+    batches.
+    """
+
+    def __init__(self, name: str, fn: Callable[[list[Any]], list[Any]], max_batch: int, max_latency: float) -> None:
+        self.fn = fn
+        self.max_batch = max(1, max_batch)
+        self.max_latency = max_latency
+        self._pending: list[tuple[Any, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self.batches = metrics.counter(f"protoscale_{name}_batches_total", f"Batched {name} calls sent to workers.")
+        self.items = metrics.counter(f"protoscale_{name}_batch_items_total", f"Items in batched {name} calls.")
+
+    def submit(self, item: Any) -> asyncio.Future:
+        """Queue ``item``; the returned future resolves to its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch * pool_size():
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_latency, self._dispatch)
+        return future
+
+    async def map_completed(self, items: Iterable[Any]) -> AsyncIterator[tuple[int, Any]]:
+        """Submit every item and yield ``(position, result)`` pairs as they finish."""
+        async for position, result in _completed([self.submit(item) for item in items]):
+            yield position, result
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        loop = asyncio.get_running_loop()
+        pool = get_pool()
+        # Spread over the workers first, then fill batches.
+        size = min(self.max_batch, -(-len(pending) // pool_size()))
+        for start in range(0, len(pending), size):
+            batch = pending[start : start + size]
+            self.batches.inc()
+            self.items.inc(len(batch))
+            task = loop.run_in_executor(pool, self.fn, [item for item, _ in batch])
+            task.add_done_callback(partial(self._resolve, batch))
+
+    @staticmethod
+    def _resolve(batch: list[tuple[Any, asyncio.Future]], task: asyncio.Future) -> None:
+        error = None if task.cancelled() else task.exception()
+        for i, (_, future) in enumerate(batch):
+            if future.done():  # its submitter stopped waiting
+                continue
+            if task.cancelled():
+                future.cancel()
+            elif error is not None:  # the call itself failed (a worker died, say)
+                future.set_exception(error)
+            elif isinstance(result := task.result()[i], BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+@dataclass(frozen=True)
+class SharedArray:
+    """Picklable handle to an array placed in shared memory by ``share_array``."""
+
+    name: str
+    shape: tuple[int, ...]
+    dtype: str
+
+    @contextmanager
+    def attach(self) -> Iterator[np.ndarray]:
+        """Map the array, read-only, for the duration of the block.
+
+        The mapping is closed on exit, so the caller must drop its own
+        references to the array (and views of it) before leaving the block.
+        """
+        shm = SharedMemory(name=self.name)
+        array = np.ndarray(self.shape, np.dtype(self.dtype), shm.buf)
+        array.flags.writeable = False
+        try:
+            yield array
+        finally:
+            del array
+            shm.close()
+
+
+@contextmanager
+def share_array(array: np.ndarray) -> Iterator[SharedArray]:
+    """Copy ``array`` into a new shared memory block, released when the block exits."""
+    shm = SharedMemory(create=True, size=max(array.nbytes, 1))
+    try:
+        np.ndarray(array.shape, array.dtype, shm.buf)[...] = array
+        yield SharedArray(shm.name, array.shape, array.dtype.str)
+    finally:
+        shm.close()
+        shm.unlink()
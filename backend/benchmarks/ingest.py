@@ -0,0 +1,86 @@
+"""Time from last upload byte to working image: streamed decode vs decode after upload.
+
+    python -m benchmarks.ingest [image ...]
+
+Bodies are replayed in 64 KiB messages at a simulated link speed
+(``--mbps``, default 100). Without image arguments, baseline and
+progressive versions of a synthetic 24 MP JPEG are used.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import dataclasses
+import io
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from app.config import get_settings
+from app.imaging.decode import load_working_image
+from app.imaging.probe import probe
+from app.imaging.quality import assess
+from app.ingest.pipeline import IngestPipeline
+from app.ingest.stream import ChunkSpool
+
+from .decode import synthetic
+
+MESSAGE = 64 * 1024
+
+
+async def body(data: bytes, mbps: float):
+    delay = MESSAGE * 8 / (mbps * 1e6)
+    for i in range(0, len(data), MESSAGE):
+        await asyncio.sleep(delay)
+        yield data[i : i + MESSAGE]
+
+
+async def streamed(data: bytes, mbps: float, tmp: Path) -> float:
+    # Synthetic gradients are no photo; keep the quality gate from refusing them.
+    settings = dataclasses.replace(get_settings(), min_quality_score=0)
+    spool = ChunkSpool(settings.upload_chunk_size, settings.spool_max_size, settings.max_upload_bytes, tmp)
+    try:
+        result = await IngestPipeline(spool, settings).run(body(data, mbps))
+    finally:
+        spool.close()
+    return result.ready_after_last_byte
+
+
+def after_upload(path: Path) -> float:
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        info = probe(f)
+    assess(load_working_image(path, info, get_settings().working_size).image)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("images", nargs="*", type=Path)
+    parser.add_argument("--mbps", type=float, default=100.0)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_name:
+        tmp = Path(tmp_name)
+        paths = args.images
+        if not paths:
+            base = synthetic(tmp / "photo.jpg", "JPEG")
+            progressive = tmp / "progressive.jpg"
+            Image.open(base).save(progressive, "JPEG", quality=92, progressive=True)
+            paths = [base, progressive]
+        for path in paths:
+            data = path.read_bytes()
+            info = probe(io.BytesIO(data))
+            ready = asyncio.run(streamed(data, args.mbps, tmp))
+            after = after_upload(path)
+            kind = "progressive" if info.progressive else "baseline"
+            print(
+                f"{path.name} ({info.format} {kind}, {len(data) / 2**20:.1f} MiB @ {args.mbps:g} Mbit/s): "
+                f"last byte -> ready {ready * 1000:6.1f} ms streamed, {after * 1000:6.1f} ms decoding after upload"
+            )
+
+
+if __name__ == "__main__":
+    main()
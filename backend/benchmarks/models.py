@@ -0,0 +1,131 @@
+"""Model weight loading: reading into memory versus memory-mapping, and pool cold start.
+
+    python -m benchmarks.models [size_mib]
+
+Writes a synthetic safetensors checkpoint (default 256 MiB) and compares
+loading it with a plain read against ``app.weights.map_weights``: time to
+open, time to first touch every page, and, with a pool of worker processes
+each holding the weights, the largest worker's RSS and the pool's total
+PSS (shared pages split between the processes that map them). The file
+was just written, so it is in the page cache: first-touch times are for a
+warm cache. Last, the latency of the first task on a fresh pool, with and
+without warming the configured models at start-up.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from app import workers
+from app.config import get_settings
+from app.weights import map_weights
+
+MiB = 1024 * 1024
+WORKERS = 3
+# Tensor size the synthetic checkpoint is split into.
+TENSOR_BYTES = 16 * MiB
+
+_held: dict[str, np.ndarray] = {}
+
+
+def write_checkpoint(path: Path, size: int) -> None:
+    count = max(1, size // TENSOR_BYTES)
+    shape = [TENSOR_BYTES // 4 // 1024, 1024]
+    header = {
+        f"layer{i}.weight": {"dtype": "F32", "shape": shape, "data_offsets": [i * TENSOR_BYTES, (i + 1) * TENSOR_BYTES]}
+        for i in range(count)
+    }
+    encoded = json.dumps(header).encode()
+    rng = np.random.default_rng(0)
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(encoded)) + encoded)
+        for _ in range(count):
+            f.write(rng.standard_normal(TENSOR_BYTES // 4, dtype=np.float32).tobytes())
+
+
+def read_weights(path: Path) -> dict[str, np.ndarray]:
+    """What loading without mmap amounts to: the whole file read into process memory."""
+    with open(path, "rb") as f:
+        (header_size,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_size))
+        data = np.frombuffer(f.read(), np.uint8)
+    return {
+        name: data[info["data_offsets"][0] : info["data_offsets"][1]].view(np.float32).reshape(info["shape"])
+        for name, info in header.items()
+    }
+
+
+def touch(tensors: dict[str, np.ndarray]) -> float:
+    """Read one value per 4 KiB page of every tensor."""
+    return float(sum(tensor.reshape(-1)[::1024].sum() for tensor in tensors.values()))
+
+
+def _hold(path: str, mapped: bool) -> int:
+    _held["weights"] = map_weights(Path(path)) if mapped else read_weights(Path(path))
+    touch(_held["weights"])
+    return 0
+
+
+def memory_with(path: Path, mapped: bool) -> tuple[int, int]:
+    with ProcessPoolExecutor(max_workers=WORKERS) as pool:
+        list(pool.map(_hold, [str(path)] * WORKERS, [mapped] * WORKERS))
+        memory = [workers._memory(pid) for pid in pool._processes]  # type: ignore[attr-defined]
+    return max(rss for rss, _ in memory), sum(pss for _, pss in memory)
+
+
+def loading(path: Path) -> None:
+    for label, load in (("read", read_weights), ("mmap", map_weights)):
+        started = time.perf_counter()
+        tensors = load(path)
+        opened = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        touch(tensors)
+        touched = (time.perf_counter() - started) * 1000
+        del tensors  # or the forked workers would inherit them
+        rss, pss = memory_with(path, load is map_weights)
+        print(
+            f"  {label}  open {opened:8.1f} ms  first touch {touched:7.1f} ms"
+            f"  worker RSS {rss / MiB:6.0f} MiB  pool PSS x{WORKERS} {pss / MiB:6.0f} MiB"
+        )
+
+
+def cold_start() -> None:
+    for warm in ("0", "1"):
+        os.environ["PROTOSCALE_WARM_WORKERS"] = warm
+        get_settings.cache_clear()
+        started = time.perf_counter()
+        if get_settings().warm_workers:
+            asyncio.run(workers.start_pool())
+        ready = time.perf_counter()
+        [(_, warmup)] = asyncio.run(workers.fan_out(workers._worker_status, [()]))
+        first = (time.perf_counter() - ready) * 1000
+        label = "warm" if get_settings().warm_workers else "lazy"
+        print(
+            f"  {label} pool: start-up {(ready - started) * 1000:6.1f} ms, first task {first:6.1f} ms"
+            f" (model loading {warmup * 1000:.1f} ms)"
+        )
+        workers.shutdown_pool()
+
+
+def main(args: list[str]) -> None:
+    size = int(args[0]) * MiB if args else 256 * MiB
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "weights.safetensors"
+        write_checkpoint(path, size)
+        print(f"{size // MiB} MiB checkpoint, {WORKERS} workers")
+        loading(path)
+    cold_start()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,71 @@
+"""Cost of orientation + colour normalization relative to decoding.
+
+    python -m benchmarks.normalize [image ...]
+
+Without arguments a synthetic 24 MP JPEG is generated. Normalization is
+timed on the working image the pipeline actually feeds it and, for scale,
+on a full-resolution frame.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from app.config import get_settings
+from app.imaging.decode import load_working_image
+from app.imaging.normalize import SRGB, SRGB_DECODE_LUT, SRGB_TO_XYZ_D50, ColorProfile, normalize
+from app.imaging.probe import probe
+
+from .decode import synthetic
+
+# A wide-gamut profile so the matrix multiply is exercised, not skipped.
+DISPLAY_P3 = ColorProfile(
+    "display-p3",
+    np.stack([SRGB_DECODE_LUT] * 3),
+    (np.linalg.inv(SRGB_TO_XYZ_D50) @ np.array(
+        [[0.5151, 0.2920, 0.1571], [0.2412, 0.6922, 0.0666], [-0.0011, 0.0419, 0.7841]]
+    )).astype(np.float32),
+)
+
+
+def timed(fn, *args, repeat: int = 5) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(*args)
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main(paths: list[Path]) -> None:
+    target = get_settings().working_size
+    for path in paths:
+        with open(path, "rb") as f:
+            info = probe(f)
+        decode_ms = timed(load_working_image, path, info, target)
+        working = np.asarray(load_working_image(path, info, target).image)
+        with Image.open(path) as im:
+            full = np.asarray(im.convert("RGB"))
+        print(f"{path.name}: {info.width}x{info.height}")
+        print(f"  working decode             {decode_ms:8.1f} ms")
+        for label, pixels in (("working", working), ("full-res", full)):
+            srgb_ms = timed(normalize, pixels, 6, SRGB)
+            p3_ms = timed(normalize, pixels, 6, DISPLAY_P3)
+            mpix = pixels.shape[0] * pixels.shape[1] / 1e6
+            print(
+                f"  normalize {label:8s} sRGB  {srgb_ms:8.1f} ms   P3 {p3_ms:8.1f} ms"
+                f"   ({mpix / (p3_ms / 1000):.0f} MP/s with matrix)"
+            )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main([Path(p) for p in sys.argv[1:]])
+    else:
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as tmp:
+            main([synthetic(Path(tmp) / "photo.jpg", "JPEG")])
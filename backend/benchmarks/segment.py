@@ -0,0 +1,116 @@
+"""Background removal cost per stage at working size.
+
+    python -m benchmarks.segment [image ...]
+
+Each image is segmented twice: as configured (a plain backdrop takes the
+fast path) and with the model forced. Without arguments a synthetic subject
+on a shaded backdrop is generated and the mask is also scored (IoU)
+against its known silhouette. The same coarse output is then matted at
+24 MP by boundary-band refinement, next to the same refinement run over
+every pixel. Last, four photos are segmented one at a time and then as one
+batch, as a worker does with its share of a multi-photo project.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from app.config import Settings, get_settings
+from app.segmentation.engine import remove_background, remove_background_batch
+from app.segmentation.refine import refine_alpha
+from app.timing import Timings
+
+REPEAT = 5
+
+
+def subject_photo(size: tuple[int, int] = (1024, 768), seed: int = 0) -> tuple[Image.Image, np.ndarray]:
+    """A textured ellipse on a gently shaded, slightly noisy backdrop, and its silhouette."""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    yy, xx = np.mgrid[0:h, 0:w].astype(np.float32)
+    backdrop = np.stack([200 + 20 * xx / w, 205 + 10 * yy / h, np.full_like(xx, 210)], axis=-1)
+    backdrop += rng.normal(0, 3, backdrop.shape)
+    silhouette = ((xx - w / 2) / (0.25 * w)) ** 2 + ((yy - h / 2) / (0.4 * h)) ** 2 < 1
+    texture = np.stack([120 + 60 * np.sin(xx / 7), 60 + 30 * np.cos(yy / 9), np.full_like(xx, 40)], axis=-1)
+    pixels = np.where(silhouette[..., None], texture, backdrop)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)), silhouette
+
+
+def model_only() -> Settings:
+    return dataclasses.replace(get_settings(), backdrop_uniformity=2.0)
+
+
+def run(image: Image.Image, truth: np.ndarray | None = None) -> None:
+    for settings in (get_settings(), model_only()):
+        run_with(image, settings, truth)
+
+
+def run_with(image: Image.Image, settings: Settings, truth: np.ndarray | None) -> None:
+    remove_background(image, settings)  # warm-up: model load, first-touch allocations
+    totals = Timings()
+    for _ in range(REPEAT):
+        result = remove_background(image, settings)
+        for stage, ms in result.timings.stages.items():
+            totals.stages[stage] = totals.stages.get(stage, 0.0) + ms / REPEAT
+    print(f"{image.width}x{image.height} via {result.path}: {result.model} (v{result.model_version})")
+    for stage, ms in totals.stages.items():
+        print(f"  {stage:10s} {ms:8.1f} ms")
+    print(f"  {'total':10s} {totals.total:8.1f} ms")
+    if truth is not None:
+        mask = result.alpha >= 128
+        print(f"  IoU vs silhouette {np.count_nonzero(mask & truth) / np.count_nonzero(mask | truth):.4f}")
+
+
+def full_resolution(size: tuple[int, int] = (6000, 4000)) -> None:
+    photo, truth = subject_photo(size)
+    working = photo.copy()
+    working.thumbnail((get_settings().working_size,) * 2)
+    coarse = remove_background(working, model_only())
+    rgb = np.asarray(photo)
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        refined = refine_alpha(rgb, coarse.small, coarse.probability)
+    band_ms = (time.perf_counter() - started) / REPEAT * 1000
+    everywhere = np.ones(coarse.probability.shape, dtype=bool)
+    started = time.perf_counter()
+    refine_alpha(rgb, coarse.small, coarse.probability, everywhere)
+    dense_ms = (time.perf_counter() - started) * 1000
+    mask = refined.alpha >= 128
+    iou = np.count_nonzero(mask & truth) / np.count_nonzero(mask | truth)
+    print(f"{size[0]}x{size[1]} matte from the {coarse.probability.shape[1]} px model output")
+    print(f"  band refinement {band_ms:8.1f} ms   ({refined.band_fraction:.1%} of pixels visited, IoU {iou:.4f})")
+    print(f"  every pixel     {dense_ms:8.1f} ms")
+
+
+def batched(photos: int = 4) -> None:
+    settings = model_only()
+    images = [subject_photo(seed=seed)[0] for seed in range(photos)]
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        for image in images:
+            remove_background(image, settings)
+    single_ms = (time.perf_counter() - started) / REPEAT * 1000
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        remove_background_batch(images, settings)
+    batch_ms = (time.perf_counter() - started) / REPEAT * 1000
+    print(f"{photos} photos of {images[0].width}x{images[0].height}")
+    print(f"  one at a time   {single_ms:8.1f} ms   ({single_ms / photos:.1f} ms per photo)")
+    print(f"  one batch       {batch_ms:8.1f} ms   ({batch_ms / photos:.1f} ms per photo)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            with Image.open(path) as im:
+                im.thumbnail((get_settings().working_size,) * 2)
+                run(im.convert("RGB"))
+    else:
+        run(*subject_photo())
+        full_resolution()
+        batched()
@@ -0,0 +1,126 @@
+"""View-synthesis cost per view with the configured backend.
+
+    python -m benchmarks.views [image ...]
+
+Each image (default: the synthetic subject from ``benchmarks.segment``,
+cut out along its known silhouette) is cropped to its subject like
+preprocessing does and rendered at every synthesized angle of a four-view ring plus top and bottom,
+reporting per-stage timings and the process's peak resident memory.
+Last, the synthesized views are rendered one after another and then
+fanned out over the worker pool from one shared-memory copy of the
+subject; with a worker per view the second should take about as long as
+the slowest view. Finally the same views go through one
+``synthesize_batch`` call, as the view batcher sends them under load.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import resource
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from app.config import get_settings
+from app.imaging.crop import crop_to_subject
+from app.pipeline.views import SEED, resolve_backend, view_layout
+from app.timing import Timings
+from app.workers import SharedArray, fan_out, pool_size, share_array, shutdown_pool
+
+from .segment import subject_photo
+
+REPEAT = 3
+ANGLES = view_layout(4, top=True, bottom=True)[1:]
+
+
+def peak_rss_mib() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def run(subject: np.ndarray) -> None:
+    backend, fallback = resolve_backend(get_settings())
+    print(f"{subject.shape[1]}x{subject.shape[0]} subject via {backend.name} (v{backend.version})")
+    if fallback:
+        print(f"  fallback: {fallback}")
+    backend.synthesize(subject, 90, 0, SEED, Timings())  # warm-up: weights, first-touch allocations
+    for name, azimuth, elevation in ANGLES:
+        totals = Timings()
+        started = time.perf_counter()
+        for _ in range(REPEAT):
+            timings = Timings()
+            backend.synthesize(subject, azimuth, elevation, SEED, timings)
+            for stage, ms in timings.stages.items():
+                totals.stages[stage] = totals.stages.get(stage, 0.0) + ms / REPEAT
+        wall = (time.perf_counter() - started) * 1000 / REPEAT
+        stages = "  ".join(f"{stage} {ms:7.1f}" for stage, ms in totals.stages.items())
+        print(f"  {name:<6} {wall:7.1f} ms   {stages}")
+    print(f"  peak RSS {peak_rss_mib():.0f} MiB")
+
+
+def _synthesize_shared(subject: SharedArray, azimuth: float, elevation: float) -> float:
+    backend, _ = resolve_backend(get_settings())
+    with subject.attach() as pixels:
+        started = time.perf_counter()
+        backend.synthesize(pixels, azimuth, elevation, SEED, Timings())
+        del pixels
+    return (time.perf_counter() - started) * 1000
+
+
+def parallel(subject: np.ndarray) -> None:
+    angles = [(azimuth, elevation) for _, azimuth, elevation in ANGLES]
+    with share_array(subject) as shared:
+        asyncio.run(fan_out(_synthesize_shared, [(shared, *a) for a in angles]))  # warm the workers
+        started = time.perf_counter()
+        serial = [_synthesize_shared(shared, *a) for a in angles]
+        serial_wall = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        pooled = asyncio.run(fan_out(_synthesize_shared, [(shared, *a) for a in angles]))
+        pooled_wall = (time.perf_counter() - started) * 1000
+    shutdown_pool()
+    print(f"  serial   {serial_wall:7.1f} ms   (slowest view {max(serial):.1f})")
+    print(f"  pool x{pool_size():<3} {pooled_wall:7.1f} ms   (slowest view {max(pooled):.1f})")
+
+
+def batched(subject: np.ndarray) -> None:
+    backend, _ = resolve_backend(get_settings())
+    count = len(ANGLES)
+    started = time.perf_counter()
+    for _, azimuth, elevation in ANGLES:
+        backend.synthesize(subject, azimuth, elevation, SEED, Timings())
+    single = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    backend.synthesize_batch(
+        [subject] * count, [a for _, a, _ in ANGLES], [e for _, _, e in ANGLES], [SEED] * count, Timings()
+    )
+    batch = (time.perf_counter() - started) * 1000
+    print(f"  one call per view  {single:7.1f} ms   ({single / count:.1f} per view)")
+    print(f"  one batch of {count:<5} {batch:7.1f} ms   ({batch / count:.1f} per view)")
+
+
+def cut_out(image: Image.Image, alpha: np.ndarray) -> np.ndarray:
+    rgba = image.convert("RGBA")
+    rgba.putalpha(Image.fromarray(alpha))
+    cropped = crop_to_subject(rgba, alpha, get_settings().working_size)
+    return np.asarray(cropped[0] if cropped else rgba)
+
+
+def main(paths: list[str]) -> None:
+    if not paths:
+        image, silhouette = subject_photo()
+        subjects = [cut_out(image, silhouette.astype(np.uint8) * 255)]
+    else:
+        subjects = []
+    for path in paths:
+        with Image.open(path) as im:
+            rgba = im.convert("RGBA")
+        subjects.append(cut_out(rgba, np.asarray(rgba)[..., 3]))
+    for subject in subjects:
+        run(subject)
+        parallel(subject)
+        batched(subject)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
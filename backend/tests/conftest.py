@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import io
+from collections.abc import Iterator
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app import config, dedup, similarity
+from app.ingest import budget
+from app.segmentation import cache as mask_cache
+from app.synthesis import cache as view_cache
+from app.workers import shutdown_pool
+
+# Singletons built from the settings, rebuilt for every test's data directory.
+CACHED = (
+    config.get_settings,
+    dedup.get_index,
+    similarity.get_index,
+    mask_cache.get_cache,
+    view_cache.get_view_cache,
+    budget.get_budget,
+)
+
+
+@pytest.fixture(autouse=True)
+def settings(tmp_path, monkeypatch) -> Iterator[config.Settings]:
+    monkeypatch.setenv("PROTOSCALE_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("PROTOSCALE_WARM_WORKERS", "0")
+    monkeypatch.setenv("PROTOSCALE_WORKER_PROCESSES", "1")
+    monkeypatch.setenv("PROTOSCALE_WORKING_SIZE", "256")
+    for getter in CACHED:
+        getter.cache_clear()
+    yield config.get_settings()
+    shutdown_pool()
+    for getter in CACHED:
+        getter.cache_clear()
+
+
+@pytest.fixture
+def client() -> Iterator[TestClient]:
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+def photo(width: int = 640, height: int = 480, seed: int = 0) -> Image.Image:
+    """A lit disc on a plain backdrop with some texture: passes the quality check."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[:height, :width]
+    inside = (x - width / 2) ** 2 + (y - height / 2) ** 2 < (min(width, height) / 3) ** 2
+    pixels = np.where(inside[..., None], [190, 120, 60], [235, 235, 235]).astype(np.float64)
+    pixels += rng.normal(0, 4, pixels.shape) + (np.sin(x / 3) * 25 * inside)[..., None]
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "RGB")
+
+
+def encode(image: Image.Image, format: str = "JPEG", **params) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format, **params)
+    return buffer.getvalue()
+
+
+def upload(client: TestClient, data: bytes, content_type: str = "image/jpeg", **params) -> dict:
+    response = client.post("/api/uploads", params=params, content=data, headers={"Content-Type": content_type})
+    assert response.status_code == 201, response.text
+    return response.json()
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app import config
+from app.segmentation import backdrop
+from app.segmentation.classical import srgb_to_lab
+from app.segmentation.engine import remove_background
+
+from .conftest import encode, photo, upload
+
+
+def _disc(width: int = 640, height: int = 480) -> np.ndarray:
+    y, x = np.mgrid[:height, :width]
+    return (x - width / 2) ** 2 + (y - height / 2) ** 2 < (min(width, height) / 3) ** 2
+
+
+def _busy(width: int = 640, height: int = 480) -> Image.Image:
+    """``photo``'s subject in front of a cluttered scene instead of a sweep."""
+    rng = np.random.default_rng(1)
+    scene = np.asarray(Image.fromarray(rng.integers(0, 256, (12, 16, 3), dtype=np.uint8)).resize((width, height)))
+    pixels = np.where(_disc(width, height)[..., None], np.asarray(photo(width, height)), scene)
+    return Image.fromarray(pixels.astype(np.uint8))
+
+
+def test_a_plain_sweep_is_detected():
+    found = backdrop.detect(srgb_to_lab(np.asarray(photo(256, 192))))
+    assert found.uniformity > 0.97
+    assert found.color[0] == pytest.approx(92.8, abs=1)
+    assert found.to_dict()["uniformity"] == round(found.uniformity, 4)
+    assert backdrop.detect(srgb_to_lab(np.asarray(_busy(256, 192)))).uniformity < 0.5
+
+
+def test_the_subject_is_whatever_differs_from_the_sweep():
+    small = np.asarray(photo(256, 192))
+    lab = srgb_to_lab(small)
+    probability = backdrop.segment(small, backdrop.detect(lab), lab)
+    assert probability.dtype == np.float32
+    assert np.mean((probability >= 0.5) == _disc(256, 192)) > 0.99
+
+
+def test_open_close_removes_specks_and_fills_pinholes():
+    mask = np.zeros((40, 40), bool)
+    mask[10:30, 10:30] = True
+    mask[20, 20] = False
+    mask[2, 2] = True
+    cleaned = backdrop.opened_closed(mask, 1)
+    assert cleaned[20, 20] and not cleaned[2, 2]
+    assert cleaned[10:30, 10:30].all()
+
+
+def test_remove_background_takes_the_fast_path_on_a_sweep(settings):
+    segmentation = remove_background(photo(), settings)
+    assert segmentation.path == "backdrop" and segmentation.model == backdrop.NAME
+    assert "cluster" not in segmentation.timings.to_dict()
+    assert np.mean((segmentation.alpha >= 128) == _disc()) > 0.99
+    assert segmentation.to_dict()["backdrop"]["uniformity"] > 0.97
+
+
+def test_remove_background_runs_the_model_on_a_busy_scene(settings):
+    segmentation = remove_background(_busy(), settings)
+    assert segmentation.path == "model" and segmentation.model == "classical"
+    assert "backdrop" not in segmentation.to_dict()
+
+
+def test_the_threshold_is_configurable(monkeypatch):
+    monkeypatch.setenv("PROTOSCALE_BACKDROP_UNIFORMITY", "1.01")
+    config.get_settings.cache_clear()
+    assert remove_background(photo(), config.get_settings()).path == "model"
+
+
+def test_preprocess_records_the_path(client):
+    project_id = upload(client, encode(photo()))["project_id"]
+    source = client.post(f"/api/projects/{project_id}/preprocess").json()["sources"][0]
+    assert source["segmentation"]["path"] == "backdrop"
+    assert source["segmentation"]["model"] == "backdrop"
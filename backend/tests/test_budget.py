@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import asyncio
+
+from app.imaging.probe import Admission
+from app.ingest.budget import MemoryBudget
+
+
+def test_budget_queues_in_arrival_order():
+    async def run():
+        budget = MemoryBudget(100)
+        order = []
+
+        async def decode(name: str, admission: Admission, hold: float):
+            async with budget.reserve(admission):
+                order.append(name)
+                await asyncio.sleep(hold)
+
+        first = asyncio.create_task(decode("first", Admission("large", 80), 0.05))
+        await asyncio.sleep(0)
+        # "big" can't fit next to "first"; "medium" could, but arrived later and must not overtake it.
+        big = asyncio.create_task(decode("big", Admission("large", 60), 0))
+        await asyncio.sleep(0)
+        medium = asyncio.create_task(decode("medium", Admission("standard", 10), 0))
+        await asyncio.sleep(0)
+        small = asyncio.create_task(decode("small", Admission("small", 10**9), 0))
+        await asyncio.gather(first, big, medium, small)
+        return order, budget.reserved
+
+    order, reserved = asyncio.run(run())
+    assert order == ["first", "small", "big", "medium"]
+    assert reserved == 0
+
+
+def test_budget_is_returned_when_a_decode_fails():
+    async def run():
+        budget = MemoryBudget(100)
+        try:
+            async with budget.reserve(Admission("large", 80)):
+                raise OSError("corrupt")
+        except OSError:
+            pass
+        return budget.reserved
+
+    assert asyncio.run(run()) == 0
+
+
+def test_oversized_decode_runs_alone():
+    budget = MemoryBudget(100)
+    assert budget.cost(Admission("large", 500)) == 100
+    assert budget.try_reserve(Admission("large", 500)) == 100
+    assert budget.try_reserve(Admission("standard", 1)) is None
+    assert budget.try_reserve(Admission("small", 500)) == 0
+    assert MemoryBudget(0).cost(Admission("large", 500)) == 0
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.imaging.crop import CropTransform, crop_to_subject, square_crop, subject_box
+from app.projects import load_project
+
+from .conftest import encode, photo, upload
+
+
+def _cutout(box: tuple[int, int, int, int], size: tuple[int, int] = (400, 300)) -> tuple[Image.Image, np.ndarray]:
+    left, top, right, bottom = box
+    alpha = np.zeros(size[::-1], np.uint8)
+    alpha[top:bottom, left:right] = 255
+    image = Image.new("RGBA", size, (200, 100, 50, 255))
+    image.putalpha(Image.fromarray(alpha))
+    return image, alpha
+
+
+def test_subject_box_ignores_faint_alpha():
+    alpha = np.zeros((50, 60), np.uint8)
+    alpha[10:20, 30:45] = 255
+    alpha[0, 0] = 4
+    assert subject_box(alpha) == (30, 10, 45, 20)
+    assert subject_box(np.zeros((5, 5), np.uint8)) is None
+
+
+def test_square_crop_centres_the_box_with_a_margin():
+    crop = square_crop((100, 50, 200, 250), max_size=1024)
+    assert crop.side == 200 + 2 * 16
+    assert (crop.left + crop.side / 2, crop.top + crop.side / 2) == (150, 150)
+    assert crop.size == crop.side and crop.scale == 1
+    assert square_crop((0, 0, 2000, 1000), max_size=512).size == 512
+
+
+def test_transform_round_trips():
+    crop = CropTransform(left=-20, top=40, side=400, size=200)
+    assert crop.scale == 0.5
+    assert crop.to_working(*crop.to_canvas(123.0, 77.0)) == pytest.approx((123.0, 77.0))
+    assert crop.to_dict() == {"left": -20, "top": 40, "side": 400, "size": 200, "scale": 0.5}
+
+
+def test_crop_scales_to_the_canvas_and_pads_transparent():
+    image, alpha = _cutout((0, 100, 300, 200))
+    square, crop = crop_to_subject(image, alpha, max_size=128)
+    assert square.size == (128, 128) and crop.size == 128
+    # The crop reaches past the left edge and above and below the box; all of that is transparent.
+    canvas = np.asarray(square.getchannel("A"))
+    assert canvas[0].max() == 0 and canvas[-1].max() == 0
+    assert canvas[64, 64] == 255
+    # The subject's corner maps back to where it was.
+    x, y = crop.to_working(*crop.to_canvas(0, 100))
+    assert (x, y) == pytest.approx((0, 100))
+
+
+def test_no_subject_no_crop():
+    image, alpha = _cutout((0, 0, 0, 0))
+    assert crop_to_subject(image, alpha, 128) is None
+
+
+def test_preprocess_shows_the_cropped_subject(client):
+    project_id = upload(client, encode(photo()))["project_id"]
+    client.post(f"/api/projects/{project_id}/preprocess")
+    project = load_project(project_id)
+    subject = project.sources[0].working["subject"]
+    # The disc is 128 px across in the 256x192 working image.
+    assert subject["crop"]["side"] == pytest.approx(128 * 1.16, abs=3)
+    with Image.open(project.dir / subject["path"]) as square:
+        assert square.mode == "RGBA" and square.width == square.height == subject["crop"]["size"]
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import io
+from contextlib import asynccontextmanager
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.ingest import budget
+from app.projects import load_project
+from app.segmentation.refine import boundary_cells, refine_alpha
+
+from .conftest import encode, photo, upload
+from .test_normalize import P3_COLUMNS, _gamma, _icc
+
+
+def _disc(width: int, height: int) -> np.ndarray:
+    y, x = np.mgrid[:height, :width]
+    return (x - width / 2) ** 2 + (y - height / 2) ** 2 < (min(width, height) / 3) ** 2
+
+
+def _cutout(client, data: bytes, content_type: str = "image/jpeg") -> tuple[str, Image.Image]:
+    project_id = upload(client, data, content_type)["project_id"]
+    assert client.post(f"/api/projects/{project_id}/preprocess").status_code == 200
+    response = client.get(f"/api/projects/{project_id}/sources/0/cutout")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    return project_id, Image.open(io.BytesIO(response.content))
+
+
+def test_refinement_only_visits_the_outline():
+    truth = _disc(1024, 768)
+    rgb = np.where(truth[..., None], [190, 120, 60], [235, 235, 235]).astype(np.uint8)
+    small = np.asarray(Image.fromarray(rgb).resize((128, 96), Image.Resampling.BOX))
+    probability = _disc(128, 96).astype(np.float32)
+    refined = refine_alpha(rgb, small, probability)
+    assert refined.alpha.shape == truth.shape
+    assert np.mean((refined.alpha >= 128) == truth) > 0.999
+    # Only cells along the circle, a few percent of the frame.
+    assert 0 < refined.band_fraction < 0.1
+    assert boundary_cells(probability).sum() * 64 >= refined.band_pixels
+
+
+def test_refinement_of_a_uniform_map_is_a_plain_upsample():
+    rgb = np.zeros((64, 64, 3), np.uint8)
+    refined = refine_alpha(rgb, rgb[::4, ::4], np.ones((16, 16), np.float32))
+    assert refined.band_pixels == 0 and (refined.alpha == 255).all()
+
+
+def test_full_cutout_is_matted_at_source_resolution(client):
+    project_id, image = _cutout(client, encode(photo(1024, 768)))
+    assert image.mode == "RGBA" and image.size == (1024, 768)
+    alpha = np.asarray(image.getchannel("A"))
+    assert np.mean((alpha >= 128) == _disc(1024, 768)) > 0.99
+    # Built once, then served from disk.
+    project = load_project(project_id)
+    built = (project.dir / "cutout-full-0.png").stat().st_mtime_ns
+    client.get(f"/api/projects/{project_id}/sources/0/cutout")
+    assert (project.dir / "cutout-full-0.png").stat().st_mtime_ns == built
+
+
+def test_full_cutout_is_upright(client):
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    _, image = _cutout(client, encode(photo(400, 300), exif=exif.tobytes()))
+    assert image.size == (300, 400)
+
+
+def test_full_cutout_keeps_16_bit_levels(client):
+    levels = np.where(_disc(320, 240), 20000, 50000).astype(np.uint16)
+    data = encode(Image.fromarray(levels), "PNG")
+    _, image = _cutout(client, data, "image/png")
+    rgb = np.asarray(image.convert("RGB"))
+    # Not clipped to white: the subject keeps its grey (20000 >> 8 = 78).
+    assert abs(int(np.median(rgb[_disc(320, 240)])) - 78) <= 2
+
+
+def test_full_cutout_has_the_working_image_colours(client):
+    # Under the working size, the working image is the normalized source itself.
+    profile = _icc(P3_COLUMNS, _gamma(2.2))
+    project_id, image = _cutout(client, encode(photo(200, 150), "PNG", icc_profile=profile), "image/png")
+    project = load_project(project_id)
+    with Image.open(project.dir / project.sources[0].working["path"]) as working:
+        assert np.array_equal(np.asarray(image.convert("RGB")), np.asarray(working.convert("RGB")))
+    assert "icc_profile" not in image.info
+
+
+def test_full_cutout_waits_for_decode_memory(client, monkeypatch):
+    reserved = []
+    memory = budget.get_budget()
+    original = memory.reserve
+
+    @asynccontextmanager
+    async def reserve(admission):
+        reserved.append(admission)
+        async with original(admission):
+            yield
+
+    monkeypatch.setattr(memory, "reserve", reserve)
+    project_id, _ = _cutout(client, encode(photo(1600, 1200)))
+    source = load_project(project_id).sources[0]
+    # Held at the cost of a full-size decode, not the working-size one the upload was admitted with.
+    assert [admission.tier for admission in reserved] == [source.tier]
+    assert reserved[0].memory_estimate > 1600 * 1200 * 3 > source.memory_estimate
+
+
+def test_cutout_needs_background_removal(client):
+    project_id = upload(client, encode(photo()), remove_background=False)["project_id"]
+    client.post(f"/api/projects/{project_id}/preprocess")
+    assert client.get(f"/api/projects/{project_id}/sources/0/cutout").status_code == 404
+    assert client.get(f"/api/projects/{project_id}/sources/1/cutout").status_code == 404
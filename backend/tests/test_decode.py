@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.imaging.decode import IncrementalDecoder, load_working_image, working_dimensions
+from app.imaging.probe import jpeg_scale, probe
+
+from app.projects import load_project
+
+from .conftest import encode, photo, upload
+
+
+def _decode(data: bytes, target: int):
+    return load_working_image(io.BytesIO(data), probe(io.BytesIO(data)), target)
+
+
+@pytest.mark.parametrize(
+    ("size", "target", "scale"),
+    [((4000, 3000), 500, 8), ((4000, 3000), 1000, 4), ((4000, 3000), 1024, 2), ((800, 600), 1024, 1)],
+)
+def test_jpeg_scale_keeps_the_working_size(size, target, scale):
+    assert jpeg_scale(*size, target) == scale
+    assert -(-max(size) // scale) >= min(target, max(size))
+
+
+def test_jpeg_is_drafted_at_dct_scale():
+    decoded = _decode(encode(photo(1600, 1200), quality=85), 400)
+    assert decoded.decode_scale == 4
+    assert decoded.decoded_size == (400, 300)
+    assert decoded.image.size == (400, 300)
+
+
+def test_grey_jpeg_stays_grey():
+    decoded = _decode(encode(photo(1600, 1200).convert("L")), 400)
+    assert decoded.image.mode == "L" and decoded.decode_scale == 4
+
+
+def test_png_is_decoded_in_full_then_reduced():
+    decoded = _decode(encode(photo(900, 600), "PNG"), 300)
+    assert (decoded.decode_scale, decoded.decoded_size) == (1, (900, 600))
+    assert decoded.image.size == (300, 200)
+
+
+def test_small_images_keep_their_size():
+    decoded = _decode(encode(photo(200, 100), "PNG"), 300)
+    assert decoded.image.size == (200, 100)
+    assert working_dimensions(200, 100, 300) == (200, 100)
+
+
+def test_palette_png_becomes_rgba_with_transparency():
+    image = photo(64, 48).quantize(16)
+    decoded = _decode(encode(image, "PNG", transparency=0), 64)
+    assert decoded.image.mode == "RGBA"
+
+
+def test_16_bit_grey_png_keeps_its_levels():
+    levels = np.linspace(0, 65535, 64 * 64).astype(np.uint16).reshape(64, 64)
+    data = encode(Image.fromarray(levels), "PNG")
+    assert probe(io.BytesIO(data)).bit_depth == 16
+    decoded = _decode(data, 64)
+    assert decoded.image.mode == "L"
+    assert np.array_equal(np.asarray(decoded.image), (levels >> 8).astype(np.uint8))
+
+
+def _decode_in_chunks(data: bytes, target: int, chunk: int):
+    decoder = IncrementalDecoder(probe(io.BytesIO(data)), target)
+    for start in range(0, len(data), chunk):
+        decoder.feed(data[start : start + chunk])
+    return decoder.close()
+
+
+@pytest.mark.parametrize("progressive", [False, True])
+def test_incremental_decode_matches_whole_file(progressive):
+    data = encode(photo(1600, 1200), quality=85, progressive=progressive)
+    whole = _decode(data, 400)
+    streamed = _decode_in_chunks(data, 400, 1000)
+    assert streamed.decode_scale == whole.decode_scale == 4
+    assert streamed.decoded_size == whole.decoded_size == (400, 300)
+    assert np.array_equal(np.asarray(streamed.image), np.asarray(whole.image))
+
+
+def test_incremental_decode_of_a_cut_body_fails():
+    data = encode(photo())
+    decoder = IncrementalDecoder(probe(io.BytesIO(data)), 320)
+    decoder.feed(data[: len(data) // 2])
+    with pytest.raises(OSError, match="incomplete"):
+        decoder.close()
+
+
+def test_incremental_decode_is_jpeg_only():
+    info = probe(io.BytesIO(encode(photo(64, 48), "PNG")))
+    with pytest.raises(ValueError):
+        IncrementalDecoder(info, 32)
+
+
+def _stream(data: bytes, chunk: int = 4096):
+    for start in range(0, len(data), chunk):
+        yield data[start : start + chunk]
+
+
+@pytest.mark.parametrize(
+    ("format", "content_type", "in_stream", "decoded_size"),
+    [("JPEG", "image/jpeg", True, [320, 240]), ("PNG", "image/png", False, [640, 480])],
+)
+def test_jpeg_uploads_are_decoded_as_they_arrive(client, format, content_type, in_stream, decoded_size):
+    data = encode(photo(), format)
+    response = client.post("/api/uploads", content=_stream(data), headers={"Content-Type": content_type})
+    assert response.status_code == 201
+    body = response.json()
+    assert body["stats"]["decoded_in_stream"] is in_stream
+    # Either way preprocessing starts from the decode made during the upload.
+    client.post(f"/api/projects/{body['project_id']}/preprocess")
+    source = load_project(body["project_id"]).sources[0]
+    assert source.predecoded["in_stream"] is in_stream
+    assert source.working["decoded_in_stream"] is in_stream
+    # The JPEG was drafted at half size on the way in; the PNG had to be decoded whole.
+    assert source.working["decoded_size"] == decoded_size
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import pytest
+
+from app.dedup import find_producer, record_artifacts, source_hash
+from app.ingest.pipeline import IngestPipeline
+from app.imaging.decode import IncrementalDecoder
+from app.projects import ProjectOptions, load_project
+
+from .conftest import encode, photo, upload
+
+ARTIFACTS = {"model_url": "/mesh.glb", "analysis": {"watertight": True}}
+
+
+def _produce(client, data: bytes, content_type: str = "image/jpeg", **params) -> dict:
+    """Upload and preprocess ``data`` and give the project some artifacts, as a finished run would."""
+    first = upload(client, data, content_type, **params)
+    assert client.post(f"/api/projects/{first['project_id']}/preprocess").status_code == 200
+    record_artifacts(load_project(first["project_id"]), **ARTIFACTS)
+    return first
+
+
+@pytest.fixture
+def no_decoding(monkeypatch):
+    def fail(*args):
+        raise AssertionError("a repeat upload was decoded")
+
+    monkeypatch.setattr(IngestPipeline, "_decode_file", fail)
+    monkeypatch.setattr(IncrementalDecoder, "close", fail)
+
+
+def test_first_upload_misses(client):
+    assert upload(client, encode(photo()))["deduplicated"] is False
+
+
+@pytest.mark.parametrize("content_type", ["image/jpeg", "image/png"])
+def test_repeat_upload_gets_the_results_without_decoding(client, content_type, request):
+    data = encode(photo(), "JPEG" if content_type == "image/jpeg" else "PNG")
+    first = _produce(client, data, content_type)
+    request.getfixturevalue("no_decoding")
+    repeat = upload(client, data, content_type)
+    assert repeat["deduplicated"] is True
+    assert repeat["project_id"] != first["project_id"]
+    assert repeat["artifacts"] == ARTIFACTS
+    assert repeat["quality"] == first["quality"]
+    assert not repeat["stats"]["decoded_in_stream"]
+
+    project = load_project(repeat["project_id"])
+    working = project.sources[0].working
+    assert repeat["sources"] == [working]
+    # The project owns copies of the preprocessing output, cut-out link included.
+    assert working["pyramid"]["full"] == f"/api/projects/{project.id}/sources/0/cutout"
+    assert (project.dir / working["subject"]["path"]).is_file()
+    assert not (project.dir / "decoded-0.png").exists()
+    assert client.get(working["pyramid"]["full"]).status_code == 200
+
+
+def test_repeat_with_other_options_misses(client):
+    data = encode(photo())
+    _produce(client, data)
+    assert upload(client, data, remove_background=False)["deduplicated"] is False
+    assert upload(client, data, enhanced_detail=True)["deduplicated"] is False
+
+
+def test_project_that_changed_stops_producing(client):
+    data = encode(photo())
+    first = _produce(client, data)
+    sha256 = first["sha256"]
+    assert find_producer(sha256, ProjectOptions()) is not None
+    upload(client, encode(photo(seed=1)), project_id=first["project_id"])
+    assert find_producer(sha256, ProjectOptions()) is None
+    assert upload(client, data)["deduplicated"] is False
+
+
+def test_repeat_set_of_photos(client):
+    photos = [encode(photo(seed=seed)) for seed in (1, 2)]
+    first = upload(client, photos[0])
+    upload(client, photos[1], project_id=first["project_id"])
+    client.post(f"/api/projects/{first['project_id']}/preprocess")
+    record_artifacts(load_project(first["project_id"]), **ARTIFACTS)
+
+    again = upload(client, photos[0])
+    assert again["deduplicated"] is False
+    last = upload(client, photos[1], project_id=again["project_id"])
+    assert last["deduplicated"] is True
+    assert last["artifacts"] == ARTIFACTS
+    assert [source["pyramid"]["256"] for source in last["sources"]] == [
+        source.working["pyramid"]["256"] for source in load_project(first["project_id"]).sources
+    ]
+    assert source_hash(load_project(again["project_id"])) == source_hash(load_project(first["project_id"]))
+
+
+def test_resumable_repeat(client, request):
+    data = encode(photo())
+    _produce(client, data)
+    request.getfixturevalue("no_decoding")
+    upload_id = client.post(
+        "/api/uploads/resumable", json={"content_type": "image/jpeg", "size": len(data)}
+    ).json()["upload_id"]
+    client.patch(f"/api/uploads/resumable/{upload_id}", content=data, headers={"Upload-Offset": "0"})
+    response = client.post(f"/api/uploads/resumable/{upload_id}/finalize")
+    assert response.status_code == 201, response.text
+    assert response.json()["deduplicated"] is True
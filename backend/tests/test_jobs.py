@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from app import jobs
+from app.jobs import Job, active_job, get_job, start_job
+
+from .conftest import encode, photo, upload
+
+
+@pytest.fixture(autouse=True)
+def no_jobs(monkeypatch):
+    monkeypatch.setattr(jobs, "_jobs", {})
+
+
+def _events(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_snapshot_carries_items_until_the_result():
+    job = Job("j", "views", "p", total=4)
+    job.update(status="running", completed=1, items=["a", None, None, None])
+    state = job.snapshot()
+    assert state["progress"] == 0.25 and state["items"] == ["a", None, None, None]
+    job.update(status="done", result=["a", "b", "c", "d"])
+    state = job.snapshot()
+    assert state["progress"] == 1.0 and state["result"] == ["a", "b", "c", "d"] and "items" not in state
+
+
+def test_watchers_get_coalesced_updates_and_the_end():
+    async def run() -> list[dict]:
+        job = Job("j", "views", "p", total=100)
+        seen = []
+
+        async def watch() -> None:
+            async for state in job.watch(interval=0.05):
+                seen.append(state)
+
+        watcher = asyncio.create_task(watch())
+        await asyncio.sleep(0)
+        for i in range(100):
+            job.update(completed=i + 1)
+            await asyncio.sleep(0.001)
+        job.update(status="done", result="ok")
+        await watcher
+        return seen
+
+    seen = asyncio.run(run())
+    # A hundred updates in ~0.1 s, at most one event per 50 ms, and the terminal state always arrives.
+    assert len(seen) <= 6
+    assert seen[-1]["status"] == "done" and seen[-1]["result"] == "ok"
+
+
+def test_jobs_run_in_the_background_and_report_failures():
+    async def run() -> tuple[Job, Job]:
+        async def work(job: Job) -> int:
+            assert active_job("p", "views") is job
+            job.update(total=1, completed=1)
+            return 42
+
+        async def fail(job: Job) -> None:
+            raise RuntimeError("backend crashed")
+
+        done, failed = start_job("views", "p", work), start_job("other", "p", fail)
+        while any(j.status not in jobs.TERMINAL for j in (done, failed)):
+            await asyncio.sleep(0.001)
+        return done, failed
+
+    done, failed = asyncio.run(run())
+    assert (done.status, done.result) == ("done", 42)
+    assert (failed.status, failed.error) == ("failed", "backend crashed")
+    assert active_job("p", "views") is None
+    assert get_job(done.id) is done
+
+
+def test_finished_jobs_expire():
+    old = Job("old", "views", "p", status="done", finished_at=time.time() - jobs.JOB_RETENTION - 1)
+    running = Job("running", "views", "p", status="running")
+    jobs._jobs.update(old=old, running=running)
+
+    async def run() -> None:
+        async def work(job: Job) -> None:
+            pass
+
+        start_job("views", "q", work)
+
+    asyncio.run(run())
+    with pytest.raises(jobs.JobNotFound):
+        get_job("old")
+    assert get_job("running") is running
+
+
+def test_job_endpoints(client):
+    assert client.get("/api/jobs/nope").status_code == 404
+    assert client.get("/api/jobs/nope/events").status_code == 404
+    job = Job("j", "views", "p", status="done", result=[1], finished_at=time.time())
+    jobs._jobs["j"] = job
+    assert client.get("/api/jobs/j").json()["result"] == [1]
+    response = client.get("/api/jobs/j/events")
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert _events(response.text) == [("done", job.snapshot())]
+
+
+def test_view_job_streams_progress_to_the_end(client):
+    project_id = upload(client, encode(photo()))["project_id"]
+    assert client.post(f"/api/projects/{project_id}/views").status_code == 409
+    client.post(f"/api/projects/{project_id}/preprocess")
+    started = client.post(f"/api/projects/{project_id}/views")
+    assert started.status_code == 202
+    body = started.json()
+    assert body["events_url"] == f"/api/jobs/{body['job_id']}/events"
+    events = _events(client.get(body["events_url"]).text)
+    kinds = [kind for kind, _ in events]
+    assert kinds[-1] == "done" and set(kinds[:-1]) <= {"progress"}
+    assert len(events[-1][1]["result"]) == 4
+
+
+def test_running_view_job_blocks_conflicting_requests(client):
+    project_id = upload(client, encode(photo()))["project_id"]
+    client.post(f"/api/projects/{project_id}/preprocess")
+    params = {"ring": 4, "top": False, "bottom": False}
+    jobs._jobs["j"] = Job("j", "views", project_id, params, status="running")
+    # The same layout joins the running job; another one can't start.
+    assert client.post(f"/api/projects/{project_id}/views", json=params).json()["job_id"] == "j"
+    assert client.post(f"/api/projects/{project_id}/views", json={"ring": 8}).status_code == 409
+    response = client.post(f"/api/projects/{project_id}/preprocess")
+    assert response.status_code == 409
+    assert "still being generated" in response.json()["detail"]
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from app.segmentation import cache
+from app.segmentation.cache import MaskCache, mask_key, pack, unpack
+from app.segmentation.engine import remove_background
+from app.segmentation.refine import boundary_cells
+
+from .conftest import encode, photo, upload
+
+SHA = "ab" * 32
+
+
+def _probability() -> np.ndarray:
+    y, x = np.mgrid[:192, :256]
+    distance = np.sqrt((x - 128) ** 2 + (y - 96) ** 2)
+    return np.clip((64 - distance) / 4 + 0.5, 0, 1).astype(np.float32)
+
+
+def test_pack_keeps_confident_cells_exact_and_boundary_to_8_bits():
+    probability = _probability()
+    packed = pack(probability)
+    assert len(packed) < 16 * 1024
+    restored = unpack(packed)
+    cells = boundary_cells(probability)
+    assert np.abs(restored[cells] - probability[cells]).max() <= 0.5 / 255 + 1e-6
+    assert np.array_equal(restored[~cells], (probability[~cells] >= 0.5).astype(np.float32))
+    assert unpack(pack(restored)).tobytes() == restored.tobytes()
+
+
+def test_keys_cover_everything_that_shapes_the_model_input():
+    key = mask_key(SHA, "classical", "1", input_size=256, working_size=1024)
+    assert key == mask_key(SHA, "classical", "1", working_size=1024, input_size=256)
+    assert key != mask_key(SHA, "classical", "2", input_size=256, working_size=1024)
+    assert key != mask_key(SHA, "onnx", "1", input_size=256, working_size=1024)
+    assert key != mask_key(SHA, "classical", "1", input_size=320, working_size=1024)
+    assert key != mask_key("cd" * 32, "classical", "1", input_size=256, working_size=1024)
+
+
+def test_memory_tier_is_an_lru_over_the_disk(tmp_path):
+    store = MaskCache(tmp_path, memory_budget=250)
+    for name in "abc":
+        store.put(name * 64, bytes(100))
+    # Only the two most recent fit in memory; the disk has all three.
+    assert store.memory_bytes == 200
+    assert store.get("c" * 64) == (bytes(100), "memory")
+    assert store.get("a" * 64) == (bytes(100), "disk")
+    assert store.get("a" * 64)[1] == "memory"
+    assert MaskCache(tmp_path, 250).get("b" * 64) == (bytes(100), "disk")
+    assert store.get("d" * 64) is None
+
+
+@pytest.fixture
+def model_only(settings):
+    return replace(settings, backdrop_uniformity=2.0)
+
+
+def test_a_hit_reproduces_the_model_run(model_only):
+    first = remove_background(photo(), model_only, SHA)
+    assert first.cache == "miss"
+    again = remove_background(photo(), model_only, SHA)
+    assert again.cache == "memory"
+    assert np.array_equal(again.alpha, first.alpha)
+    assert "cluster" not in again.timings.to_dict()
+    cache.get_cache.cache_clear()
+    assert remove_background(photo(), model_only, SHA).cache == "disk"
+    assert remove_background(photo(), model_only).cache == "off"
+
+
+def test_options_that_dont_shape_the_input_reuse_the_mask(client):
+    data = encode(photo())
+    tiers = []
+    for enhanced_detail in (False, True):
+        project_id = upload(client, data, enhanced_detail=enhanced_detail)["project_id"]
+        source = client.post(f"/api/projects/{project_id}/preprocess").json()["sources"][0]
+        tiers.append(source["segmentation"]["cache"])
+    assert tiers[0] == "miss" and tiers[1] in ("memory", "disk")
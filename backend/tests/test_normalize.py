@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import struct
+
+import numpy as np
+import pytest
+from PIL import Image, ImageCms
+
+from app.imaging.normalize import SRGB, SRGB_TO_XYZ_D50, encode_srgb, normalize, orient, parse_icc, profile_for
+from app.projects import load_project
+
+from .conftest import encode, photo, upload
+
+# Pillow's equivalent of each EXIF orientation.
+TRANSPOSES = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+# Display P3 primaries, D50-adapted.
+P3_COLUMNS = [(0.5151, 0.2412, -0.0011), (0.2920, 0.6922, 0.0419), (0.1571, 0.0666, 0.7841)]
+
+
+def _icc(columns, trc: bytes) -> bytes:
+    """A minimal matrix/TRC RGB profile: header, tag table, XYZ and curve tags."""
+    xyz = [b"XYZ \0\0\0\0" + b"".join(struct.pack(">i", round(v * 65536)) for v in c) for c in columns]
+    tags = list(zip((b"rXYZ", b"gXYZ", b"bXYZ"), xyz)) + [(sig, trc) for sig in (b"rTRC", b"gTRC", b"bTRC")]
+    offset = 128 + 4 + 12 * len(tags)
+    table, body = b"", b""
+    for sig, data in tags:
+        table += struct.pack(">4sII", sig, offset + len(body), len(data))
+        body += data
+    header = bytearray(128)
+    header[16:20] = b"RGB "
+    return bytes(header) + struct.pack(">I", len(tags)) + table + body
+
+
+def _gamma(value: float) -> bytes:
+    return b"curv\0\0\0\0" + struct.pack(">IH", 1, round(value * 256))
+
+
+@pytest.mark.parametrize("orientation", range(1, 9))
+def test_orient_matches_exif_transpose(orientation):
+    pixels = np.arange(4 * 6 * 3, dtype=np.uint8).reshape(4, 6, 3)
+    upright = orient(pixels, orientation)
+    image = Image.fromarray(pixels)
+    expected = image.transpose(TRANSPOSES[orientation]) if orientation in TRANSPOSES else image
+    assert np.array_equal(upright, np.asarray(expected))
+    assert np.shares_memory(upright, pixels)
+
+
+def test_srgb_profiles_take_the_plain_path():
+    srgb = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+    assert parse_icc(srgb) is SRGB
+    assert profile_for(None) is SRGB
+    assert parse_icc(b"not a profile") is SRGB
+
+
+def test_wide_gamut_goes_through_the_matrix():
+    srgb_trc = b"para\0\0\0\0" + struct.pack(">H2x", 3) + b"".join(
+        struct.pack(">i", round(v * 65536)) for v in (2.4, 1 / 1.055, 0.055 / 1.055, 1 / 12.92, 0.04045)
+    )
+    p3 = parse_icc(_icc(P3_COLUMNS, srgb_trc))
+    assert p3.name == "icc" and p3.matrix is not None
+    red = normalize(np.array([[[255, 0, 0]]], np.uint8), profile=p3).linear[0, 0]
+    # P3 red lies outside sRGB: more than full red, negative green and blue.
+    assert red[0] > 1.1 and red[1] < 0 and red[2] < 0
+    white = normalize(np.array([[[255, 255, 255]]], np.uint8), profile=p3).linear[0, 0]
+    assert np.allclose(white, 1, atol=0.01)
+
+
+def test_transfer_curves_are_decoded():
+    gamma = parse_icc(_icc(SRGB_TO_XYZ_D50.T, _gamma(1.8)))
+    assert gamma.matrix is None
+    grey = normalize(np.full((1, 1, 3), 128, np.uint8), profile=gamma).linear[0, 0]
+    assert np.allclose(grey, (128 / 255) ** 1.8, atol=1e-3)
+
+
+def test_normalize_channels_and_alpha():
+    grey = normalize(np.full((2, 3), 255, np.uint8))
+    assert grey.linear.shape == (2, 3, 3) and grey.alpha is None
+    rgba = np.zeros((2, 3, 4), np.uint8)
+    rgba[..., 3] = 255
+    rgba[0, 0, 3] = 0
+    result = normalize(rgba, orientation=6)
+    assert result.linear.shape == (3, 2, 3) and result.linear.flags.c_contiguous
+    assert result.alpha.shape == (3, 2) and result.alpha.min() == 0 and result.alpha.max() == 1
+
+
+def test_encode_round_trips_srgb_codes():
+    codes = np.arange(256, dtype=np.uint8).reshape(16, 16)
+    linear = normalize(codes).linear[..., 0]
+    assert np.abs(encode_srgb(linear).astype(int) - codes).max() <= 1
+
+
+def test_preprocess_uprights_rotated_photos(client):
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    data = encode(photo(400, 200), exif=exif.tobytes())
+    project_id = upload(client, data, remove_background=False)["project_id"]
+    client.post(f"/api/projects/{project_id}/preprocess")
+    project = load_project(project_id)
+    with Image.open(project.dir / project.sources[0].working["path"]) as working:
+        assert working.size == (128, 256)
+    assert project.sources[0].working["color_profile"] == "srgb"
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import io
+import struct
+import zlib
+from dataclasses import replace
+
+import pytest
+from PIL import Image
+
+from app.imaging.probe import ImageInfo, ImageRejected, ProbeError, TruncatedHeader, admit, probe
+
+from .conftest import encode, photo
+
+
+def _png_chunk(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I", len(payload)) + kind + payload + struct.pack(">I", zlib.crc32(kind + payload))
+
+
+def _exif(orientation: int) -> bytes:
+    """Little-endian TIFF block holding just an orientation tag."""
+    return b"II*\x00" + struct.pack("<IHHHIHH", 8, 1, 0x0112, 3, 1, orientation, 0) + b"\x00" * 4
+
+
+def test_png_header():
+    data = encode(Image.new("RGBA", (300, 200)), "PNG")
+    assert probe(io.BytesIO(data)) == ImageInfo("png", 300, 200, 8, 4, "rgba")
+
+
+def test_png_interlace_and_ancillary_chunks():
+    ihdr = struct.pack(">IIBBBBB", 50, 40, 16, 0, 0, 0, 1)
+    data = (
+        b"\x89PNG\r\n\x1a\n"
+        + _png_chunk(b"IHDR", ihdr)
+        + _png_chunk(b"iCCP", b"icc\x00\x00" + zlib.compress(b"profile"))
+        + _png_chunk(b"eXIf", _exif(6))
+        + _png_chunk(b"IDAT", b"")
+    )
+    info = probe(io.BytesIO(data))
+    assert (info.width, info.height, info.bit_depth, info.color_type) == (50, 40, 16, "gray")
+    assert info.progressive and info.icc_profile
+    assert info.orientation == 6
+
+
+def test_jpeg_header():
+    data = encode(photo(320, 240), quality=80)
+    assert probe(io.BytesIO(data)) == ImageInfo("jpeg", 320, 240, 8, 3, "ycbcr")
+
+
+def test_jpeg_progressive_grey_with_exif():
+    exif = Image.Exif()
+    exif[0x0112] = 8
+    data = encode(photo(64, 48).convert("L"), progressive=True, exif=exif.tobytes())
+    info = probe(io.BytesIO(data))
+    assert (info.color_type, info.channels) == ("gray", 1)
+    assert info.progressive
+    assert info.orientation == 8
+
+
+@pytest.mark.parametrize("size", [0, 5, 7])
+def test_short_input_is_truncated(size):
+    with pytest.raises(TruncatedHeader):
+        probe(io.BytesIO(b"\x89PNG\r\n\x1a\n"[:size]))
+
+
+@pytest.mark.parametrize("cut", [12, 20, 30])
+def test_cut_header_is_truncated(cut):
+    data = encode(photo(64, 48))
+    with pytest.raises(TruncatedHeader):
+        probe(io.BytesIO(data[:cut]))
+
+
+def test_other_formats_are_refused():
+    with pytest.raises(ProbeError, match="not a PNG or JPEG"):
+        probe(io.BytesIO(encode(Image.new("RGB", (8, 8)), "GIF")))
+
+
+def test_jpeg_without_frame_is_refused():
+    with pytest.raises(ProbeError, match="no frame header"):
+        probe(io.BytesIO(b"\xff\xd8\xff\xd9\x00\x00\x00\x00"))
+
+
+def test_admit_tiers(settings):
+    info = ImageInfo("png", 100, 100, 8, 3, "rgb")
+    assert admit(info, settings).tier == "small"
+    side = int(settings.small_image_pixels**0.5) + 1
+    assert admit(replace(info, width=side, height=side), settings).tier == "standard"
+    side = int(settings.large_image_pixels**0.5) + 1
+    assert admit(replace(info, width=side, height=side), settings).tier == "large"
+
+
+def test_admit_refuses_oversized_images(settings):
+    info = ImageInfo("png", 100, 100, 8, 3, "rgb")
+    with pytest.raises(ImageRejected, match="zero width"):
+        admit(replace(info, width=0), settings)
+    with pytest.raises(ImageRejected, match="side exceeds"):
+        admit(replace(info, width=settings.max_image_dimension + 1), settings)
+    side = settings.max_image_dimension
+    bomb = replace(info, width=side, height=settings.max_image_pixels // side + 1)
+    with pytest.raises(ImageRejected, match="MP"):
+        admit(bomb, settings)
+
+
+def test_memory_estimate_follows_jpeg_draft_scale(settings):
+    target = settings.working_size
+    jpeg = ImageInfo("jpeg", target * 8, target * 6, 8, 3, "ycbcr")
+    png = replace(jpeg, format="png", color_type="rgb")
+    # The JPEG decodes at 1/8 scale; the PNG in full.
+    assert jpeg.decoded_pixels(target) == target * target * 6 // 8
+    assert png.decoded_pixels(target) == jpeg.pixels
+    assert admit(jpeg, settings).memory_estimate < admit(png, settings).memory_estimate
+
+
+def test_memory_estimate_counts_conversion(settings):
+    rgb = ImageInfo("png", 2000, 2000, 8, 3, "rgb")
+    palette = replace(rgb, channels=1, color_type="palette")
+    deep = replace(rgb, bit_depth=16)
+    # A palette image is converted to RGB(A); 16-bit samples are twice the size and converted too.
+    assert admit(palette, settings).memory_estimate > admit(rgb, settings).memory_estimate
+    assert admit(deep, settings).memory_estimate > admit(rgb, settings).memory_estimate
+
+
+def test_oversized_canvas_is_refused_before_decoding(client, monkeypatch):
+    from app import config
+    from app.ingest.pipeline import IngestPipeline
+
+    monkeypatch.setenv("PROTOSCALE_MAX_IMAGE_PIXELS", "1000")
+    config.get_settings.cache_clear()
+    monkeypatch.setattr(IngestPipeline, "_decode_file", lambda self: pytest.fail("decoded"))
+    response = client.post("/api/uploads", content=encode(photo(), "PNG"), headers={"Content-Type": "image/png"})
+    assert response.status_code == 422
+    assert "MP" in response.json()["detail"]
+
+
+def test_upload_reports_tier_and_estimate(client, settings):
+    body = client.post("/api/uploads", content=encode(photo()), headers={"Content-Type": "image/jpeg"}).json()
+    info = probe(io.BytesIO(encode(photo())))
+    assert body["image"]["tier"] == "small"
+    assert body["image"]["memory_estimate"] == admit(info, settings).memory_estimate
+
+
+def test_images_under_the_minimum_side_are_refused(settings):
+    info = probe(io.BytesIO(encode(photo(640, 31))))
+    with pytest.raises(ImageRejected, match="too small"):
+        admit(info, settings)
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from app.projects import load_project
+
+from .conftest import encode, photo, upload
+
+
+def _project_of(client, count: int, **params) -> str:
+    project_id = None
+    for seed in range(count):
+        body = upload(client, encode(photo(seed=seed)), project_id=project_id, **params)
+        assert body["source_index"] == seed
+        project_id = body["project_id"]
+    return project_id
+
+
+def test_photos_join_the_named_project_in_order(client):
+    project_id = _project_of(client, 3)
+    project = load_project(project_id)
+    assert project.multi_view
+    assert [client.get(f"/api/projects/{project_id}/sources/{i}").content for i in range(3)] == [
+        encode(photo(seed=seed)) for seed in range(3)
+    ]
+
+
+def test_project_keeps_its_own_options(client):
+    project_id = _project_of(client, 1, remove_background=False)
+    upload(client, encode(photo(seed=1)), project_id=project_id)
+    assert load_project(project_id).options.remove_background is False
+
+
+def test_project_size_is_limited(client, monkeypatch):
+    from app import config
+
+    monkeypatch.setenv("PROTOSCALE_MAX_SOURCES", "2")
+    config.get_settings.cache_clear()
+    project_id = _project_of(client, 2)
+    response = client.post(
+        "/api/uploads", params={"project_id": project_id}, content=encode(photo()), headers={"Content-Type": "image/jpeg"}
+    )
+    assert response.status_code == 409
+
+
+def test_unknown_project(client):
+    response = client.post(
+        "/api/uploads", params={"project_id": "0" * 32}, content=encode(photo()), headers={"Content-Type": "image/jpeg"}
+    )
+    assert response.status_code == 404
+    assert client.get("/api/projects/nope").status_code == 404
+    assert client.post(f"/api/projects/{'0' * 32}/preprocess").status_code == 404
+
+
+def test_every_photo_is_preprocessed(client):
+    project_id = _project_of(client, 3)
+    body = client.post(f"/api/projects/{project_id}/preprocess").json()
+    assert body["multi_view"] is True
+    assert len(body["sources"]) == 3
+    project = load_project(project_id)
+    for index, source in enumerate(project.sources):
+        assert source.working == body["sources"][index]
+        assert (project.dir / source.working["path"]).is_file()
+        assert (project.dir / source.working["segmentation"]["mask"]).is_file()
+    # Different photos, different subjects.
+    assert len({source.working["phash"] for source in project.sources}) == 3
+
+
+def test_multi_photo_views_are_the_photos(client):
+    project_id = _project_of(client, 2)
+    client.post(f"/api/projects/{project_id}/preprocess")
+    job = client.post(f"/api/projects/{project_id}/views").json()
+    while (state := client.get(job["status_url"]).json())["status"] not in ("done", "failed"):
+        pass
+    assert state["status"] == "done", state
+    project = load_project(project_id)
+    views = project.artifacts["multi_angle_images"]
+    assert [view["name"] for view in views] == ["photo 1", "photo 2"]
+    assert [view["256"] for view in views] == [source.working["pyramid"]["256"] for source in project.sources]
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import hashlib
+import io
+
+from PIL import Image
+
+from app.blobs import blob_path, put_bytes, put_file
+from app.imaging.pyramid import PYRAMID_SIZES, build_pyramid
+
+from .conftest import encode, photo, upload
+
+
+def _fetch(client, url: str) -> Image.Image:
+    response = client.get(url)
+    assert response.status_code == 200
+    return Image.open(io.BytesIO(response.content))
+
+
+def test_blobs_are_named_by_content(tmp_path):
+    name = put_bytes(b"pixels", "png")
+    assert name == f"{hashlib.sha256(b'pixels').hexdigest()}.png"
+    assert put_bytes(b"pixels", "png") == name
+    source = tmp_path / "source.jpg"
+    source.write_bytes(b"original")
+    sha256 = hashlib.sha256(b"original").hexdigest()
+    assert blob_path(put_file(source, sha256, "jpg")).read_bytes() == b"original"
+
+
+def test_blob_download_is_immutable(client):
+    name = put_bytes(encode(photo(32, 32), "PNG"), "png")
+    response = client.get(f"/api/blobs/{name}")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert "immutable" in response.headers["cache-control"]
+    assert response.headers["etag"] == f'"{name}"'
+
+
+def test_unknown_or_malformed_blob_names(client):
+    assert client.get(f"/api/blobs/{'0' * 64}.png").status_code == 404
+    assert client.get("/api/blobs/..%2Fproject.json").status_code == 404
+    assert client.get(f"/api/blobs/{'0' * 64}.gif").status_code == 404
+
+
+def test_levels_fit_their_sizes(client):
+    pyramid = build_pyramid(photo(1000, 500), "/full.png")
+    assert set(pyramid) == {*map(str, PYRAMID_SIZES), "full"}
+    assert pyramid["full"] == "/full.png"
+    for size in PYRAMID_SIZES:
+        level = _fetch(client, pyramid[str(size)])
+        assert level.format == "WEBP"
+        assert level.size == (size, size // 2)
+
+
+def test_small_images_are_not_upscaled(client):
+    pyramid = build_pyramid(photo(100, 80), "/full.png")
+    assert _fetch(client, pyramid["512"]).size == (100, 80)
+    assert _fetch(client, pyramid["128"]).size == (100, 80)
+
+
+def test_preprocess_publishes_the_pyramid(client):
+    data = encode(photo())
+    body = upload(client, data, remove_background=False)
+    source = client.post(f"/api/projects/{body['project_id']}/preprocess").json()["sources"][0]
+    pyramid = source["pyramid"]
+    # Without background removal the full level is the original, stored once as a blob.
+    assert pyramid["full"] == f"/api/blobs/{body['sha256']}.jpg"
+    assert client.get(pyramid["full"]).content == data
+    assert max(_fetch(client, pyramid["256"]).size) == 256
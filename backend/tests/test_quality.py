@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import json
+
+import numpy as np
+import pytest
+from PIL import Image, ImageFilter
+
+from app.imaging.quality import QualityRejected, assess, check
+
+from .conftest import encode, photo, upload
+
+
+def _finite(report) -> dict:
+    # What the API would serialize; NaN or infinity would fail here instead of as a 500.
+    return json.loads(json.dumps(report.to_dict(), allow_nan=False))
+
+
+def test_a_good_photo_passes(client):
+    report = assess(photo())
+    assert report.score > 0.8 and report.issues == []
+    # The near-white backdrop is not held against it.
+    assert report.highlights_clipped == 0
+    quality = upload(client, encode(photo()))["quality"]
+    assert quality["score"] > 0.8 and quality["issues"] == []
+
+
+def test_featureless_and_blurry_photos_score_low():
+    flat = assess(Image.new("RGB", (640, 480), (128, 128, 128)))
+    assert "blurry" in flat.issues and "subject too small" in flat.issues
+    blurred = assess(photo().filter(ImageFilter.GaussianBlur(6)))
+    assert blurred.sharpness < assess(photo()).sharpness / 10
+    assert "blurry" in blurred.issues
+
+
+def test_exposure_is_judged_on_the_subject():
+    dark = Image.fromarray((np.asarray(photo()) // 12).astype(np.uint8))
+    assert "underexposed" in assess(dark).issues
+    bright = Image.fromarray(np.clip(np.asarray(photo(), np.int16) + 120, 0, 255).astype(np.uint8))
+    assert "overexposed" in assess(bright).issues
+
+
+def test_cutouts_are_measured_on_opaque_pixels():
+    image = photo().convert("RGBA")
+    alpha = np.zeros((480, 640), np.uint8)
+    alpha[120:360, 160:480] = 255
+    image.putalpha(Image.fromarray(alpha))
+    report = assess(image)
+    assert report.coverage == pytest.approx(0.25, abs=0.01)
+    # The hard edge of the cut-out is not counted as detail.
+    framed = assess(photo().crop((160, 120, 480, 360)))
+    assert report.sharpness == pytest.approx(framed.sharpness, rel=0.2)
+
+
+@pytest.mark.parametrize(
+    "image",
+    [
+        Image.new("RGB", (1, 1)),
+        Image.new("RGB", (2, 2), (200, 100, 50)),
+        Image.new("L", (3, 1)),
+        Image.new("RGBA", (2, 2)),
+        # A sliver that thumbnails to 512x1.
+        photo(2048, 4),
+    ],
+)
+def test_tiny_images_get_finite_reports(image):
+    report = _finite(assess(image))
+    assert report["sharpness"] == 0 and report["noise"] == 0
+
+
+def test_check_rejects_low_scores():
+    report = assess(Image.new("RGB", (64, 64)))
+    with pytest.raises(QualityRejected, match="underexposed"):
+        check(report, 0.35)
+    check(report, 0)
+
+
+def test_poor_photos_are_refused_with_the_report(client):
+    data = encode(Image.new("RGB", (640, 480), (128, 128, 128)))
+    response = client.post("/api/uploads", content=data, headers={"Content-Type": "image/jpeg"})
+    assert response.status_code == 422
+    assert "blurry" in response.json()["detail"]["quality"]["issues"]
+
+
+@pytest.mark.parametrize(("format", "content_type"), [("PNG", "image/png"), ("JPEG", "image/jpeg")])
+def test_tiny_uploads_are_refused_before_decoding(client, format, content_type):
+    response = client.post("/api/uploads", content=encode(photo(2, 2), format), headers={"Content-Type": content_type})
+    assert response.status_code == 422
+    assert "too small (2x2)" in response.json()["detail"]
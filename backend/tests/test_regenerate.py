@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import pytest
+
+from app import jobs
+from app.dedup import record_artifacts
+from app.jobs import Job
+from app.projects import load_project
+
+from .conftest import encode, photo, upload
+from .test_views import _preprocessed, _run
+
+
+@pytest.fixture(autouse=True)
+def no_jobs(monkeypatch):
+    monkeypatch.setattr(jobs, "_jobs", {})
+
+
+def _with_views(client) -> tuple[str, list[dict]]:
+    project_id = _preprocessed(client)
+    views = _run(client, project_id)[-1][1]["result"]
+    record_artifacts(load_project(project_id), model_url="/mesh.glb", analysis={"watertight": True})
+    return project_id, views
+
+
+def test_regenerated_view_replaces_only_itself(client):
+    project_id, views = _with_views(client)
+    response = client.post(f"/api/projects/{project_id}/views/2/regenerate")
+    assert response.status_code == 200, response.text
+    body = response.json()
+    view = body["view"]
+    assert body["index"] == 2
+    assert (view["name"], view["seed"], view["cache"]) == ("back", 1, "miss")
+    assert view["full"] != views[2]["full"]
+    artifacts = load_project(project_id).artifacts
+    assert artifacts["multi_angle_images"] == [*views[:2], view, *views[3:]]
+    # The mesh was built from the old views.
+    assert artifacts.get("model_url") is None and artifacts.get("analysis") is None
+
+
+def test_seeds_can_be_picked_and_revisited(client):
+    project_id, views = _with_views(client)
+    url = f"/api/projects/{project_id}/views/1/regenerate"
+    assert client.post(url, json={"seed": 7}).json()["view"]["seed"] == 7
+    assert client.post(url).json()["view"]["seed"] == 8
+    back = client.post(url, json={"seed": 0}).json()["view"]
+    assert back["cache"] == "hit" and back["full"] == views[1]["full"]
+
+
+def test_missing_views_are_404(client):
+    project_id, _ = _with_views(client)
+    assert client.post(f"/api/projects/{project_id}/views/4/regenerate").status_code == 404
+    assert client.post(f"/api/projects/{project_id}/views/-1/regenerate").status_code == 404
+    assert client.post("/api/projects/nope/views/1/regenerate").status_code == 404
+    # Before any view job there are no views at all.
+    other = upload(client, encode(photo(seed=1)))["project_id"]
+    client.post(f"/api/projects/{other}/preprocess")
+    assert client.post(f"/api/projects/{other}/views/1/regenerate").status_code == 404
+
+
+def test_photos_are_not_regenerated(client):
+    project_id, _ = _with_views(client)
+    response = client.post(f"/api/projects/{project_id}/views/0/regenerate")
+    assert response.status_code == 409
+    assert "only generated views" in response.json()["detail"]
+
+    first = upload(client, encode(photo(seed=1)))["project_id"]
+    upload(client, encode(photo(seed=2)), project_id=first)
+    client.post(f"/api/projects/{first}/preprocess")
+    _run(client, first)
+    assert client.post(f"/api/projects/{first}/views/1/regenerate").status_code == 409
+
+
+def test_not_while_the_view_job_runs(client):
+    project_id, views = _with_views(client)
+    jobs._jobs["j"] = Job("j", "views", project_id, status="running")
+    response = client.post(f"/api/projects/{project_id}/views/1/regenerate")
+    assert response.status_code == 409
+    assert "still being generated" in response.json()["detail"]
+    assert load_project(project_id).artifacts["multi_angle_images"] == views
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+
+from app.ingest import resumable
+
+from .conftest import encode, photo
+
+
+def _create(client, data: bytes, **fields) -> dict:
+    response = client.post(
+        "/api/uploads/resumable", json={"filename": "photo.jpg", "content_type": "image/jpeg", "size": len(data), **fields}
+    )
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+def _patch(client, upload_id: str, offset: int, chunk: bytes):
+    return client.patch(f"/api/uploads/resumable/{upload_id}", content=chunk, headers={"Upload-Offset": str(offset)})
+
+
+def _offset(client, upload_id: str) -> int:
+    return client.get(f"/api/uploads/resumable/{upload_id}").json()["offset"]
+
+
+def test_resumable_upload(client):
+    data = encode(photo(), quality=90)
+    upload = _create(client, data)
+    assert upload["offset"] == 0 and upload["size"] == len(data)
+    upload_id = upload["upload_id"]
+    half = len(data) // 2
+    assert _patch(client, upload_id, 0, data[:half]).json()["offset"] == half
+    assert _offset(client, upload_id) == half
+    assert _patch(client, upload_id, half, data[half:]).json()["offset"] == len(data)
+
+    response = client.post(f"/api/uploads/resumable/{upload_id}/finalize")
+    assert response.status_code == 201, response.text
+    body = response.json()
+    assert body["sha256"] == hashlib.sha256(data).hexdigest()
+    assert client.get(body["source_url"]).content == data
+    # The upload and its lock are gone once it became a project.
+    assert client.get(f"/api/uploads/resumable/{upload_id}").status_code == 404
+    assert upload_id not in resumable._locks
+
+
+def test_resumable_upload_into_a_project(client):
+    first = client.post("/api/uploads", content=encode(photo(seed=1)), headers={"Content-Type": "image/jpeg"}).json()
+    data = encode(photo(seed=2))
+    upload_id = _create(client, data, project_id=first["project_id"])["upload_id"]
+    _patch(client, upload_id, 0, data)
+    body = client.post(f"/api/uploads/resumable/{upload_id}/finalize").json()
+    assert (body["project_id"], body["source_index"]) == (first["project_id"], 1)
+
+
+def test_chunk_at_the_wrong_offset(client):
+    data = encode(photo())
+    upload_id = _create(client, data)["upload_id"]
+    _patch(client, upload_id, 0, data[:100])
+    for offset in (0, 50, 200):
+        response = _patch(client, upload_id, offset, data[offset : offset + 100])
+        assert response.status_code == 409
+        assert response.json()["detail"]["offset"] == 100
+    assert _offset(client, upload_id) == 100
+
+
+def test_chunk_past_the_declared_size(client):
+    data = encode(photo())
+    upload_id = _create(client, data)["upload_id"]
+    _patch(client, upload_id, 0, data[:100])
+    response = _patch(client, upload_id, 100, data[100:] + b"extra")
+    assert response.status_code == 413
+    # Nothing of the rejected chunk is committed; the client can resume from the last good offset.
+    assert _offset(client, upload_id) == 100
+    assert _patch(client, upload_id, 100, data[100:]).json()["offset"] == len(data)
+    response = client.post(f"/api/uploads/resumable/{upload_id}/finalize")
+    assert response.status_code == 201
+    assert response.json()["sha256"] == hashlib.sha256(data).hexdigest()
+
+
+def test_hash_survives_a_restart(client):
+    data = encode(photo())
+    upload_id = _create(client, data)["upload_id"]
+    _patch(client, upload_id, 0, data[:100])
+    resumable._hashers.clear()  # as after a restart: the running hash is lost
+    _patch(client, upload_id, 100, data[100:])
+    body = client.post(f"/api/uploads/resumable/{upload_id}/finalize").json()
+    assert body["sha256"] == hashlib.sha256(data).hexdigest()
+
+
+def test_chunk_needs_an_offset(client):
+    upload_id = _create(client, b"x" * 10)["upload_id"]
+    response = client.patch(f"/api/uploads/resumable/{upload_id}", content=b"x")
+    assert response.status_code == 400
+
+
+def test_finalize_before_the_last_chunk(client):
+    data = encode(photo())
+    upload_id = _create(client, data)["upload_id"]
+    _patch(client, upload_id, 0, data[:100])
+    response = client.post(f"/api/uploads/resumable/{upload_id}/finalize")
+    assert response.status_code == 409
+    assert response.json()["detail"]["offset"] == 100
+
+
+def test_finalize_of_an_unreadable_body(client):
+    data = b"not an image at all"
+    upload_id = _create(client, data)["upload_id"]
+    _patch(client, upload_id, 0, data)
+    assert client.post(f"/api/uploads/resumable/{upload_id}/finalize").status_code == 415
+    assert client.get(f"/api/uploads/resumable/{upload_id}").status_code == 404
+
+
+def test_create_checks_the_declaration(client, settings):
+    def create(**fields):
+        return client.post("/api/uploads/resumable", json={"content_type": "image/jpeg", "size": 10, **fields})
+
+    assert create(content_type="image/webp").status_code == 415
+    assert create(size=0).status_code == 400
+    assert create(size=settings.max_upload_bytes + 1).status_code == 413
+    assert create(project_id="0" * 32).status_code == 404
+
+
+def test_unknown_uploads_get_no_lock(client):
+    locks = dict(resumable._locks)
+    for upload_id in ("nope", "0" * 32):
+        assert client.get(f"/api/uploads/resumable/{upload_id}").status_code == 404
+        assert _patch(client, upload_id, 0, b"x").status_code == 404
+        assert client.post(f"/api/uploads/resumable/{upload_id}/finalize").status_code == 404
+        assert client.delete(f"/api/uploads/resumable/{upload_id}").status_code == 404
+    assert resumable._locks == locks
+
+
+def test_abort(client, settings):
+    upload_id = _create(client, b"x" * 10)["upload_id"]
+    _patch(client, upload_id, 0, b"x" * 5)
+    assert client.delete(f"/api/uploads/resumable/{upload_id}").status_code == 204
+    assert client.get(f"/api/uploads/resumable/{upload_id}").status_code == 404
+    assert not (settings.data_dir / "uploads" / upload_id).exists()
+    assert upload_id not in resumable._locks and upload_id not in resumable._hashers
+
+
+def test_idle_uploads_expire(client, settings):
+    stale = _create(client, b"x" * 10)["upload_id"]
+    fresh = _create(client, b"x" * 10)["upload_id"]
+    state = settings.data_dir / "uploads" / stale / "state.json"
+    record = json.loads(state.read_text())
+    record["updated_at"] = time.time() - settings.resumable_ttl - 1
+    state.write_text(json.dumps(record))
+    _create(client, b"x" * 10)
+    assert client.get(f"/api/uploads/resumable/{stale}").status_code == 404
+    assert not state.parent.exists() and stale not in resumable._hashers
+    assert client.get(f"/api/uploads/resumable/{fresh}").status_code == 200
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from dataclasses import replace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app import config
+from app.projects import load_project
+from app.segmentation.classical import ClassicalSegmenter, srgb_to_lab
+from app.segmentation.engine import cutout, remove_background, remove_background_batch
+from app.segmentation.models import ModelUnavailable, get_model
+from app.timing import Timings
+from app.workers import shutdown_pool
+
+from .conftest import encode, photo, upload
+
+
+def _disc(width: int = 640, height: int = 480) -> np.ndarray:
+    y, x = np.mgrid[:height, :width]
+    return (x - width / 2) ** 2 + (y - height / 2) ** 2 < (min(width, height) / 3) ** 2
+
+
+def _iou(alpha: np.ndarray, truth: np.ndarray) -> float:
+    found = alpha >= 128
+    return (found & truth).sum() / (found | truth).sum()
+
+
+@pytest.fixture
+def model_only(settings):
+    """Settings under which no backdrop counts as uniform, so the model always runs."""
+    return replace(settings, backdrop_uniformity=2.0)
+
+
+def test_lab_of_reference_colours():
+    lab = srgb_to_lab(np.array([[[255, 255, 255], [0, 0, 0], [255, 0, 0]]], np.uint8))[0]
+    assert lab[0] == pytest.approx([100, 0, 0], abs=0.5)
+    assert lab[1] == pytest.approx([0, 0, 0], abs=0.5)
+    assert lab[2] == pytest.approx([53.2, 80.1, 67.2], abs=1)
+
+
+def test_classical_segmenter_finds_the_subject():
+    small = np.asarray(photo(256, 192))
+    probability = ClassicalSegmenter().predict(small, Timings())
+    assert probability.shape == (192, 256) and probability.dtype == np.float32
+    assert 0 <= probability.min() and probability.max() <= 1
+    truth = _disc(256, 192)
+    assert probability[truth].mean() > 0.9 and probability[~truth].mean() < 0.1
+
+
+def test_remove_background_mattes_at_working_size(model_only):
+    segmentation = remove_background(photo(), model_only)
+    assert segmentation.path == "model" and segmentation.model == "classical"
+    assert segmentation.alpha.shape == (480, 640) and segmentation.alpha.dtype == np.uint8
+    assert segmentation.small.shape == (192, 256, 3)
+    assert _iou(segmentation.alpha, _disc()) > 0.95
+    assert segmentation.cache == "off" and segmentation.fallback is None
+    record = segmentation.to_dict()
+    assert record["coverage"] == pytest.approx(_disc().mean(), abs=0.02)
+    assert {"resize", "cluster", "band"} <= set(record["timings_ms"])
+
+
+def test_cutout_carries_the_mask(model_only):
+    segmentation = remove_background(photo(), model_only)
+    image = cutout(photo(), segmentation.alpha)
+    assert image.mode == "RGBA"
+    assert np.array_equal(np.asarray(image.getchannel("A")), segmentation.alpha)
+
+
+@pytest.mark.parametrize(
+    ("model", "reason"), [("u2net", "unknown segmentation model"), ("onnx", "PROTOSCALE_SEGMENTATION_WEIGHTS")]
+)
+def test_unavailable_models_fall_back_to_classical(model_only, model, reason):
+    with pytest.raises(ModelUnavailable):
+        get_model(model)
+    segmentation = remove_background(photo(), replace(model_only, segmentation_model=model))
+    assert segmentation.model == "classical"
+    assert reason in segmentation.fallback
+    assert reason in segmentation.to_dict()["fallback"]
+
+
+def test_grey_and_rgba_working_images_are_accepted(model_only):
+    for mode in ("L", "RGBA"):
+        segmentation = remove_background(photo().convert(mode), model_only)
+        assert segmentation.alpha.shape == (480, 640)
+
+
+def test_preprocess_records_the_segmentation(client):
+    project_id = upload(client, encode(photo()))["project_id"]
+    client.post(f"/api/projects/{project_id}/preprocess")
+    project = load_project(project_id)
+    working = project.sources[0].working
+    with Image.open(project.dir / working["segmentation"]["mask"]) as mask:
+        assert mask.mode == "L" and mask.size == (256, 192)
+    with Image.open(project.dir / working["segmentation"]["cutout"]) as image:
+        assert image.mode == "RGBA"
+
+
+def test_a_batch_matches_one_image_at_a_time(model_only):
+    images = [photo(seed=seed) for seed in range(3)] + [photo(480, 640)]
+    batch = remove_background_batch(images, model_only)
+    for image, segmentation in zip(images, batch):
+        single = remove_background(image, model_only)
+        assert np.array_equal(segmentation.alpha, single.alpha)
+        assert segmentation.batch_size == 4 and segmentation.to_dict()["batch_size"] == 4
+    assert "batch_size" not in single.to_dict()
+
+
+def test_a_batch_mixes_cache_hits_backdrops_and_model_runs(settings, model_only):
+    remove_background(photo(seed=1), model_only, "11" * 32)
+    batch = remove_background_batch(
+        [photo(seed=0), photo(seed=1), photo(seed=2)], model_only, ["00" * 32, "11" * 32, None]
+    )
+    assert [s.cache for s in batch] == ["miss", "memory", "off"]
+    plain = remove_background_batch([photo(), photo(seed=1)], settings)
+    assert {s.path for s in plain} == {"backdrop"}
+
+
+@pytest.mark.parametrize(("workers", "batch_sizes"), [(1, [3, 3, 3]), (2, [2, 1, 2]), (4, [1, 1, 1])])
+def test_preprocess_segments_each_workers_photos_together(client, monkeypatch, workers, batch_sizes):
+    # The pool is sized when it starts.
+    shutdown_pool()
+    monkeypatch.setenv("PROTOSCALE_WORKER_PROCESSES", str(workers))
+    config.get_settings.cache_clear()
+    project_id = None
+    for seed in range(3):
+        project_id = upload(client, encode(photo(seed=seed)), project_id=project_id)["project_id"]
+    sources = client.post(f"/api/projects/{project_id}/preprocess").json()["sources"]
+    assert [s["segmentation"].get("batch_size", 1) for s in sources] == batch_sizes
+    project = load_project(project_id)
+    assert [s["path"] for s in sources] == ["working-0.png", "working-1.png", "working-2.png"]
+    assert [s.working for s in project.sources] == sources
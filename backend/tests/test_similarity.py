@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import io
+
+import numpy as np
+from PIL import Image
+
+from app.dedup import record_artifacts
+from app.imaging.phash import phash
+from app.projects import load_project
+from app.similarity import COMPACT_AFTER, PerceptualIndex
+
+from .conftest import encode, photo, upload
+
+ARTIFACTS = {"model_url": "/mesh.glb"}
+OWNERS = [f"{i:032x}" for i in range(1, 6)]
+
+
+def subject(seed: int = 0) -> Image.Image:
+    """``photo`` under uneven light, which gives its hash low-frequency structure to lock on to."""
+    rng = np.random.default_rng(seed)
+    light = Image.fromarray(rng.integers(0, 256, (4, 4), dtype=np.uint8)).resize((640, 480), Image.Resampling.BICUBIC)
+    pixels = np.asarray(photo(seed=seed), np.float64) * (0.5 + np.asarray(light, np.float64)[..., None] / 512)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def _distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _preprocess(client, data: bytes, **params) -> dict:
+    project_id = upload(client, data, **params)["project_id"]
+    response = client.post(f"/api/projects/{project_id}/preprocess")
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_phash_ignores_reencoding_but_not_content():
+    original = phash(subject())
+    assert _distance(original, phash(subject().resize((500, 375)))) <= 2
+    assert _distance(original, phash(Image.open(io.BytesIO(encode(subject(), quality=40))))) <= 2
+    assert _distance(original, phash(subject(seed=1))) > 10
+
+
+def test_phash_judges_cutouts_on_white():
+    cutout = photo().convert("RGBA")
+    cutout.putalpha(0)
+    assert phash(cutout) == phash(Image.new("RGB", cutout.size, "white"))
+
+
+def test_index_matches_within_radius(tmp_path):
+    index = PerceptualIndex(tmp_path)
+    base = 0x0123_4567_89AB_CDEF
+    for owner, flips in zip(OWNERS, (0, 1, 3, 9, 40)):
+        index.add(base ^ ((1 << flips) - 1), owner)
+    assert index.search(base, 10) == [(OWNERS[0], 0), (OWNERS[1], 1), (OWNERS[2], 3), (OWNERS[3], 9)]
+    assert index.search(base, 10, limit=2) == [(OWNERS[0], 0), (OWNERS[1], 1)]
+    assert index.search(~base & (2**64 - 1), 10) == []
+
+
+def test_index_matches_agree_with_brute_force(tmp_path):
+    rng = np.random.default_rng(0)
+    query = int(rng.integers(0, 2**63, dtype=np.uint64))
+    # Random hashes plus neighbours of the query at every distance up to 16 bits.
+    hashes = [int(h) for h in rng.integers(0, 2**63, 300, dtype=np.uint64)]
+    hashes += [query ^ int(np.packbits(rng.permutation(64) < k).view(">u8")[0]) for k in range(17)]
+    rng.shuffle(hashes)
+    index = PerceptualIndex(tmp_path)
+    for i, value in enumerate(hashes[:200]):
+        index.add(value, f"{i:032x}")
+    index.compact()
+    for i, value in enumerate(hashes[200:], 200):
+        index.add(value, f"{i:032x}")
+    expected = {f"{i:032x}" for i, value in enumerate(hashes) if _distance(query, value) <= 8}
+    assert len(expected) == 9
+    assert {owner for owner, _ in index.matches(query, 8)} == expected
+
+
+def test_index_adds_once_and_survives_restarts(tmp_path):
+    index = PerceptualIndex(tmp_path)
+    index.add(7, OWNERS[0])
+    index.add(7, OWNERS[0])
+    index.add(8, OWNERS[1])
+    assert len(index) == 2
+    reopened = PerceptualIndex(tmp_path)
+    assert len(reopened) == 2
+    reopened.compact()
+    assert not (tmp_path / "pending.log").stat().st_size
+    assert PerceptualIndex(tmp_path).search(7, 0) == [(OWNERS[0], 0)]
+
+
+def test_index_compacts_a_long_log(tmp_path):
+    index = PerceptualIndex(tmp_path)
+    for i in range(COMPACT_AFTER):
+        index.add(i << 20, f"{i:032x}")
+    assert len(index.hashes) == COMPACT_AFTER
+    assert (tmp_path / "hashes.npy").exists()
+
+
+def test_preprocess_offers_similar_projects(client):
+    first = _preprocess(client, encode(subject()))
+    assert first["similar"] == []
+    record_artifacts(load_project(first["project_id"]), **ARTIFACTS)
+    second = _preprocess(client, encode(subject(), quality=50))
+    assert [offer["project_id"] for offer in second["similar"]] == [first["project_id"]]
+    assert second["similar"][0]["artifacts"] == ARTIFACTS
+    # Different options produce different results; nothing to offer.
+    assert _preprocess(client, encode(subject(), quality=60), remove_background=False)["similar"] == []
+    # Preprocessing again doesn't offer the project to itself.
+    assert client.post(f"/api/projects/{first['project_id']}/preprocess").json()["similar"] == []
+
+
+def test_adopt_takes_over_an_offer(client):
+    first = _preprocess(client, encode(subject()))
+    record_artifacts(load_project(first["project_id"]), **ARTIFACTS)
+    second = _preprocess(client, encode(subject(), quality=50))
+    url = f"/api/projects/{second['project_id']}/similar/{first['project_id']}/adopt"
+    response = client.post(url)
+    assert response.status_code == 200
+    assert response.json()["artifacts"] == ARTIFACTS
+    assert load_project(second["project_id"]).artifacts == ARTIFACTS
+
+
+def test_adopt_refuses_what_was_never_offered(client):
+    first = _preprocess(client, encode(subject()))
+    other = _preprocess(client, encode(subject(seed=1)))
+    base = f"/api/projects/{other['project_id']}/similar"
+    assert client.post(f"{base}/{'0' * 32}/adopt").status_code == 404
+    # Nothing produced yet.
+    similar = _preprocess(client, encode(subject(), quality=50))
+    response = client.post(f"/api/projects/{similar['project_id']}/similar/{first['project_id']}/adopt")
+    assert response.status_code == 409
+    record_artifacts(load_project(first["project_id"]), **ARTIFACTS)
+    assert client.post(f"{base}/{first['project_id']}/adopt").status_code == 409
+    assert client.post(f"{base}/{other['project_id']}/adopt").status_code == 409
+    assert load_project(other["project_id"]).artifacts == {}
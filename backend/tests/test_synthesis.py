@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import dataclasses
+
+import numpy as np
+import pytest
+
+from app.pipeline.views import resolve_backend
+from app.synthesis import silhouette
+from app.synthesis.models import BackendUnavailable, get_backend
+from app.timing import Timings
+
+
+def subject(width: int = 160, height: int = 96) -> np.ndarray:
+    """A shaded ellipse, wider than tall, cut out on a transparent canvas."""
+    y, x = np.mgrid[:height, :width]
+    inside = ((x - width / 2) / (width * 0.4)) ** 2 + ((y - height / 2) / (height * 0.4)) ** 2 < 1
+    rgba = np.zeros((height, width, 4), np.uint8)
+    rgba[..., 0] = 120 + x * 100 // width
+    rgba[..., 1] = 80
+    rgba[..., 2] = 40 + y * 100 // height
+    rgba[..., 3] = inside * 255
+    return rgba
+
+
+def _covered(view: np.ndarray) -> np.ndarray:
+    return view[..., 3] >= 128
+
+
+def test_distance_to_outline_is_exact():
+    rng = np.random.default_rng(0)
+    inside = rng.random((40, 50)) < 0.8
+    distance = silhouette.distance_to_outline(inside)
+    # Brute force, with the frame as a ring of outside pixels.
+    padded = np.pad(inside, 1)
+    oy, ox = np.nonzero(~padded)
+    for y, x in zip(*np.nonzero(inside)):
+        expected = np.sqrt(((oy - y - 1) ** 2 + (ox - x - 1) ** 2).min())
+        assert distance[y, x] == pytest.approx(expected)
+    assert not distance[~inside].any()
+
+
+def test_front_view_keeps_the_silhouette():
+    rgba = subject()
+    view = silhouette.SilhouetteSynthesizer().synthesize(rgba, 0, 0, 0, Timings())
+    assert view.shape == rgba.shape and view.dtype == np.uint8
+    front, original = _covered(view), _covered(rgba)
+    assert (front & original).sum() / (front | original).sum() > 0.97
+
+
+def test_side_view_shows_the_thickness():
+    rgba = subject()
+    view = silhouette.SilhouetteSynthesizer().synthesize(rgba, 90, 0, 0, Timings())
+    side = np.ptp(np.flatnonzero(_covered(view).any(axis=0)))
+    width, height = (np.ptp(np.flatnonzero(_covered(rgba).any(axis=axis))) for axis in (0, 1))
+    # Seen from the side, the solid is as wide as it is thick: at most twice the distance to the outline.
+    assert 0.8 * height < side <= height + 2 < width
+
+
+def test_output_depends_only_on_input_and_seed():
+    rgba = subject()
+    backend = silhouette.SilhouetteSynthesizer()
+    first = backend.synthesize(rgba, 45, 0, 3, Timings())
+    assert np.array_equal(first, backend.synthesize(rgba.copy(), 45, 0, 3, Timings()))
+    other = backend.synthesize(rgba, 45, 0, 4, Timings())
+    # The seed only moves the light, not the shape.
+    assert np.array_equal(_covered(first), _covered(other))
+    assert not np.array_equal(first, other)
+
+
+def test_batch_matches_single_views_and_inflates_once(monkeypatch):
+    rgba = subject()
+    backend = silhouette.SilhouetteSynthesizer()
+    angles = [(90, 0, 0), (180, 0, 1), (0, 90, 2)]
+    single = [backend.synthesize(rgba, *angle, Timings()) for angle in angles]
+
+    calls = []
+    inflate = silhouette.inflate
+    monkeypatch.setattr(silhouette, "inflate", lambda *args: calls.append(1) or inflate(*args))
+    timings = Timings()
+    batch = backend.synthesize_batch([rgba] * 3, *map(list, zip(*angles)), timings)
+    assert all(np.array_equal(a, b) for a, b in zip(batch, single))
+    assert len(calls) == 1
+    assert {"depth", "surface", "project", "shade", "splat"} <= set(timings.to_dict())
+
+
+def test_backends_are_found_by_name_or_import_path():
+    assert isinstance(get_backend("silhouette"), silhouette.SilhouetteSynthesizer)
+    imported = get_backend("app.synthesis.silhouette:SilhouetteSynthesizer")
+    assert (imported.name, imported.version) == (silhouette.NAME, silhouette.VERSION)
+
+
+@pytest.mark.parametrize(
+    ("name", "reason"),
+    [
+        ("zero123", "unknown view backend"),
+        ("app.synthesis.nowhere:Backend", "can't load"),
+        ("app.synthesis.silhouette:Nothing", "can't load"),
+    ],
+)
+def test_unavailable_backends_fall_back_to_silhouette(settings, name, reason):
+    with pytest.raises(BackendUnavailable, match=reason):
+        get_backend(name)
+    backend, fallback = resolve_backend(dataclasses.replace(settings, view_backend=name))
+    assert backend.name == silhouette.NAME
+    assert reason in fallback
+
+
+def test_configured_backend_needs_no_fallback(settings):
+    backend, fallback = resolve_backend(settings)
+    assert (backend.name, fallback) == (silhouette.NAME, None)
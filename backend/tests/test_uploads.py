@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+
+import pytest
+
+from app.ingest.stream import ChunkSpool, UploadTooLarge
+
+from .conftest import encode, photo
+
+
+async def _body(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+def _spool(tmp_path, body: list[bytes], chunk_size: int = 4, max_bytes: int = 100) -> tuple[list[bytes], ChunkSpool]:
+    spool = ChunkSpool(chunk_size=chunk_size, spool_max_size=8, max_bytes=max_bytes, tmp_dir=tmp_path / "tmp")
+
+    async def run():
+        return [chunk async for chunk in spool.chunks(_body(*body))]
+
+    try:
+        return asyncio.run(run()), spool
+    finally:
+        spool.close()
+
+
+def test_spool_rechunks_the_body(tmp_path):
+    chunks, spool = _spool(tmp_path, [b"a", b"bcdefghij", b"", b"kl"])
+    assert chunks == [b"abcd", b"efgh", b"ijkl"]
+    assert spool.sha256.hexdigest() == hashlib.sha256(b"abcdefghijkl").hexdigest()
+    # One chunk plus the spool's in-memory head at most.
+    assert spool.peak_buffer_bytes <= 4 + 8
+
+
+def test_spool_stops_at_the_limit(tmp_path):
+    with pytest.raises(UploadTooLarge):
+        _spool(tmp_path, [b"x" * 60, b"x" * 60])
+
+
+def test_upload_streams_into_a_project(client):
+    data = encode(photo(), quality=90)
+    response = client.post("/api/uploads", content=data, headers={"Content-Type": "image/jpeg", "X-Filename": "a%20b.jpg"})
+    assert response.status_code == 201, response.text
+    body = response.json()
+    assert body["sha256"] == hashlib.sha256(data).hexdigest()
+    assert body["size"] == body["stats"]["bytes"] == len(data)
+    assert client.get(body["source_url"]).content == data
+    project = client.get(f"/api/projects/{body['project_id']}").json()
+    assert project["sources"][0]["filename"] == "a b.jpg"
+
+
+def test_upload_of_a_png(client):
+    data = encode(photo(), "PNG")
+    response = client.post("/api/uploads", content=data, headers={"Content-Type": "image/png"})
+    assert response.status_code == 201, response.text
+    assert response.json()["source_url"].endswith("/sources/0")
+
+
+def test_upload_refuses_other_types(client):
+    response = client.post("/api/uploads", content=b"GIF89a", headers={"Content-Type": "image/gif"})
+    assert response.status_code == 415
+
+
+def test_upload_refuses_unreadable_bodies(client):
+    response = client.post("/api/uploads", content=b"not an image at all", headers={"Content-Type": "image/jpeg"})
+    assert response.status_code == 415
+
+
+def test_upload_refuses_declared_oversize(client, settings):
+    response = client.post(
+        "/api/uploads",
+        content=b"\xff\xd8",
+        headers={"Content-Type": "image/jpeg", "Content-Length": str(settings.max_upload_bytes + 1)},
+    )
+    assert response.status_code == 413
+
+
+@pytest.mark.parametrize("declared", ["twelve", "-1", "1e3"])
+def test_upload_refuses_a_malformed_length(client, declared):
+    response = client.post(
+        "/api/uploads", content=encode(photo()), headers={"Content-Type": "image/jpeg", "Content-Length": declared}
+    )
+    assert response.status_code == 400
+
+
+def test_upload_refuses_undeclared_oversize(client, monkeypatch):
+    from app import config
+
+    monkeypatch.setenv("PROTOSCALE_MAX_UPLOAD_BYTES", "1000")
+    config.get_settings.cache_clear()
+
+    def body():
+        yield encode(photo())
+
+    response = client.post("/api/uploads", content=body(), headers={"Content-Type": "image/jpeg"})
+    assert response.status_code == 413
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import pytest
+
+from app import jobs
+from app.blobs import blob_path, blob_url, put_bytes
+from app.synthesis.cache import CACHED_FIELDS, get_view_cache, view_key
+
+from .conftest import encode, photo, upload
+from .test_views import _preprocessed, _run
+
+SHA = "ab" * 32
+
+
+@pytest.fixture(autouse=True)
+def no_jobs(monkeypatch):
+    monkeypatch.setattr(jobs, "_jobs", {})
+
+
+def _views(client, project_id: str, **layout) -> list[dict]:
+    kind, done = _run(client, project_id, **layout)[-1]
+    assert kind == "done", done
+    return done["result"]
+
+
+def test_key_covers_every_input():
+    key = view_key(SHA, "silhouette", "3", azimuth=90, elevation=0, seed=0)
+    assert key == view_key(SHA, "silhouette", "3", seed=0, elevation=0, azimuth=90)
+    assert key != view_key("cd" * 32, "silhouette", "3", azimuth=90, elevation=0, seed=0)
+    assert key != view_key(SHA, "silhouette", "4", azimuth=90, elevation=0, seed=0)
+    assert key != view_key(SHA, "silhouette", "3", azimuth=90, elevation=0, seed=1)
+    assert key != view_key(SHA, "silhouette", "3", azimuth=90, elevation=0, seed=0, working_size=512)
+
+
+def test_entries_hold_only_the_image_fields():
+    name = put_bytes(b"png", "png")
+    record = {"name": "right", "azimuth": 90, "cache": "miss", "batch_size": 3}
+    record.update({field: blob_url(name) if field == "full" else 1 for field in CACHED_FIELDS})
+    get_view_cache().put(SHA, record)
+    assert set(get_view_cache().get(SHA)) == set(CACHED_FIELDS)
+    # An entry whose image is gone is a miss.
+    blob_path(name).unlink()
+    assert get_view_cache().get(SHA) is None
+
+
+def test_rerun_links_the_cached_views(client):
+    project_id = _preprocessed(client)
+    first = _views(client, project_id)
+    again = _views(client, project_id)
+    assert [view.get("cache") for view in first] == [None, "miss", "miss", "miss"]
+    assert [view.get("cache") for view in again] == [None, "hit", "hit", "hit"]
+    for miss, hit in zip(first[1:], again[1:]):
+        assert {name: hit[name] for name in CACHED_FIELDS} == {name: miss[name] for name in CACHED_FIELDS}
+
+
+def test_views_are_not_copied_into_the_project(client, settings):
+    project_id = _preprocessed(client)
+    views = _views(client, project_id)
+    assert not list((settings.data_dir / "projects" / project_id).glob("view-*"))
+    for view in views[1:]:
+        assert "path" not in view
+        assert client.get(view["full"]).status_code == 200
+
+
+def test_other_projects_and_larger_rings_reuse_views(client):
+    # Preprocessed before the first has any views, so the repeat isn't an exact-repeat hit.
+    first, repeat = _preprocessed(client), _preprocessed(client)
+    _views(client, first)
+    views = {view["name"]: view.get("cache") for view in _views(client, repeat, ring=8)}
+    assert views == {
+        "front": None,
+        "front-right": "miss",
+        "right": "hit",
+        "back-right": "miss",
+        "back": "hit",
+        "back-left": "miss",
+        "left": "hit",
+        "front-left": "miss",
+    }
+
+
+def test_other_options_miss(client):
+    _views(client, _preprocessed(client))
+    other = upload(client, encode(photo()), remove_background=False)["project_id"]
+    client.post(f"/api/projects/{other}/preprocess")
+    assert {view.get("cache") for view in _views(client, other)} == {None, "miss"}
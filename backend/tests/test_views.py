@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import pytest
+
+from app import jobs
+from app.pipeline.views import RING, view_layout
+
+from .conftest import encode, photo, upload
+from .test_jobs import _events
+
+
+@pytest.fixture(autouse=True)
+def no_jobs(monkeypatch):
+    monkeypatch.setattr(jobs, "_jobs", {})
+
+
+def _preprocessed(client) -> str:
+    project_id = upload(client, encode(photo()))["project_id"]
+    assert client.post(f"/api/projects/{project_id}/preprocess").status_code == 200
+    return project_id
+
+
+def _run(client, project_id: str, **layout) -> list[tuple[str, dict]]:
+    started = client.post(f"/api/projects/{project_id}/views", json=layout)
+    assert started.status_code == 202, started.text
+    return _events(client.get(started.json()["events_url"]).text)
+
+
+@pytest.mark.parametrize("ring", [4, 6, 8, 12])
+def test_ring_is_evenly_spaced_from_the_front(ring):
+    layout = view_layout(ring)
+    assert [azimuth for _, azimuth, _ in layout] == [i * 360 / ring for i in range(ring)]
+    assert layout[0] == ("front", 0, 0) and {elevation for *_, elevation in layout} == {0}
+    assert len({name for name, *_ in layout}) == ring
+
+
+def test_top_and_bottom_come_after_the_ring():
+    assert view_layout(6, top=True, bottom=True)[-2:] == [("top", 0, 90), ("bottom", 0, -90)]
+    assert view_layout(8, bottom=True)[-1] == ("bottom", 0, -90)
+    assert view_layout() == RING
+    assert [name for name, *_ in RING] == ["front", "right", "back", "left"]
+    assert view_layout(12)[1][0] == "30°"
+
+
+def test_other_ring_sizes_are_refused(client):
+    with pytest.raises(ValueError, match="ring"):
+        view_layout(5)
+    project_id = _preprocessed(client)
+    assert client.post(f"/api/projects/{project_id}/views", json={"ring": 5}).status_code == 422
+
+
+def test_views_follow_the_requested_layout(client):
+    project_id = _preprocessed(client)
+    events = _run(client, project_id, ring=8, top=True, bottom=True)
+    kind, done = events[-1]
+    assert kind == "done" and done["total"] == 10
+    assert [(view["name"], view["azimuth"], view["elevation"]) for view in done["result"]] == [
+        tuple(angle) for angle in view_layout(8, top=True, bottom=True)
+    ]
+    stored = client.get(f"/api/projects/{project_id}").json()["artifacts"]["multi_angle_images"]
+    assert stored == done["result"]
+
+
+def test_views_are_published_as_they_land(client):
+    project_id = _preprocessed(client)
+    events = _run(client, project_id, ring=6)
+    progress = [state for kind, state in events if kind == "progress" and state["items"]]
+    assert progress
+    for state in progress:
+        # Every finished view is in its slot; the rest are still empty.
+        assert len(state["items"]) == 6
+        assert sum(item is not None for item in state["items"]) == state["completed"]
+    done = events[-1][1]
+    for state in progress:
+        assert all(item in (None, view) for item, view in zip(state["items"], done["result"]))
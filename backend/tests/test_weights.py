@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import json
+import struct
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.segmentation.models import ModelUnavailable
+from app.segmentation.onnx import OnnxSegmenter
+from app.timing import Timings
+from app.weights import DTYPES, WeightsError, map_weights
+
+COMPLEX = b'{"x": {"dtype": "C64", "shape": [1], "data_offsets": [0, 8]}}'
+NAMES = {np.dtype(dtype): name for name, dtype in DTYPES.items() if name != "BF16"}
+
+
+def _checkpoint(path: Path, tensors: dict[str, np.ndarray], dtypes: dict[str, str] | None = None) -> None:
+    """Write ``tensors`` as a safetensors file; ``dtypes`` overrides the dtype names in the header."""
+    header: dict = {"__metadata__": {"format": "pt"}}
+    offset = 0
+    for name, array in tensors.items():
+        dtype = (dtypes or {}).get(name) or NAMES[array.dtype]
+        header[name] = {"dtype": dtype, "shape": list(array.shape), "data_offsets": [offset, offset + array.nbytes]}
+        offset += array.nbytes
+    encoded = json.dumps(header).encode()
+    path.write_bytes(struct.pack("<Q", len(encoded)) + encoded + b"".join(a.tobytes() for a in tensors.values()))
+
+
+def _mapped(array: np.ndarray) -> bool:
+    while array is not None and not isinstance(array, np.memmap):
+        array = array.base
+    return array is not None
+
+
+def test_tensors_are_read_only_views_of_the_file(tmp_path):
+    tensors = {
+        "conv.weight": np.arange(24, dtype=np.float32).reshape(2, 3, 4),
+        "conv.bias": np.array([1, -2], dtype=np.int64),
+        "mask": np.array([True, False, True]),
+    }
+    _checkpoint(tmp_path / "w.safetensors", tensors)
+    mapped = map_weights(tmp_path / "w.safetensors")
+    assert set(mapped) == set(tensors)
+    for name, array in tensors.items():
+        assert mapped[name].dtype == array.dtype and np.array_equal(mapped[name], array)
+        assert _mapped(mapped[name])
+        with pytest.raises(ValueError):
+            mapped[name].flat[0] = 0
+
+
+def test_bfloat16_comes_back_as_its_bit_pattern(tmp_path):
+    bits = np.array([0x3F80, 0xC000], dtype=np.uint16)  # 1.0 and -2.0
+    _checkpoint(tmp_path / "w.safetensors", {"scale": bits}, {"scale": "BF16"})
+    scale = map_weights(tmp_path / "w.safetensors")["scale"]
+    assert scale.dtype == np.uint16
+    assert np.array_equal((scale.astype(np.uint32) << 16).view(np.float32), [1.0, -2.0])
+
+
+@pytest.mark.parametrize(
+    ("data", "message"),
+    [
+        (b"short", "not a safetensors file"),
+        (struct.pack("<Q", 5) + b"{nope", "malformed"),
+        (struct.pack("<Q", len(COMPLEX)) + COMPLEX + bytes(8), "C64"),
+    ],
+)
+def test_bad_files_are_refused(tmp_path, data, message):
+    (tmp_path / "w.safetensors").write_bytes(data)
+    with pytest.raises(WeightsError, match=message):
+        map_weights(tmp_path / "w.safetensors")
+
+
+class FakeRuntime:
+    """Just enough of onnxruntime's API to see what the segmenter hands it."""
+
+    def __init__(self) -> None:
+        self.initializers: dict[str, np.ndarray] = {}
+        runtime = self
+
+        class SessionOptions:
+            def add_external_initializers(self, names, values):
+                runtime.initializers.update(zip(names, values))
+
+        class InferenceSession:
+            def __init__(self, path, options, providers):
+                self.path = path
+
+            def get_inputs(self):
+                return [SimpleNamespace(name="input", shape=["batch", 3, 64, 64])]
+
+            def run(self, outputs, feeds):
+                return [feeds["input"][:, :1]]
+
+        self.SessionOptions = SessionOptions
+        self.InferenceSession = InferenceSession
+        self.OrtValue = SimpleNamespace(ortvalue_from_numpy=lambda array: array)
+
+
+@pytest.fixture
+def runtime(monkeypatch) -> FakeRuntime:
+    fake = FakeRuntime()
+    monkeypatch.setitem(sys.modules, "onnxruntime", fake)
+    return fake
+
+
+def test_onnx_initializers_are_mapped_from_safetensors(tmp_path, runtime):
+    (tmp_path / "u2net.onnx").write_bytes(b"graph")
+    weight = np.linspace(-1, 1, 48, dtype=np.float32).reshape(3, 4, 4)
+    _checkpoint(tmp_path / "u2net.safetensors", {"conv.weight": weight})
+    model = OnnxSegmenter(tmp_path / "u2net.onnx")
+    assert list(runtime.initializers) == ["conv.weight"]
+    assert _mapped(runtime.initializers["conv.weight"])
+    assert np.array_equal(runtime.initializers["conv.weight"], weight)
+    assert (model.input_size, model.dynamic_batch) == (64, True)
+    probability = model.predict_batch(np.zeros((2, 30, 40, 3), np.uint8), Timings())
+    assert probability.shape == (2, 30, 40)
+
+
+def test_onnx_graph_with_embedded_weights_maps_nothing(tmp_path, runtime):
+    (tmp_path / "u2net.onnx").write_bytes(b"graph")
+    OnnxSegmenter(tmp_path / "u2net.onnx")
+    assert runtime.initializers == {}
+
+
+def test_onnx_version_follows_the_files(tmp_path, runtime):
+    graph, tensors = tmp_path / "u2net.onnx", tmp_path / "u2net.safetensors"
+    graph.write_bytes(b"graph")
+    _checkpoint(tensors, {"w": np.zeros(4, np.float32)})
+    version = OnnxSegmenter(graph).version
+    assert version.startswith("u2net-") and OnnxSegmenter(graph).version == version
+    _checkpoint(tensors, {"w": np.zeros(8, np.float32)})
+    assert OnnxSegmenter(graph).version != version
+
+
+def test_onnx_refuses_what_it_cant_map(tmp_path, runtime):
+    (tmp_path / "u2net.onnx").write_bytes(b"graph")
+    (tmp_path / "u2net.safetensors").write_bytes(b"short")
+    with pytest.raises(ModelUnavailable, match="not a safetensors file"):
+        OnnxSegmenter(tmp_path / "u2net.onnx")
+    _checkpoint(tmp_path / "u2net.safetensors", {"w": np.zeros(2, np.uint16)}, {"w": "BF16"})
+    with pytest.raises(ModelUnavailable, match="bfloat16"):
+        OnnxSegmenter(tmp_path / "u2net.onnx")
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pytest
+
+from app import config, workers
+from app.workers import Batcher, SharedArray, fan_out, share_array
+
+
+def halve(items: list[int]) -> list:
+    """Batch function: half of each even number, a ValueError for odd ones."""
+    return [item // 2 if item % 2 == 0 else ValueError(f"{item} is odd") for item in items]
+
+
+def crash(items: list[int]) -> list:
+    raise RuntimeError("batch failed")
+
+
+def total(shared: SharedArray) -> int:
+    with shared.attach() as array:
+        return int(array.sum())
+
+
+def test_batcher_collects_a_window_into_one_call():
+    async def run():
+        batcher = Batcher("test_window", halve, max_batch=8, max_latency=0.05)
+        return await asyncio.gather(*(batcher.submit(n) for n in (2, 4, 6))), batcher
+
+    results, batcher = asyncio.run(run())
+    assert results == [1, 2, 3]
+    assert (batcher.batches.value, batcher.items.value) == (1, 3)
+
+
+def test_batcher_sends_a_full_batch_without_waiting():
+    async def run():
+        batcher = Batcher("test_full", halve, max_batch=2, max_latency=60)
+        return await asyncio.wait_for(asyncio.gather(*(batcher.submit(n) for n in (2, 4))), 5), batcher
+
+    results, batcher = asyncio.run(run())
+    assert results == [1, 2] and batcher.batches.value == 1
+
+
+def test_batcher_fails_only_the_failing_item():
+    async def run():
+        batcher = Batcher("test_items", halve, max_batch=8, max_latency=0.01)
+        return await asyncio.gather(*(batcher.submit(n) for n in (2, 3, 4)), return_exceptions=True)
+
+    good, bad, other = asyncio.run(run())
+    assert (good, other) == (1, 2)
+    assert isinstance(bad, ValueError) and "3 is odd" in str(bad)
+
+
+def test_batcher_fails_every_item_when_the_call_does():
+    async def run():
+        batcher = Batcher("test_crash", crash, max_batch=8, max_latency=0.01)
+        return await asyncio.gather(*(batcher.submit(n) for n in (1, 2)), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(run()))
+
+
+def test_batcher_yields_as_items_finish():
+    async def run():
+        batcher = Batcher("test_completed", halve, max_batch=2, max_latency=0.01)
+        return [pair async for pair in batcher.map_completed([8, 10, 12])], batcher
+
+    pairs, batcher = asyncio.run(run())
+    assert sorted(pairs) == [(0, 4), (1, 5), (2, 6)]
+    # One worker: the three items go out as batches of at most two.
+    assert (batcher.batches.value, batcher.items.value) == (2, 3)
+
+
+def test_shared_array_is_read_in_the_worker():
+    array = np.arange(1000, dtype=np.int64)
+
+    async def run():
+        with share_array(array) as shared:
+            return await fan_out(total, [(shared,), (shared,)])
+
+    assert asyncio.run(run()) == [int(array.sum())] * 2
+
+
+def test_shared_array_is_a_read_only_copy():
+    array = np.arange(24, dtype=np.uint8).reshape(2, 3, 4)
+    with share_array(array) as shared:
+        array[0, 0, 0] = 99
+        with shared.attach() as mapped:
+            assert (mapped.shape, mapped.dtype) == (array.shape, array.dtype)
+            assert mapped[0, 0, 0] == 0 and np.array_equal(mapped[1:], array[1:])
+            with pytest.raises(ValueError, match="read-only"):
+                mapped[0, 0, 0] = 1
+            del mapped
+
+
+def test_shared_array_is_released_on_exit():
+    with share_array(np.zeros(0, np.float32)) as shared:
+        with shared.attach() as mapped:
+            assert mapped.size == 0
+            del mapped
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=shared.name)
+
+
+def test_warm_pool_loads_the_models_at_start_up(monkeypatch):
+    monkeypatch.setenv("PROTOSCALE_WARM_WORKERS", "1")
+    config.get_settings.cache_clear()
+
+    async def run():
+        await workers.start_pool()
+        return await fan_out(workers._worker_status, [()])
+
+    [(_, warmup)] = asyncio.run(run())
+    assert warmup > 0 and workers.worker_warmup.value == round(warmup, 4)
+    workers.report_workers()
+    assert workers.worker_count.value == 1
+    assert workers.worker_rss.value > 0 and workers.worker_pss.value > 0
+
+
+def test_lazy_pool_loads_nothing_up_front():
+    [(_, warmup)] = asyncio.run(fan_out(workers._worker_status, [()]))
+    assert warmup == 0
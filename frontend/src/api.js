@@ -0,0 +1,165 @@
+// Thin wrappers around the backend HTTP API.
+
+async function errorMessage(res) {
+  try {
+    const body = await res.json();
+    if (typeof body.detail === 'string') return body.detail;
+    if (body.detail?.message) return body.detail.message;
+    if (body.detail) return JSON.stringify(body.detail);
+  } catch {
+    // Not JSON; fall through to the status text
+  }
+  return `${res.status} ${res.statusText}`;
+}
+
+export async function request(path, options = {}) {
+  const res = await fetch(path, options);
+  if (!res.ok) throw new Error(await errorMessage(res));
+  return res.status === 204 ? null : res.json();
+}
+
+// Upload options; projectId adds the photo to an existing project instead of starting one
+function optionParams({ removeBackground = true, enhancedDetail = false, projectId = null } = {}) {
+  const params = { remove_background: removeBackground, enhanced_detail: enhancedDetail };
+  if (projectId) params.project_id = projectId;
+  return params;
+}
+
+// Streams the file as the raw request body; the server spools it to disk in chunks.
+export function uploadFile(file, options) {
+  const query = new URLSearchParams(optionParams(options));
+  return request(`/api/uploads?${query}`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': file.type,
+      'X-Filename': encodeURIComponent(file.name),
+    },
+    body: file,
+  });
+}
+
+const RESUMABLE_MAX_RETRIES = 5;
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+// Remembers the server-side upload for a file so a page reload can resume it too.
+// The target project and options are part of the key: the server finalizes an
+// upload with the ones it was created with.
+function resumeKey(file, options) {
+  const params = new URLSearchParams(optionParams(options));
+  return `protoscale:upload:${file.name}:${file.size}:${file.lastModified}:${params}`;
+}
+
+async function openResumable(file, options) {
+  const key = resumeKey(file, options);
+  const saved = localStorage.getItem(key);
+  if (saved) {
+    try {
+      return await request(`/api/uploads/resumable/${saved}`);
+    } catch {
+      localStorage.removeItem(key); // Expired or already finalized
+    }
+  }
+  const state = await request('/api/uploads/resumable', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({
+      filename: file.name,
+      content_type: file.type,
+      size: file.size,
+      ...optionParams(options),
+    }),
+  });
+  localStorage.setItem(key, state.upload_id);
+  return state;
+}
+
+// Sends the file in offset-addressed chunks. After a failure the committed
+// offset is re-read from the server and sending continues from there.
+export async function uploadResumable(file, options) {
+  let state = await openResumable(file, options);
+  const url = `/api/uploads/resumable/${state.upload_id}`;
+  let failures = 0;
+
+  while (state.offset < state.size) {
+    try {
+      const end = Math.min(state.offset + state.chunk_size, state.size);
+      state = await request(url, {
+        method: 'PATCH',
+        headers: { 'Content-Type': 'application/octet-stream', 'Upload-Offset': String(state.offset) },
+        body: file.slice(state.offset, end),
+      });
+      failures = 0;
+    } catch (e) {
+      if (++failures > RESUMABLE_MAX_RETRIES) throw e;
+      await sleep(500 * 2 ** failures);
+      try {
+        state = await request(url);
+      } catch {
+        // Still offline; keep the last known offset and retry
+      }
+    }
+  }
+
+  const result = await request(`${url}/finalize`, { method: 'POST' });
+  localStorage.removeItem(resumeKey(file, options));
+  return result;
+}
+
+export function preprocessProject(projectId) {
+  return request(`/api/projects/${projectId}/preprocess`, { method: 'POST' });
+}
+
+// Copies a similar earlier project's artifacts (an offer from preprocessProject's `similar`)
+// into this project on the server; resolves to { project_id, artifacts }
+export function adoptSimilar(projectId, otherId) {
+  return request(`/api/projects/${projectId}/similar/${otherId}/adopt`, { method: 'POST' });
+}
+
+// Starts (or joins) the multi-angle view job; resolves to { job_id, events_url, ... }.
+// layout is { ring: 4 | 6 | 8 | 12, top, bottom } and only matters for single-photo projects.
+export function startViews(projectId, layout = { ring: 4, top: false, bottom: false }) {
+  return request(`/api/projects/${projectId}/views`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(layout),
+  });
+}
+
+// Redoes one generated view with a new seed; resolves to { index, view }
+export function regenerateView(projectId, index) {
+  return request(`/api/projects/${projectId}/views/${index}/regenerate`, { method: 'POST' });
+}
+
+// Follows a job's Server-Sent Events until it ends. onProgress gets every
+// state (with the finished `items` so far, for jobs that have them);
+// resolves with the job's result, rejects with its error.
+export function watchJob(eventsUrl, onProgress = () => {}) {
+  return new Promise((resolve, reject) => {
+    const source = new EventSource(eventsUrl);
+    const state = (event) => JSON.parse(event.data);
+    source.addEventListener('progress', (event) => onProgress(state(event)));
+    source.addEventListener('done', (event) => {
+      source.close();
+      const job = state(event);
+      onProgress(job);
+      resolve(job.result);
+    });
+    source.addEventListener('failed', (event) => {
+      source.close();
+      reject(new Error(state(event).error));
+    });
+    source.onerror = () => {
+      // EventSource reconnects on its own unless the server refused the stream
+      if (source.readyState === EventSource.CLOSED) reject(new Error('Lost connection to the server'));
+    };
+  });
+}
+
+// Thumbnail pyramids are { 128, 256, 512, full } URL maps; let the browser pick a level
+export function pyramidSrcset(pyramid) {
+  return ['128', '256', '512']
+    .filter(size => pyramid[size])
+    .map(size => `${pyramid[size]} ${size}w`)
+    .join(', ');
+}
@@ -1,5 +1,10 @@
 import { defineStore } from 'pinia';
 import { ref, computed } from 'vue';
+import { adoptSimilar, preprocessProject, regenerateView, startViews, uploadFile, uploadResumable, watchJob } from '../api';
+
+// Files above this go through the resumable protocol so a dropped link doesn't restart them
+const RESUMABLE_THRESHOLD = 8 * 1024 * 1024;
+export const MAX_PHOTOS = 30;
 
 export const useProcessStore = defineStore('process', () => {
   // --- State ---
@@ -9,52 +14,126 @@ export const useProcessStore = defineStore('process', () => {
   const progress = ref(0);
   const error = ref(null);
   const uploadedImage = ref(null);
+  const projectId = ref(null);
+  const sourcePyramids = ref([]);
+  // Earlier projects whose photo looks nearly identical, with what they produced
+  const similarProjects = ref([]);
   
-  // Mock Data Containers
+  // One slot per view; null until the view has been generated
   const multiAngleImages = ref([]);
+  // Views around a single photo (4, 6, 8 or 12), plus optional top and bottom views
+  const viewLayout = ref({ ring: 4, top: false, bottom: false });
+  // Indices of views being regenerated one by one
+  const regenerating = ref([]);
+
+  // Mock Data Containers
   const modelUrl = ref(null);
   const analysisData = ref(null);
 
   // --- Getters ---
   const currentStep = computed(() => steps[currentStepIndex.value]);
+  // Several real photos stand in for the synthetic views
+  const isMultiView = computed(() => sourcePyramids.value.length > 1);
 
   // --- Actions ---
   
+  // Fill in whatever an earlier run on the same image already produced
+  function applyArtifacts(artifacts = {}) {
+    if (artifacts.multi_angle_images) multiAngleImages.value = artifacts.multi_angle_images;
+    if (artifacts.model_url) modelUrl.value = artifacts.model_url;
+    if (artifacts.analysis) analysisData.value = artifacts.analysis;
+  }
+
   // 1. Upload
-  async function uploadImage(file) {
+  async function uploadImages(files, options = {}) {
     isProcessing.value = true;
     error.value = null;
-    
-    // Simulate upload delay
-    await new Promise(resolve => setTimeout(resolve, 1500));
-    
-    uploadedImage.value = URL.createObjectURL(file);
-    isProcessing.value = false;
-    currentStepIndex.value = 1; // Move to Review
+
+    try {
+      let result = null;
+      // Sequential so the server numbers the photos in the order they were picked
+      for (const file of files) {
+        const fileOptions = { ...options, projectId: result?.project_id };
+        try {
+          result = file.size > RESUMABLE_THRESHOLD
+            ? await uploadResumable(file, fileOptions)
+            : await uploadFile(file, fileOptions);
+        } catch (e) {
+          // Name the photo the quality gate (or anything else) refused
+          throw files.length > 1 ? new Error(`${file.name}: ${e.message}`) : e;
+        }
+        if (!uploadedImage.value) uploadedImage.value = result.source_url;
+      }
+      projectId.value = result.project_id;
+      applyArtifacts(result.artifacts);
+      // An exact repeat comes back already preprocessed, with its results
+      const preprocessed = result.deduplicated ? result : await preprocessProject(result.project_id);
+      sourcePyramids.value = preprocessed.sources.map(source => source.pyramid);
+      similarProjects.value = preprocessed.similar ?? [];
+      // A cached mesh skips straight to Preview, cached views land on Review
+      currentStepIndex.value = modelUrl.value ? 2 : 1;
+    } catch (e) {
+      error.value = e.message;
+    } finally {
+      isProcessing.value = false;
+    }
+  }
+
+  // The server copies the offer's artifacts into this project, so later steps and regeneration see them
+  async function useSimilarResults(offer) {
+    isProcessing.value = true;
+    error.value = null;
+
+    try {
+      const { artifacts } = await adoptSimilar(projectId.value, offer.project_id);
+      applyArtifacts(artifacts);
+      similarProjects.value = [];
+      if (modelUrl.value) currentStepIndex.value = 2; // Mesh already exists, go to Preview
+    } catch (e) {
+      error.value = e.message;
+    } finally {
+      isProcessing.value = false;
+    }
   }
 
   // 2. Generate Multi-Angle
   async function generateMultiAngle() {
     isProcessing.value = true;
     progress.value = 0;
+    error.value = null;
 
-    const interval = setInterval(() => {
-      progress.value += 10;
-      if (progress.value >= 100) clearInterval(interval);
-    }, 300);
-
-    await new Promise(resolve => setTimeout(resolve, 3500));
+    try {
+      const job = await startViews(projectId.value, viewLayout.value);
+      // Views fill their slots as they finish instead of all at the end
+      multiAngleImages.value = await watchJob(job.events_url, state => {
+        progress.value = Math.round(state.progress * 100);
+        if (state.items) multiAngleImages.value = state.items;
+      });
+    } catch (e) {
+      multiAngleImages.value = []; // A failed job stores no views
+      error.value = e.message;
+    } finally {
+      isProcessing.value = false;
+      progress.value = 0;
+    }
+  }
 
-    // Mock 4 angles
-    multiAngleImages.value = [
-      uploadedImage.value, // Front (reuse original)
-      uploadedImage.value, // Right (placeholder)
-      uploadedImage.value, // Back (placeholder)
-      uploadedImage.value  // Left (placeholder)
-    ];
+  // Retry a single view the user doesn't like; the others are kept
+  async function retryView(index) {
+    regenerating.value = [...regenerating.value, index];
+    error.value = null;
 
-    isProcessing.value = false;
-    progress.value = 0;
+    try {
+      const { view } = await regenerateView(projectId.value, index);
+      multiAngleImages.value = multiAngleImages.value.map((img, i) => (i === index ? view : img));
+      // The mesh was built from the old set of views
+      modelUrl.value = null;
+      analysisData.value = null;
+    } catch (e) {
+      error.value = e.message;
+    } finally {
+      regenerating.value = regenerating.value.filter(i => i !== index);
+    }
   }
 
   // 3. Generate 3D Mesh
@@ -84,9 +163,13 @@ export const useProcessStore = defineStore('process', () => {
 
   function reset() {
     currentStepIndex.value = 0;
+    projectId.value = null;
     uploadedImage.value = null;
+    sourcePyramids.value = [];
+    similarProjects.value = [];
     multiAngleImages.value = [];
     modelUrl.value = null;
+    analysisData.value = null;
   }
 
   return {
@@ -97,11 +180,19 @@ export const useProcessStore = defineStore('process', () => {
     progress,
     error,
     uploadedImage,
+    projectId,
+    sourcePyramids,
+    isMultiView,
+    similarProjects,
     multiAngleImages,
+    viewLayout,
+    regenerating,
     modelUrl,
     analysisData,
-    uploadImage,
+    uploadImages,
+    useSimilarResults,
     generateMultiAngle,
+    retryView,
     generateMesh,
     confirmModel,
     reset
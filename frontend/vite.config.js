@@ -4,4 +4,10 @@ import vue from '@vitejs/plugin-vue'
 // https://vite.dev/config/
 export default defineConfig({
   plugins: [vue()],
+  server: {
+    // Backend (see backend/README.md) runs on :8000 during development
+    proxy: {
+      '/api': 'http://localhost:8000',
+    },
+  },
 })